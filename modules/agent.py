@@ -0,0 +1,261 @@
+import hmac
+import json
+import threading
+import ipaddress
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from . import rtt, synscan, smbprobe
+from .utils import ProbeStore, reverse_dns, detect_os_type, detect_exact_os, DNS_CACHE_TTL
+from .fingerprints import get_fingerprint_cache
+from .scanner import stream_hosts, get_scan_options, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNKS
+from .scheduler import ProbeScheduler, SiteLimiter, DEFAULT_PROBES_PER_SECOND
+from .discovery import discover_neighbors
+
+DEFAULT_AGENT_PORT = 8765
+# délai sans nouvelle ligne de l'agent avant d'abandonner (scan d'un grand sous-réseau)
+DEFAULT_READ_TIMEOUT = 300
+
+# type d'OS transmis sous forme de code
+OS_TYPES = ["unknown", "linux_ssh", "windows_remote"]
+
+
+class AgentError(Exception):
+    """échec d'un scan délégué ; received = hôtes déjà reçus avant l'erreur"""
+
+    def __init__(self, message, received=0):
+        super().__init__(message)
+        self.received = received
+
+
+class AgentConfigError(AgentError):
+    """agent qui refuse le coordinateur (jeton invalide, profil non géré) : configuration à corriger, pas de repli"""
+
+
+def _encode_host(ip_str, open_ports, ports, ttl, hostname, os_type, exact_os, mac):
+    """une ligne par hôte vivant : [ip, masque des ports, ttl, code OS, version exacte, nom DNS, MAC]"""
+    mask = 0
+    for index, port in enumerate(ports):
+        if port in open_ports:
+            mask |= 1 << index
+    return [int(ipaddress.IPv4Address(ip_str)), mask, ttl, OS_TYPES.index(os_type), exact_os, hostname, mac]
+
+
+def _decode_host(item, ports):
+    ip_int, mask, ttl, os_code, exact_os, hostname, mac = item
+    open_ports = [port for index, port in enumerate(ports) if mask & (1 << index)]
+    return str(ipaddress.IPv4Address(ip_int)), open_ports, ttl, hostname, OS_TYPES[os_code], exact_os, mac
+
+
+# --- côté site : l'agent ---
+
+def run_local_scan(job, config, emit):
+    """
+    scan + reverse DNS + OS detection of one local profile, every probe stays on the site LAN
+    emit(line) is called for each alive host (compact encoding), from several threads
+    the first error of an identification or of emit (coordinator gone) is raised at the end
+    """
+    network = ipaddress.IPv4Network(job["cidr"], strict=False)
+    ports = [int(port) for port in job["ports"]]
+    dns_ttl = config.get("dns_cache_ttl", DNS_CACHE_TTL)
+    rtt.configure(config)
+    get_fingerprint_cache(config)
+    smbprobe.configure(config)
+
+    options = get_scan_options(config)
+    if options["scan_method"] == "syn" and not synscan.is_available():
+        options["scan_method"] = "connect"
+    scheduler = ProbeScheduler(options["max_in_flight"], config.get("probes_per_second", DEFAULT_PROBES_PER_SECOND))
+    options["limiter"] = SiteLimiter(scheduler, job["network_name"])
+    options["throttle"] = scheduler.reserve
+
+    neighbors = {}
+    if config.get("passive_discovery", True):
+        neighbors = discover_neighbors(network, config.get("neighbor_table"), config.get("dhcp_lease_files"))
+    probes = ProbeStore()
+    if config.get("banner_capture", True):
+        options["on_banner"] = probes.record_banner
+
+    def identify(ip_str, open_ports, ttl):
+        hostname = reverse_dns(ip_str, dns_ttl)
+        exact_os, windows_name = detect_exact_os(ip_str, probes)
+        hostname = hostname or windows_name
+        # version exacte connue : le type générique ne sert plus au siège
+        os_type = "unknown" if exact_os else detect_os_type(ip_str, probes)
+        emit(_encode_host(ip_str, open_ports, ports, ttl, hostname, os_type, exact_os,
+                          neighbors.get(ip_str, "N/A")))
+
+    # identifications en cours seulement (retirées dès leur fin), erreurs gardées pour la fin du scan
+    pending = set()
+    errors = []
+
+    def identified(future):
+        pending.discard(future)
+        if future.exception() is not None:
+            errors.append(future.exception())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.get("enrichment_workers", 16)) as enricher:
+        def on_result(result):
+            ip_str, is_alive, open_ports, ttl = result
+            if is_alive:
+                probes.record_icmp(ip_str, ttl)
+                probes.record_ports(ip_str, ports, open_ports)
+                future = enricher.submit(identify, ip_str, open_ports, ttl)
+                pending.add(future)
+                future.add_done_callback(identified)
+
+        hot = set(job.get("hot", []))
+        stream_hosts(network.hosts(), ports, on_result, known_alive=neighbors, priority=hot,
+                     chunk_size=config.get("stream_chunk_size", DEFAULT_CHUNK_SIZE),
+                     max_chunks=config.get("stream_max_chunks", DEFAULT_MAX_CHUNKS), **options)
+
+    if errors:
+        raise errors[0]
+
+
+class AgentHandler(BaseHTTPRequestHandler):
+    """
+    POST /scan {network_name, cidr, ports, hot} -> one JSON line per alive host, then ["done", n]
+    (["error", message] instead of "done" if the scan fails: the coordinator keeps it partial)
+    """
+
+    server_version = "NTL-AuditAgent/1.0"
+
+    def _reply_error(self, code, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/scan":
+            return self._reply_error(404, "route inconnue")
+        token = self.headers.get("X-Agent-Token", "")
+        if not hmac.compare_digest(token.encode(), self.server.token.encode()):
+            return self._reply_error(403, "jeton invalide")
+
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            profile = self.server.profiles.get(job["network_name"])
+        except (ValueError, KeyError, TypeError):
+            return self._reply_error(400, "requête invalide")
+        # uniquement les profils locaux de ce site, avec le CIDR déclaré ici
+        if profile is None or profile["cidr"] != job.get("cidr"):
+            return self._reply_error(403, f"profil non géré par cet agent : {job.get('network_name')}")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        write_lock = threading.Lock()
+        count = 0
+
+        def emit(line):
+            nonlocal count
+            data = (json.dumps(line, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+            with write_lock:
+                self.wfile.write(data)
+                self.wfile.flush()
+                count += 1
+
+        print(f"[*] Job reçu de {self.client_address[0]} : {profile['network_name']} ({profile['cidr']})")
+        try:
+            run_local_scan(job, self.server.config, emit)
+            hosts = count
+            emit(["done", hosts])
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"[!] Coordinateur déconnecté pendant le scan de {profile['network_name']}.")
+            return
+        except Exception as e:
+            print(f"[ERREUR] Scan de {profile['network_name']} : {e}")
+            try:
+                emit(["error", str(e)])
+            except OSError:
+                pass
+            return
+        print(f"[OK] {profile['network_name']} : {hosts} hôtes vivants transmis.")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(config, host="127.0.0.1", port=DEFAULT_AGENT_PORT):
+    """
+    agent de site : exécute les jobs de scan du coordinateur sur ses profils locaux
+    host : loopback par défaut ; agent_listen doit nommer l'interface du site par laquelle
+           le coordinateur arrive (jamais 0.0.0.0 sur une machine exposée au WAN)
+    """
+    token = config.get("agent_token", "")
+    if not token:
+        print("[ERREUR] agent_token vide dans configs/audit.json : agent non démarré.")
+        return
+
+    names = config.get("agent_profiles") or [p["network_name"] for p in config.get("scan_profiles", [])]
+    profiles = {p["network_name"]: p for p in config.get("scan_profiles", []) if p["network_name"] in names}
+
+    server = ThreadingHTTPServer((host, port), AgentHandler)
+    server.daemon_threads = True
+    server.token = token
+    server.config = config
+    server.profiles = profiles
+    print(f"[*] Agent d'audit en écoute sur {host}:{port}")
+    for profile in profiles.values():
+        print(f"    - {profile['network_name']} ({profile['cidr']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# --- côté siège : le coordinateur ---
+
+def remote_scan(agent_url, profile, ports, on_host, token, hot=None, timeout=DEFAULT_READ_TIMEOUT):
+    """
+    délègue le scan d'un profil à l'agent du site
+    on_host(ip_str, open_ports, ttl, hostname, os_type, exact_os, mac) pour chaque hôte vivant reçu
+    return : nombre d'hôtes reçus ; AgentError si l'agent échoue ou si le flux est tronqué,
+             AgentConfigError si l'agent refuse le job (jeton, profil) : pas de repli à faire
+    """
+    ports = list(ports)
+    job = {"network_name": profile["network_name"], "cidr": profile["cidr"], "ports": ports, "hot": list(hot or [])}
+    received = 0
+    try:
+        with requests.post(f"{agent_url.rstrip('/')}/scan", json=job, headers={"X-Agent-Token": token},
+                           stream=True, timeout=(5, timeout)) as response:
+            if response.status_code != 200:
+                try:
+                    message = response.json().get("error", response.reason)
+                except ValueError:
+                    message = response.reason
+                if response.status_code in (401, 403):
+                    raise AgentConfigError(f"HTTP {response.status_code} : {message}")
+                raise AgentError(f"HTTP {response.status_code} : {message}")
+
+            for raw in response.iter_lines():
+                if not raw:
+                    continue
+                item = json.loads(raw)
+                if item[0] == "done":
+                    return received
+                if item[0] == "error":
+                    raise AgentError(f"erreur côté agent : {item[1]}", received)
+                on_host(*_decode_host(item, ports))
+                received += 1
+    except (requests.RequestException, ValueError) as e:
+        raise AgentError(str(e), received)
+    raise AgentError("flux interrompu avant la fin du scan", received)
+
+
+if __name__ == "__main__":
+    # python -m modules.agent [port]
+    import sys
+    from .audit import load_config
+
+    config = load_config()
+    if config:
+        port = int(sys.argv[1]) if len(sys.argv) > 1 else config.get("agent_port", DEFAULT_AGENT_PORT)
+        serve(config, config.get("agent_listen", "127.0.0.1"), port)
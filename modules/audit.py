@@ -1,19 +1,36 @@
-import socket
+import time
 import json
 import os
 import csv
 import ipaddress
-import platform
-import subprocess
-import requests
+import threading
 import concurrent.futures
 from datetime import datetime, timedelta
 from .utils import *
+from .scanner import scan_hosts, stream_hosts, get_scan_options, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNKS
+from .eol_cache import get_eol_cache
+from .eol_catalog import get_eol_catalog, sync_catalog, release_status, compact_release, NAME, CODENAME
+from .fingerprints import get_fingerprint_cache
+from .discovery import discover_neighbors
+from .agent import remote_scan, AgentError, AgentConfigError
+from . import rtt, synscan, smbprobe
+from .smbprobe import WINDOWS_API_MAPPING
+from .banners import BANNER_API_MAPPING
+from .reports import AUDIT_FIELDNAMES, external_sort_csv, iter_report_rows
+from .history import record_audit, query_menu, recent_activity
+from .hotlist import build_hotlist
+from .columnar import ResultTable, load_table, save_table, cross_site_summary, write_summary_csv, SOON_OBSOLETE
+from .scheduler import ProbeScheduler, SiteLimiter, create_scheduler, DEFAULT_PROBES_PER_SECOND
+from .sharding import sharded_scan, get_shard_count, ShardError, DEFAULT_SHARD_THRESHOLD
+from .snapshots import load_snapshot, save_snapshot, diff_snapshot, write_change_report
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE = os.path.join(BASE_DIR, "configs", "audit.json")
 LOGS_DIR = os.path.join(os.path.dirname(BASE_DIR), "logs")
 
+# au-delà de ce nombre d'adresses, le scan passe en mode streaming
+STREAMING_THRESHOLD = 4096
+
 # mapping API endoflife.date
 API_MAPPING = {
     "Windows Server 2016": ("windows-server", "2016"),
@@ -58,48 +75,48 @@ def load_config():
         return None
 
 def fetch_eol_date_from_api(product, version):
-    url = f"https://endoflife.date/api/v1/products/{product}"
-
-    try:
-        response = requests.get(url, timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-
-            releases = []
-            if isinstance(data, list):
-                releases = data
-            elif isinstance(data, dict):
-                releases = data.get("result", {}).get("releases", [])
-
-            target_field = "name"
-            target_value = str(version)
-
-            if ":" in target_value:
-                parts = target_value.split(":", 1)
-                target_field = parts[0]
-                target_value = parts[1]
-
-            # cherche cycle correspondant (ex: 20.04)
-            for release in releases:
-                actual_value = release.get(target_field)
-
-                if str(actual_value) == target_value:
-                    eol_date = release.get('eolFrom') or release.get('eol')
-                    
-                    if isinstance(eol_date, str) and len(eol_date) >= 10:
-                        return eol_date[:10]
-                    
-                    return str(eol_date)
-    except Exception:
+    # releases servies par le cache (mémoire + disque), API appelée au plus une fois par produit
+    releases = get_eol_cache().get_releases(product)
+    if not releases:
         return None
 
+    target_field = "name"
+    target_value = str(version)
+
+    if ":" in target_value:
+        parts = target_value.split(":", 1)
+        target_field = parts[0]
+        target_value = parts[1]
+
+    # cherche cycle correspondant (ex: 20.04)
+    for release in releases:
+        actual_value = release.get(target_field)
+
+        if str(actual_value) == target_value:
+            eol_date = release.get('eolFrom') or release.get('eol')
+            
+            if isinstance(eol_date, str) and len(eol_date) >= 10:
+                return eol_date[:10]
+            
+            return str(eol_date)
+    return None
+
 def get_eol_status(os_name):
     """verif obsolescence via API"""
-    if os_name not in API_MAPPING:
+    # versions exactes remontées par la sonde SMB ou les bannières
+    mapping = API_MAPPING.get(os_name) or WINDOWS_API_MAPPING.get(os_name) or BANNER_API_MAPPING.get(os_name)
+    if not mapping:
         return "INCONNU (Pas de mapping API)", "N/A"
     
-    product_slug, version = API_MAPPING[os_name]
-    
+    product_slug, version = mapping
+
+    # catalogue local synchronisé : statut complet (release encore supportée sans date comprise),
+    # aucun appel réseau pour une release qu'il connaît
+    release = get_eol_catalog().find_release(product_slug, version)
+    if release:
+        status, display_date = release_status(release)
+        return (SOON_OBSOLETE if status == "Bientôt obsolète" else status), display_date
+
     # appel API
     eol_date_str = fetch_eol_date_from_api(product_slug, version)
     
@@ -116,54 +133,91 @@ def get_eol_status(os_name):
         if today > eol_date:
             return "Obsolète", eol_date_str
         elif warning > eol_date:
-            return "Bientôt obsolète!", eol_date_str
+            return SOON_OBSOLETE, eol_date_str
         else:
             return "Supporté", eol_date_str
     except ValueError:
         return "Date invalide", eol_date_str
 
-def ping_host(ip_str, timeout=1):
-    """Check if host responds to ICMP ping"""
-    try:
-        # Windows uses -n for count, -w for timeout in ms
-        # Linux uses -c for count, -W for timeout in seconds
-        if platform.system().lower() == "windows":
-            command = ["ping", "-n", "1", "-w", str(timeout * 1000), ip_str]
+def enrich_host(ip_str, open_ports, probes=None, mac="N/A", dns_ttl=DNS_CACHE_TTL, previous=None, identity=None):
+    """
+    DNS inverse, OS et EOL d'un hôte vivant -> ligne du rapport
+    previous : entrée du snapshot précédent (mode incrémental)
+    identity : (nom DNS, type d'OS, version exacte) déjà établis par l'agent du site, aucune sonde depuis ce poste
+    """
+    if identity:
+        hostname, detected_type, exact_os = identity
+    else:
+        # reverse dns (cache partagé)
+        hostname, detected_type, exact_os = reverse_dns(ip_str, dns_ttl), None, None
+
+    # os detection: try static mapping first, then automatic detection
+    os_detected = KNOWN_HOSTS.get(ip_str)
+
+    # incremental: same open ports as last run -> reuse the previous detection
+    if not os_detected and previous and sorted(previous.get("ports", [])) == sorted(open_ports):
+        os_detected = previous.get("os")
+
+    if not os_detected and not identity:
+        # bannières lues pendant le scan, sinon requête SMB + NetBIOS : pas de fingerprinting
+        exact_os, windows_name = detect_exact_os(ip_str, probes)
+        hostname = hostname or windows_name
+    if not os_detected and exact_os:
+        os_detected = exact_os
+
+    if not os_detected:
+        # fallback to automatic detection
+        # ping et ports déjà testés par le scan : seuls les ports manquants sont sondés
+        detected_type = detected_type or detect_os_type(ip_str, probes)
+        if detected_type == "linux_ssh":
+            os_detected = "Linux (SSH détecté)"
+        elif detected_type == "windows_remote":
+            os_detected = "Windows (RPC/SMB détecté)"
         else:
-            command = ["ping", "-c", "1", "-W", str(timeout), ip_str]
-        
-        result = subprocess.run(
-            command,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=timeout + 1
-        )
-        return result.returncode == 0
-    except:
-        return False
-
-def scan_single_host(ip_str, ports_to_scan):
-    open_ports = []
-    is_alive = False
-
-    # First try ICMP ping
-    if ping_host(ip_str, timeout=1):
-        is_alive = True
-
-    # Then test ports (with increased timeout for reliability)
-    for port in ports_to_scan:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.5)
-        res = sock.connect_ex((ip_str, port))
-        sock.close()
-        if res == 0:
-            is_alive = True
-            open_ports.append(port)
-
-    return ip_str, is_alive, open_ports
-
-def scan_subnet_and_export(profile, ports_to_scan):
-    """scan network, OS & EOL + CSV"""
+            os_detected = "OS Inconnu"
+
+    if hostname:
+        # apply alias if available
+        display_name = HOSTNAME_ALIASES.get(hostname, hostname)
+    else:
+        display_name = "N/A"
+
+    # display firewall for pfsense
+    if display_name == "N/A" and os_detected and "pfSense" in os_detected:
+        display_name = "Firewall"
+
+    # eol
+    status_eol, date_eol = get_eol_status(os_detected)
+
+    # results
+    return {
+        'IP': ip_str,
+        'Nom (DNS)': display_name,
+        'OS Détecté': os_detected,
+        'Statut Support (EOL)': status_eol,
+        'Date Fin Support': date_eol,
+        'Ports Ouverts': str(open_ports),
+        'Adresse MAC': mac
+    }
+
+def format_result_line(res):
+    """ligne console d'un hôte trouvé"""
+    ip = res['IP']
+    name = res['Nom (DNS)']
+    os_info = res['OS Détecté']
+    eol_status = res['Statut Support (EOL)']
+    eol_date = res['Date Fin Support']
+    
+    # improved alignment with proper padding
+    return f"    [+] {ip:<15} ({name:<30}) | {os_info:<35} | {eol_status:<30} (Fin: {eol_date})"
+
+def scan_subnet_and_export(profile, ports_to_scan, config=None, incremental=False, scheduler=None):
+    """
+    scan network, OS & EOL + CSV
+    incremental : hôtes du dernier snapshot re-vérifiés en premier + rapport des changements
+    scheduler : budget de sondes partagé entre sites (scan_all_networks)
+    si un agent est déclaré pour le site (config "agents"), le scan est délégué à cet agent
+    """
     
     cidr = profile['cidr']
     net_name = profile['network_name']
@@ -185,87 +239,241 @@ def scan_subnet_and_export(profile, ports_to_scan):
         print("[!] CIDR invalide.")
         return
 
-    all_hosts = list(network.hosts())
-    total_hosts = len(all_hosts)
+    # /31 et /32 n'ont ni adresse réseau ni broadcast
+    total_hosts = network.num_addresses if network.prefixlen >= 31 else network.num_addresses - 2
     print(f"[*] Analyse de {total_hosts} adresses IPs...")
 
     results_to_write = []
-
-    # scan parallele
-    with concurrent.futures.ThreadPoolExecutor(max_workers=127) as executor:
-        futures = {executor.submit(scan_single_host, str(ip), ports_to_scan): ip for ip in all_hosts}
-
-        for future in concurrent.futures.as_completed(futures):
-            ip_str, is_alive, open_ports = future.result()
-
+    config = config or {}
+    get_eol_cache(config)
+    get_fingerprint_cache(config)
+    rtt.configure(config)
+    smbprobe.configure(config)
+    streaming = total_hosts > config.get("streaming_threshold", STREAMING_THRESHOLD)
+    # très grands espaces : sondes réparties sur plusieurs processus (un par cœur)
+    shards = get_shard_count(config)
+    sharded = shards > 1 and total_hosts > config.get("shard_threshold", DEFAULT_SHARD_THRESHOLD)
+    agent = config.get("agents", {}).get(net_name)
+    if agent:
+        print(f"[*] Scan délégué à l'agent du site : {agent}")
+    elif sharded:
+        print(f"[*] Mode réparti : {shards} processus de scan.")
+
+    # toutes les sondes passent par le scheduler (concurrence + débit)
+    scan_options = get_scan_options(config)
+    if scheduler is None:
+        scheduler = ProbeScheduler(scan_options["max_in_flight"],
+                                   config.get("probes_per_second", DEFAULT_PROBES_PER_SECOND))
+    scan_options["limiter"] = SiteLimiter(scheduler, net_name)
+    scan_options["throttle"] = scheduler.reserve
+    if scan_options["scan_method"] == "syn" and not synscan.is_available():
+        print("[!] Scan SYN indisponible (CAP_NET_RAW requis), repli sur le scan connect().")
+        scan_options["scan_method"] = "connect"
+
+    # découverte passive : table de voisinage du noyau + baux DHCP
+    neighbors = {}
+    if config.get("passive_discovery", True):
+        neighbors = discover_neighbors(network, config.get("neighbor_table"), config.get("dhcp_lease_files"))
+        if neighbors:
+            print(f"[*] {len(neighbors)} hôtes déjà connus (table ARP / DHCP), scannés en priorité.")
+
+    # dernier état connu du site (référence pour le rapport de changements)
+    snapshot = load_snapshot(net_name)
+    previous_hosts = snapshot.get("hosts", {}) if incremental and snapshot else {}
+    if incremental:
+        if previous_hosts:
+            print(f"[*] Mode incrémental : {len(previous_hosts)} hôtes du dernier scan re-vérifiés en priorité.")
+        else:
+            print("[*] Mode incrémental : aucun scan précédent, audit complet.")
+
+    # ordre de sondage : hôtes déclarés et déjà vus vivants d'abord, ports habituels en tête
+    alive_history, port_history = {}, {}
+    if config.get("history_enabled", True):
+        try:
+            alive_history, port_history = recent_activity(net_name, config.get("hotlist_runs", 10))
+        except Exception as e:
+            print(f"[!] Historique indisponible pour l'ordre de scan : {e}")
+    hotlist = build_hotlist(network, KNOWN_HOSTS, snapshot, alive_history, port_history)
+    if hotlist:
+        print(f"[*] {len(hotlist)} hôtes connus (KNOWN_HOSTS / audits précédents) sondés en premier.")
+    pending_hot = set(hotlist.scores)
+    scan_started = time.monotonic()
+
+    # enrichissement (DNS, OS, EOL) dans son propre pool borné :
+    # la boucle de scan ne fait que soumettre les hôtes vivants
+    dns_ttl = config.get("dns_cache_ttl", DNS_CACHE_TTL)
+    probes = ProbeStore()
+    if config.get("banner_capture", True):
+        # bannières lues sur les connexions du scan lui-même
+        scan_options["on_banner"] = probes.record_banner
+    enrich_futures = []
+    found_count = 0
+    # scan incomplet (shard en échec, flux de l'agent coupé) : le rapport est écrit, l'état de référence n'est pas touché
+    incomplete = None
+
+    # streaming : lignes CSV et console écrites au fil de l'eau, tri externe à la fin
+    if streaming:
+        print("[*] Mode streaming : résultats affichés au fil de l'eau, rapport trié en fin de scan.")
+        part_path = filepath + ".part"
+        part_file = open(part_path, 'w', newline='', encoding='utf-8-sig')
+        part_writer = csv.DictWriter(part_file, fieldnames=AUDIT_FIELDNAMES, delimiter=';')
+        part_writer.writeheader()
+        write_lock = threading.Lock()
+
+        def emit_row(future):
+            nonlocal found_count
+            try:
+                res = future.result()
+            except Exception as e:
+                print(f"[ERREUR] Enrichissement : {e}")
+                return
+            with write_lock:
+                part_writer.writerow(res)
+                found_count += 1
+                print(format_result_line(res))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.get("enrichment_workers", 16)) as enricher:
+        def mark_checked(ip_str):
+            if ip_str in pending_hot:
+                pending_hot.discard(ip_str)
+                if not pending_hot:
+                    print(f"[*] Hôtes connus vérifiés en {time.monotonic() - scan_started:.1f}s, "
+                          f"suite du balayage...")
+
+        def submit_host(result):
+            ip_str, is_alive, open_ports, ttl = result
+            mark_checked(ip_str)
             if is_alive:
-                # reverse dns
-                try:
-                    hostname = socket.gethostbyaddr(ip_str)[0]
-                    # apply alias if available
-                    display_name = HOSTNAME_ALIASES.get(hostname, hostname)
-                except:
-                    hostname = "N/A"
-                    display_name = "N/A"
-                
-                # os detection: try static mapping first, then automatic detection
-                os_detected = KNOWN_HOSTS.get(ip_str)
-                
-                if not os_detected:
-                    # fallback to automatic detection
-                    detected_type = detect_os_type(ip_str)
-                    if detected_type == "linux_ssh":
-                        os_detected = "Linux (SSH détecté)"
-                    elif detected_type == "windows_remote":
-                        os_detected = "Windows (RPC/SMB détecté)"
-                    else:
-                        os_detected = "OS Inconnu"
-
-                # display firewall for pfsense
-                if display_name == "N/A" and os_detected and "pfSense" in os_detected:
-                    display_name = "Firewall"
-
-                # eol
-                status_eol, date_eol = get_eol_status(os_detected)
-
-                # results
-                results_to_write.append({
-                    'IP': ip_str,
-                    'Nom (DNS)': display_name,
-                    'OS Détecté': os_detected,
-                    'Statut Support (EOL)': status_eol,
-                    'Date Fin Support': date_eol,
-                    'Ports Ouverts': str(open_ports)
-                })
-
-    results_to_write.sort(key=lambda x: ipaddress.IPv4Address(x['IP']))
+                probes.record_icmp(ip_str, ttl)
+                probes.record_ports(ip_str, ports_to_scan, open_ports)
+                queue_row(enricher.submit(
+                    enrich_host, ip_str, open_ports, probes, neighbors.get(ip_str, "N/A"), dns_ttl,
+                    previous_hosts.get(ip_str)
+                ))
+
+        def submit_remote_host(ip_str, open_ports, ttl, hostname, os_type, exact_os, mac):
+            # DNS et OS établis sur le site : seuls alias, KNOWN_HOSTS et EOL restent au siège
+            mark_checked(ip_str)
+            queue_row(enricher.submit(
+                enrich_host, ip_str, open_ports, None, mac, dns_ttl, previous_hosts.get(ip_str),
+                (hostname, os_type, exact_os)
+            ))
+
+        def queue_row(future):
+            if streaming:
+                future.add_done_callback(emit_row)
+            else:
+                enrich_futures.append(future)
 
-    # display
-    for res in results_to_write:
-        ip = res['IP']
-        name = res['Nom (DNS)']
-        os_info = res['OS Détecté']
-        eol_status = res['Statut Support (EOL)']
-        eol_date = res['Date Fin Support']
-        
-        # improved alignment with proper padding
-        print(f"    [+] {ip:<15} ({name:<30}) | {os_info:<35} | {eol_status:<30} (Fin: {eol_date})")
+        if agent:
+            try:
+                remote_scan(agent, profile, ports_to_scan, submit_remote_host, config.get("agent_token", ""),
+                            hot=hotlist.hot_hosts())
+            except AgentConfigError:
+                # jeton ou profil refusé : erreur de configuration, pas de scan direct à travers le WAN
+                if streaming:
+                    part_file.close()
+                    os.remove(part_path)
+                raise
+            except AgentError as e:
+                if e.received:
+                    print(f"[ERREUR] Agent {agent} : {e} ({e.received} hôtes reçus)")
+                    incomplete = f"agent {agent} : {e}"
+                else:
+                    # agent injoignable : scan direct depuis ce poste
+                    print(f"[!] Agent {agent} indisponible ({e}), scan direct depuis ce poste.")
+                    agent = None
+
+        # scan asyncio : tous les couples (hôte, port) en parallèle sous une seule limite
+        if agent:
+            pass
+        elif sharded:
+            try:
+                sharded_scan(network, ports_to_scan, submit_host, shards, config, scan_options["scan_method"],
+                             known_alive=neighbors, hotlist=hotlist)
+            except ShardError as e:
+                incomplete = str(e)
+        elif streaming:
+            stream_hosts(hotlist.order_hosts(network.hosts()), ports_to_scan, submit_host, known_alive=neighbors,
+                         priority=hotlist.scores, port_order=hotlist.port_order,
+                         chunk_size=config.get("stream_chunk_size", DEFAULT_CHUNK_SIZE),
+                         max_chunks=config.get("stream_max_chunks", DEFAULT_MAX_CHUNKS), **scan_options)
+        else:
+            scan_hosts(network.hosts(), ports_to_scan, known_alive=neighbors, priority=hotlist.scores,
+                       port_order=hotlist.port_order, on_result=submit_host, **scan_options)
+
+        for future in concurrent.futures.as_completed(enrich_futures):
+            results_to_write.append(future.result())
+
+    if streaming:
+        part_file.close()
+        try:
+            external_sort_csv(part_path, filepath)
+            os.remove(part_path)
+            print(f"\n\n[OK] Scan terminé. {found_count} machines trouvées.")
+            print(f"[FICHIER] Rapport généré : {filepath}")
+        except Exception as e:
+            print(f"\n[ERREUR] Problème lors du tri du CSV ({part_path}) : {e}")
+            return
+        # snapshot et diff relisent le rapport trié plutôt que de garder les lignes en mémoire
+        results_to_write = iter_report_rows(filepath)
+    else:
+        results_to_write.sort(key=lambda x: ipaddress.IPv4Address(x['IP']))
+
+        # display
+        for res in results_to_write:
+            print(format_result_line(res))
+
+        # csv
+        try:
+            with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=AUDIT_FIELDNAMES, delimiter=';')
+                writer.writeheader()
+                writer.writerows(results_to_write)
+
+                print(f"\n\n[OK] Scan terminé. {len(results_to_write)} machines trouvées.")
+                print(f"[FICHIER] Rapport généré : {filepath}")
+                
+        except Exception as e:
+            print(f"\n[ERREUR] Problème lors de l'écriture CSV : {e}")
 
-    # csv
-    try:
-        with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            fieldnames = ['IP', 'Nom (DNS)', 'OS Détecté', 'Statut Support (EOL)', 'Date Fin Support', 'Ports Ouverts']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';')
-            writer.writeheader()
-            writer.writerows(results_to_write)
+    if incomplete:
+        # hôtes non reçus : ils passeraient pour disparus dans le diff, le snapshot et l'historique
+        print(f"\n[!] Scan incomplet ({incomplete}).")
+        print("[!] Rapport partiel : ni changements, ni snapshot, ni historique, ni synthèse pour ce passage.")
+        return None
 
-            print(f"\n\n[OK] Scan terminé. {len(results_to_write)} machines trouvées.")
-            print(f"[FICHIER] Rapport généré : {filepath}")
-            
-    except Exception as e:
-        print(f"\n[ERREUR] Problème lors de l'écriture CSV : {e}")
+    # rapport des changements depuis le dernier scan
+    if incremental and snapshot:
+        changes = diff_snapshot(snapshot, iter_report_rows(filepath) if streaming else results_to_write)
+        print(f"\n[*] Changements depuis le {snapshot.get('scan_date', '?')[:16]} : {len(changes)}")
+        for change in changes:
+            print(f"    [{change['Type']}] {change['IP']:<15} {change['Avant']} -> {change['Après']}")
 
-def scan_all_networks(config):
+        if changes:
+            diff_path = os.path.join(LOGS_DIR, f"DIFF_{safe_name}_{timestamp}.csv")
+            try:
+                write_change_report(changes, diff_path)
+                print(f"[FICHIER] Rapport des changements : {diff_path}")
+            except OSError as e:
+                print(f"[ERREUR] Écriture du rapport des changements : {e}")
+
+    save_snapshot(net_name, cidr, iter_report_rows(filepath) if streaming else results_to_write)
+
+    # historique SQLite (requêtes par IP / port / date)
+    if config.get("history_enabled", True):
+        try:
+            record_audit(net_name, cidr, iter_report_rows(filepath) if streaming else results_to_write)
+        except Exception as e:
+            print(f"[ERREUR] Enregistrement dans l'historique : {e}")
+
+    # représentation compacte (ip entière, bitmap des ports, OS / EOL codés) pour la synthèse inter-sites
+    table = ResultTable.from_rows(net_name, ports_to_scan, iter_report_rows(filepath) if streaming else results_to_write,
+                                  cidr)
+    save_table(table)
+    return table
+
+def scan_all_networks(config, incremental=False):
     """Scan all network profiles simultaneously"""
     profiles = config.get("scan_profiles", [])
     ports = config.get("ports_to_scan", [21, 22, 80, 445])
@@ -274,17 +482,34 @@ def scan_all_networks(config):
         print("[!] Aucun profil de réseau trouvé dans la configuration.")
         return
     
+    # un seul budget pour tous les sites : charge prévisible quel que soit le nombre de profils
+    scheduler = create_scheduler(config)
+    rate = f"{scheduler.rate} sondes/s" if scheduler.rate else "débit illimité"
+
     print(f"\n[*] Démarrage de l'audit simultané sur {len(profiles)} réseaux...")
-    print("[*] Cette opération peut prendre plusieurs minutes.\n")
+    print(f"[*] Budget global : {scheduler.max_in_flight} sondes simultanées, {rate}.\n")
     
+    # tables du passage précédent, avant qu'elles ne soient remplacées
+    previous_tables = {}
+    for profile in profiles:
+        table = load_table(profile['network_name'])
+        if table is not None:
+            previous_tables[profile['network_name']] = table
+
     # ThreadPoolExecutor to scan all networks in parallel
+    tables = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(profiles)) as executor:
-        futures = {executor.submit(scan_subnet_and_export, profile, ports): profile for profile in profiles}
+        futures = {
+            executor.submit(scan_subnet_and_export, profile, ports, config, incremental, scheduler): profile
+            for profile in profiles
+        }
         
         for future in concurrent.futures.as_completed(futures):
             profile = futures[future]
             try:
-                future.result()
+                table = future.result()
+                if table is not None:
+                    tables.append(table)
             except Exception as e:
                 print(f"\n[ERREUR] Échec du scan pour {profile['network_name']}: {e}")
     
@@ -293,7 +518,38 @@ def scan_all_networks(config):
     print(f"[INFO] {len(profiles)} rapports CSV ont été générés dans {LOGS_DIR}")
     print("="*60)
 
-def lookup_os_versions():
+    if tables:
+        tables.sort(key=lambda table: table.site)
+        print_cross_site_summary(tables, previous_tables, ports)
+
+def print_cross_site_summary(tables, previous_tables, ports):
+    """exposition des ports, OS obsolètes et changements, site par site"""
+    summary = cross_site_summary(tables, previous_tables, ports)
+
+    print("\n--- SYNTHÈSE INTER-SITES ---")
+    header = f"{'SITE':<30} | {'HÔTES':>5} | " + " | ".join(f"{port:>5}" for port in ports) + " | OBSOLÈTES"
+    print(header)
+    print("-" * len(header))
+    for line in summary:
+        exposure = " | ".join(f"{line['exposure'].get(port, 0):>5}" for port in ports)
+        print(f"{line['site']:<30} | {line['hosts']:>5} | {exposure} | {line['obsolete']} "
+              f"(+{line['soon_obsolete']} bientôt)")
+        for os_name, count in sorted(line["obsolete_os"].items(), key=lambda item: -item[1]):
+            print(f"    [!] {count} x {os_name}")
+        changes = line["changes"]
+        if changes and (changes["new_hosts"] or changes["gone_hosts"] or changes["opened"] or changes["closed"]):
+            print(f"    [*] Depuis le dernier audit : +{changes['new_hosts']} / -{changes['gone_hosts']} hôtes, "
+                  f"ports ouverts {changes['opened'] or '{}'}, fermés {changes['closed'] or '{}'}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = os.path.join(LOGS_DIR, f"SYNTHESE_{timestamp}.csv")
+    try:
+        write_summary_csv(summary, ports, filepath)
+        print(f"[FICHIER] Synthèse inter-sites : {filepath}")
+    except OSError as e:
+        print(f"[ERREUR] Écriture de la synthèse : {e}")
+
+def lookup_os_versions(config=None):
     """EOL lookup for given OS"""
     clear_screen()
     print("\n--- RECHERCHE MANUELLE EOL ---")
@@ -303,78 +559,57 @@ def lookup_os_versions():
     if not target:
         return
 
-    url = f"https://endoflife.date/api/v1/products/{target}"
-    
-    try:
-        response = requests.get(url, timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            releases = []
-
-            if isinstance(data, dict):
-                if "result" in data and "releases" in data["result"]:
-                    releases = data["result"]["releases"]
-                elif "releases" in data:
-                    releases = data["releases"]
-            elif isinstance(data, list):
-                releases = data
-
-            if not releases:
-                print(f"[!] Pas de versions trouvées pour '{target}' (Format inattendu).")
-                wait_for_user()
-                return
+    catalog = get_eol_catalog()
+    if catalog.is_loaded():
+        # index local : recherche par préfixe et tolérante aux fautes
+        matches = catalog.search(target)
+        if not matches:
+            print(f"[!] Aucun produit ne correspond à '{target}'.")
+            wait_for_user()
+            return
 
-            # display
-            print(f"\nRésultats pour '{target}' :")
-            print(f"{'VERSION':<15} | {'FIN DE SUPPORT (EOL)':<15} | {'STATUT ACTUEL'}")
-            print("-" * 50)
-            
-            today = datetime.now().date()
-            warning = today + timedelta(days=180)
-            
-            for release in releases:
-                # codename
-                version_name = release.get('name', 'N/A')
-                codename = release.get('codename')
-                if codename and isinstance(codename, str):
-                    display_name = f"{version_name} ({codename})"
-                else:
-                    display_name = version_name
-                
-                # date eol 
-                eol_str = release.get('eolFrom') or release.get('eol')
-                
-                status = "Supporté"
-                display_date = str(eol_str)
-
-                if isinstance(eol_str, str) and len(eol_str) >= 10:
-                    try:
-                        eol_date = datetime.strptime(eol_str[:10], "%Y-%m-%d").date()
-                        
-                        if eol_date < today:
-                            status = "Obsolète"
-                        elif eol_date < warning:
-                            status = "Bientôt obsolète"
-                        else:
-                            status = "Supporté"
-                    except ValueError:
-                        pass 
-                
-                if release.get('isEol') is True:
-                    status = "Obsolète"
+        product = catalog.resolve(target)
+        if product is None and len(matches) == 1:
+            product = matches[0]
+        if product is None:
+            print(f"\nProduits correspondant à '{target}' :")
+            for i, slug in enumerate(matches):
+                print(f"{i + 1}. {slug} ({catalog.products[slug]['label']})")
+            choice = input("Votre choix : ").strip()
+            if not choice.isdigit() or not 0 < int(choice) <= len(matches):
+                return
+            product = matches[int(choice) - 1]
+        releases = catalog.releases(product)
+        print(f"[*] Catalogue local du {catalog.synced_at}.")
+    else:
+        print("[*] Catalogue local absent (voir Synchroniser le catalogue EOL), recherche en ligne...")
+        product = target
+        # api_base_url / api_timeout d'audit.json, même si aucun audit n'a encore créé le cache
+        cache = get_eol_cache(config)
+        try:
+            releases = cache.get_releases(product)
+        except Exception as e:
+            print(f"[ERREUR] Problème de connexion ou de parsing : {e}")
+            wait_for_user()
+            return
+        if not releases:
+            error = cache.last_error(product)
+            print(f"[!] Produit '{target}' introuvable dans l'API" + (f" ({error})." if error else "."))
+            wait_for_user()
+            return
+        releases = [compact_release(release) for release in releases]
 
-                if eol_str is False or eol_str is None:
-                    display_date = "Toujours supporté"
-                    status = "Supporté"
+    # display
+    print(f"\nRésultats pour '{product}' :")
+    print(f"{'VERSION':<15} | {'FIN DE SUPPORT (EOL)':<15} | {'STATUT ACTUEL'}")
+    print("-" * 50)
 
-                print(f"{display_name:<25} | {display_date:<15} | {status}")
+    for release in releases:
+        name, codename = release[NAME], release[CODENAME]
+        display_name = f"{name} ({codename})" if codename else name
+        status, display_date = release_status(release)
+        print(f"{display_name:<25} | {display_date:<15} | {status}")
 
-        else:
-            print(f"[!] Produit '{target}' introuvable dans l'API (Erreur {response.status_code}).")
-            
-    except Exception as e:
-        print(f"[ERREUR] Problème de connexion ou de parsing : {e}")
-    
     wait_for_user()
 
 def scan_menu():
@@ -395,9 +630,15 @@ def scan_menu():
 
         opt_scan_all = len(profiles) + 1
         opt_encyclopedia = len(profiles) + 2
+        opt_incremental = len(profiles) + 3
+        opt_history = len(profiles) + 4
+        opt_sync_eol = len(profiles) + 5
         
         print(f"{opt_scan_all}. Auditer TOUS les réseaux simultanément")
         print(f"{opt_encyclopedia}. Encyclopédie (Recherche EOL d'un OS)")
+        print(f"{opt_incremental}. Audit incrémental de TOUS les réseaux (changements depuis le dernier scan)")
+        print(f"{opt_history}. Historique (recherche par IP / port, réexport)")
+        print(f"{opt_sync_eol}. Synchroniser le catalogue EOL (encyclopédie hors ligne)")
         
         print("q. Retour")
         
@@ -408,7 +649,19 @@ def scan_menu():
             wait_for_user()
         
         elif choice == str(opt_encyclopedia):
-            lookup_os_versions()
+            lookup_os_versions(config)
+
+        elif choice == str(opt_incremental):
+            scan_all_networks(config, incremental=True)
+            wait_for_user()
+
+        elif choice == str(opt_history):
+            query_menu()
+            wait_for_user()
+
+        elif choice == str(opt_sync_eol):
+            sync_catalog(config)
+            wait_for_user()
 
         elif choice.isdigit():
             index = int(choice) - 1
@@ -416,9 +669,24 @@ def scan_menu():
                 target = profiles[index]
                 ports = config.get("ports_to_scan", [21, 22, 80, 445])
 
-                scan_subnet_and_export(target, ports)
+                try:
+                    scan_subnet_and_export(target, ports, config)
+                except AgentConfigError as e:
+                    print(f"\n[ERREUR] Agent refusé pour {target['network_name']} : {e}")
+                    print("[!] Vérifiez agent_token et agent_profiles (audit.json du siège et de l'agent).")
                 wait_for_user()
             else:
                 print("Choix invalide.")
         elif choice == 'q':
-            break
\ No newline at end of file
+            break
+
+if __name__ == "__main__":
+    # lancement planifié (cron) : python -m modules.audit --incremental
+    # mise à jour du catalogue EOL local : python -m modules.audit --sync-eol
+    import sys
+
+    config = load_config()
+    if config and "--sync-eol" in sys.argv:
+        sync_catalog(config)
+    elif config:
+        scan_all_networks(config, incremental="--incremental" in sys.argv)
@@ -0,0 +1,135 @@
+import re
+import ssl
+import asyncio
+
+DEFAULT_BANNER_TIMEOUT = 0.3
+MAX_BANNER_BYTES = 512
+
+# le serveur parle en premier (SSH, FTP, SMTP, POP3, IMAP)
+GREETING_PORTS = {21, 22, 25, 110, 143}
+# en-tête Server d'une requête HEAD (en clair ou après la négociation TLS)
+HTTP_PORTS = {80, 8000, 8080}
+TLS_PORTS = {443, 8443}
+BANNER_PORTS = GREETING_PORTS | HTTP_PORTS | TLS_PORTS
+
+SERVER_HEADER = re.compile(rb"^server:[ \t]*(.+?)\r?$", re.IGNORECASE | re.MULTILINE)
+
+# bannière SSH -> version (paquets OpenSSH propres à chaque release)
+SSH_RELEASES = [
+    ("OpenSSH_7.2p2 Ubuntu-4ubuntu2", "Ubuntu 16.04 LTS"),
+    ("OpenSSH_7.6p1 Ubuntu-4ubuntu0", "Ubuntu 18.04 LTS"),
+    ("OpenSSH_8.2p1 Ubuntu-4ubuntu0", "Ubuntu 20.04 LTS"),
+    ("OpenSSH_8.9p1 Ubuntu-3ubuntu0", "Ubuntu 22.04 LTS"),
+    ("OpenSSH_9.6p1 Ubuntu-3ubuntu13", "Ubuntu 24.04 LTS"),
+]
+# paquets RHEL / CentOS : version nue, sans suffixe de distribution
+SSH_BARE_RELEASES = {
+    "OpenSSH_7.4": "CentOS 7",
+    "OpenSSH_8.0": "CentOS 8",
+}
+SSH_DEBIAN = re.compile(r"Debian-\S*deb(\d+)u")
+
+# en-tête Server -> version (versions figées par la distribution)
+HTTP_RELEASES = [
+    ("Apache/2.4.18 (Ubuntu)", "Ubuntu 16.04 LTS"),
+    ("Apache/2.4.29 (Ubuntu)", "Ubuntu 18.04 LTS"),
+    ("Apache/2.4.41 (Ubuntu)", "Ubuntu 20.04 LTS"),
+    ("Apache/2.4.52 (Ubuntu)", "Ubuntu 22.04 LTS"),
+    ("Apache/2.4.58 (Ubuntu)", "Ubuntu 24.04 LTS"),
+    ("Apache/2.4.6 (CentOS)", "CentOS 7"),
+    ("nginx/1.10.3 (Ubuntu)", "Ubuntu 16.04 LTS"),
+    ("nginx/1.14.0 (Ubuntu)", "Ubuntu 18.04 LTS"),
+    ("nginx/1.24.0 (Ubuntu)", "Ubuntu 24.04 LTS"),
+    ("Microsoft-IIS/7.5", "Windows Server 2008 R2"),
+    ("Microsoft-IIS/8.0", "Windows Server 2012"),
+    ("Microsoft-IIS/8.5", "Windows Server 2012 R2"),
+]
+
+# versions Linux reconnues -> cycle endoflife.date (Windows : smbprobe.WINDOWS_API_MAPPING)
+BANNER_API_MAPPING = {
+    "Ubuntu 16.04 LTS": ("ubuntu", "16.04"),
+    "Ubuntu 18.04 LTS": ("ubuntu", "18.04"),
+    "Ubuntu 20.04 LTS": ("ubuntu", "20.04"),
+    "Ubuntu 22.04 LTS": ("ubuntu", "22.04"),
+    "Ubuntu 24.04 LTS": ("ubuntu", "24.04"),
+    "CentOS 7": ("centos", "7"),
+    "CentOS 8": ("centos", "8"),
+    "Debian 8": ("debian", "8"),
+    "Debian 9": ("debian", "9"),
+    "Debian 10": ("debian", "10"),
+    "Debian 11": ("debian", "11"),
+    "Debian 12": ("debian", "12"),
+    "Debian 13": ("debian", "13"),
+}
+
+_tls_context = None
+
+
+def _get_tls_context():
+    # identification seulement : aucun certificat vérifié, aucune donnée envoyée hormis HEAD
+    global _tls_context
+    if _tls_context is None:
+        _tls_context = ssl.create_default_context()
+        _tls_context.check_hostname = False
+        _tls_context.verify_mode = ssl.CERT_NONE
+    return _tls_context
+
+
+async def _read_greeting(reader):
+    data = await reader.read(MAX_BANNER_BYTES)
+    return data.split(b"\n", 1)[0].strip().decode("ascii", "replace")
+
+
+async def _read_server_header(ip, port, reader, writer):
+    if port in TLS_PORTS:
+        await writer.start_tls(_get_tls_context())
+    writer.write(f"HEAD / HTTP/1.0\r\nHost: {ip}\r\n\r\n".encode("ascii"))
+    try:
+        headers = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        headers = e.partial
+    match = SERVER_HEADER.search(headers[:4096])
+    return match.group(1).decode("ascii", "replace").strip() if match else None
+
+
+async def read_banner(ip, port, reader, writer, timeout=DEFAULT_BANNER_TIMEOUT):
+    """
+    banner of a connection the scan already opened: greeting line (SSH, FTP...)
+    or HTTP Server header (HEAD, over TLS on 443) ; None if nothing before the deadline
+    """
+    if port not in BANNER_PORTS:
+        return None
+    try:
+        if port in GREETING_PORTS:
+            banner = await asyncio.wait_for(_read_greeting(reader), timeout)
+        else:
+            banner = await asyncio.wait_for(_read_server_header(ip, port, reader, writer), timeout)
+    # AttributeError : StreamWriter.start_tls absent avant Python 3.11
+    except (OSError, asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError, AttributeError):
+        return None
+    return banner or None
+
+
+def os_from_banners(banners):
+    """
+    {port: banner} -> version name (key of BANNER_API_MAPPING / WINDOWS_API_MAPPING), None if unknown
+    SSH first (package version tied to one release), then HTTP Server headers
+    """
+    for banner in banners.values():
+        if not banner.startswith("SSH-"):
+            continue
+        software = banner.split("-", 2)[-1]
+        for prefix, os_name in SSH_RELEASES:
+            if software.startswith(prefix):
+                return os_name
+        debian = SSH_DEBIAN.search(software)
+        if debian:
+            return f"Debian {debian.group(1)}"
+        if software.strip() in SSH_BARE_RELEASES:
+            return SSH_BARE_RELEASES[software.strip()]
+
+    for banner in banners.values():
+        for prefix, os_name in HTTP_RELEASES:
+            if banner.startswith(prefix):
+                return os_name
+    return None
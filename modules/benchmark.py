@@ -0,0 +1,366 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+import threading
+import functools
+import ipaddress
+import subprocess
+import contextlib
+from datetime import datetime
+import psutil
+from . import audit, diagnostic, fingerprints, metrics, rtt, utils
+from .utils import FINGERPRINT_PORTS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "configs", "benchmark.json")
+BASELINE_FILE = os.path.join(BASE_DIR, "configs", "benchmark_baseline.json")
+
+DEFAULT_TOLERANCE = 0.10
+SAMPLE_INTERVAL = 0.02
+
+# métriques où une valeur plus haute est meilleure (les autres : plus basse)
+HIGHER_IS_BETTER = {"hosts_per_sec", "probes_per_sec"}
+METRICS = ["elapsed_s", "hosts_per_sec", "probes_per_sec", "peak_threads", "peak_rss_mb", "first_result_s"]
+
+
+class SimulatedSubnet:
+    """
+    fake /24 on loopback addresses (127.0.0.0/8 is local on Linux)
+    - live hosts: listeners on listening_ports (connection accepted then closed)
+    - dead hosts, latency, loss: tc netem on lo, limited to the simulated subnet
+      (root + sch_prio / sch_netem required, otherwise every address answers)
+    """
+
+    def __init__(self, cidr, listening_ports, live_ratio=0.5, dead_ratio=0.0, latency_ms=0, drop_rate=0.0, seed=42):
+        self.network = ipaddress.IPv4Network(cidr)
+        self.listening_ports = listening_ports
+        self.latency_ms = latency_ms
+        self.drop_rate = drop_rate
+
+        hosts = [str(ip) for ip in self.network.hosts()]
+        rng = random.Random(seed)
+        rng.shuffle(hosts)
+        dead_count = int(len(hosts) * dead_ratio)
+        self.dead = set(hosts[:dead_count])
+        self.live = sorted(hosts[dead_count:dead_count + int(len(hosts) * live_ratio)],
+                           key=ipaddress.IPv4Address)
+
+        self.shaped = False
+        self.unavailable_ports = 0
+        self.loop = None
+        self.thread = None
+        self.servers = []
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._listen(), self.loop).result()
+        if self.dead or self.latency_ms or self.drop_rate:
+            self.shaped = self._shape()
+
+    def stop(self):
+        if self.shaped:
+            subprocess.run(["tc", "qdisc", "del", "dev", "lo", "root"], capture_output=True)
+            self.shaped = False
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+    async def _listen(self):
+        async def handle(reader, writer):
+            writer.close()
+
+        for ip in self.live:
+            for port in self.listening_ports:
+                try:
+                    self.servers.append(await asyncio.start_server(handle, ip, port))
+                except OSError:
+                    # port déjà pris sur toutes les interfaces (ex: sshd en 0.0.0.0:22)
+                    self.unavailable_ports += 1
+
+    async def _close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    def _shape(self):
+        """prio qdisc on lo: simulated subnet -> netem (latency, loss), dead hosts -> 100% loss"""
+        current = subprocess.run(["tc", "qdisc", "show", "dev", "lo"], capture_output=True, text=True)
+        if current.returncode != 0 or "noqueue" not in current.stdout:
+            return False
+
+        commands = [
+            ["qdisc", "add", "dev", "lo", "root", "handle", "1:", "prio", "bands", "4", "priomap"] + ["0"] * 16,
+            ["qdisc", "add", "dev", "lo", "parent", "1:2", "handle", "20:", "netem",
+             "delay", f"{self.latency_ms}ms", "loss", f"{self.drop_rate * 100}%"],
+            ["qdisc", "add", "dev", "lo", "parent", "1:3", "handle", "30:", "netem", "loss", "100%"],
+        ]
+        commands += [["filter", "add", "dev", "lo", "parent", "1:", "protocol", "ip", "prio", "1", "u32",
+                      "match", "ip", "dst", f"{ip}/32", "flowid", "1:3"] for ip in sorted(self.dead)]
+        commands.append(["filter", "add", "dev", "lo", "parent", "1:", "protocol", "ip", "prio", "2", "u32",
+                         "match", "ip", "dst", str(self.network), "flowid", "1:2"])
+        try:
+            for command in commands:
+                subprocess.run(["tc"] + command, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            subprocess.run(["tc", "qdisc", "del", "dev", "lo", "root"], capture_output=True)
+            return False
+        return True
+
+
+class ResourceSampler:
+    """pic de threads et de mémoire (processus + enfants, ex: shards) pendant un scénario"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        threads, rss = 0, 0
+        for process in [self.process] + self.process.children(recursive=True):
+            try:
+                threads += process.num_threads()
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak_threads = max(self.peak_threads, threads)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self._sample()
+            self.stopped.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self._sample()
+
+
+class FirstResultWriter(io.TextIOBase):
+    """remplace stdout : repère la première ligne de résultat, jette le reste"""
+
+    def __init__(self, markers):
+        self.markers = markers
+        self.first_at = None
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        if self.first_at is None and any(marker in text for marker in self.markers):
+            with self.lock:
+                if self.first_at is None:
+                    self.first_at = time.monotonic()
+        return len(text)
+
+
+def _reset_caches():
+    """chaque scénario part à froid : DNS, empreintes d'OS et RTT oubliés"""
+    with utils._dns_lock:
+        utils._dns_cache.clear()
+    fingerprints._cache = fingerprints.FingerprintCache(cache_file=None)
+    with rtt._lock:
+        rtt._estimators.clear()
+
+
+def _measure(run, hosts, probes, markers):
+    _reset_caches()
+    writer = FirstResultWriter(markers)
+    with ResourceSampler() as sampler, contextlib.redirect_stdout(writer):
+        started = time.monotonic()
+        run()
+        elapsed = time.monotonic() - started
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "hosts_per_sec": round(hosts / elapsed, 1),
+        "probes_per_sec": round(probes / elapsed, 1),
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": round(sampler.peak_rss / 1024 / 1024, 1),
+        "first_result_s": round(writer.first_at - started, 3) if writer.first_at else None
+    }
+
+
+@contextlib.contextmanager
+def isolated_state(work_dir):
+    """
+    rapports, snapshots, tables, métriques et inventaire dans un dossier temporaire
+    (pas d'effet sur les vrais audits ni sur logs/metrics.db)
+    """
+    saved = (audit.LOGS_DIR, audit.load_snapshot, audit.save_snapshot, audit.load_table, audit.save_table,
+             diagnostic.CONFIG_FILE, diagnostic.LOGS_DIR, fingerprints._cache, metrics._store)
+    snapshot_dir = os.path.join(work_dir, "snapshots")
+    table_dir = os.path.join(work_dir, "tables")
+    audit.LOGS_DIR = os.path.join(work_dir, "logs")
+    audit.load_snapshot = functools.partial(audit.load_snapshot, snapshot_dir=snapshot_dir)
+    audit.save_snapshot = functools.partial(audit.save_snapshot, snapshot_dir=snapshot_dir)
+    audit.load_table = functools.partial(audit.load_table, table_dir=table_dir)
+    audit.save_table = functools.partial(audit.save_table, table_dir=table_dir)
+    diagnostic.LOGS_DIR = audit.LOGS_DIR
+    metrics._store = metrics.MetricStore(os.path.join(work_dir, "metrics.db"))
+    try:
+        yield
+    finally:
+        metrics._store.close()
+        (audit.LOGS_DIR, audit.load_snapshot, audit.save_snapshot, audit.load_table, audit.save_table,
+         diagnostic.CONFIG_FILE, diagnostic.LOGS_DIR, fingerprints._cache, metrics._store) = saved
+
+
+def run_suite(bench_config, audit_config):
+    """
+    scenarios: one site (scan_subnet_and_export), every site at once
+    (scan_all_networks over `sites` slices of the subnet), diagnostic of
+    `diagnostic_machines` live hosts (scan_all_machines)
+    return : {scenario: metrics}
+    """
+    subnet = SimulatedSubnet(
+        bench_config.get("subnet", "127.77.0.0/24"),
+        bench_config.get("listening_ports", [22, 80, 443]),
+        bench_config.get("live_ratio", 0.5),
+        bench_config.get("dead_ratio", 0.0),
+        bench_config.get("latency_ms", 0),
+        bench_config.get("drop_rate", 0.0),
+        bench_config.get("seed", 42)
+    )
+    ports = bench_config.get("ports_to_scan", [21, 22, 80, 443, 445])
+    network = subnet.network
+    addresses = network.num_addresses - 2
+    results = {}
+
+    config = dict(audit_config)
+    config.update(bench_config.get("audit_overrides", {}))
+
+    work_dir = tempfile.mkdtemp(prefix="audit_bench_")
+    subnet.start()
+    shaped = subnet.shaped
+    try:
+        if (subnet.dead or subnet.latency_ms or subnet.drop_rate) and not subnet.shaped:
+            print("[!] tc/netem indisponible (root + sch_prio/sch_netem requis) : "
+                  "latence, pertes et hôtes morts non simulés.")
+        if subnet.unavailable_ports:
+            print(f"[!] {subnet.unavailable_ports} ports d'écoute déjà utilisés sur la machine, ignorés.")
+        print(f"[*] Sous-réseau simulé {network} : {len(subnet.live)} hôtes avec services, "
+              f"{len(subnet.dead) if subnet.shaped else 0} hôtes morts.")
+
+        with isolated_state(work_dir):
+            profile = {"network_name": "Benchmark", "cidr": str(network)}
+            print("[*] Scénario : scan_subnet_and_export")
+            results["scan_subnet_and_export"] = _measure(
+                lambda: audit.scan_subnet_and_export(profile, ports, config),
+                addresses, addresses * (len(ports) + 1), ["[+]"]
+            )
+
+            sites = max(1, bench_config.get("sites", 4))
+            prefix = min(30, network.prefixlen + (sites - 1).bit_length())
+            site_config = dict(config, scan_profiles=[
+                {"network_name": f"Benchmark {i + 1}", "cidr": str(site)}
+                for i, site in enumerate(network.subnets(new_prefix=prefix))
+            ], ports_to_scan=ports)
+            site_addresses = sum(site.num_addresses - 2 for site in network.subnets(new_prefix=prefix))
+            print("[*] Scénario : scan_all_networks")
+            results["scan_all_networks"] = _measure(
+                lambda: audit.scan_all_networks(site_config),
+                site_addresses, site_addresses * (len(ports) + 1), ["[+]"]
+            )
+
+            machines = subnet.live[:bench_config.get("diagnostic_machines", 8)]
+            inventory_path = os.path.join(work_dir, "diagnostic.json")
+            with open(inventory_path, 'w', encoding='utf-8') as f:
+                json.dump({str(i + 1): {"name": f"Bench {ip}", "type": "windows_remote", "ip": ip,
+                                        "user": "bench", "password": "bench"}
+                           for i, ip in enumerate(machines)}, f)
+            diagnostic.CONFIG_FILE = inventory_path
+            # ping + empreinte d'OS + 3 ports par machine
+            diag_probes = len(machines) * (1 + len(FINGERPRINT_PORTS) + 3)
+            print("[*] Scénario : scan_all_machines")
+            with contextlib.redirect_stderr(io.StringIO()):
+                sys.stdin, saved_stdin = io.StringIO("n\n"), sys.stdin
+                try:
+                    results["scan_all_machines"] = _measure(
+                        diagnostic.scan_all_machines, len(machines), diag_probes, ["[✓]", "[!] Erreur"]
+                    )
+                finally:
+                    sys.stdin = saved_stdin
+    finally:
+        subnet.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "date": datetime.now().isoformat(timespec='seconds'),
+        "cpu_count": os.cpu_count(),
+        "shaped": shaped,
+        "scenarios": results
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """affiche les écarts à la référence ; return : liste des régressions (scénario, métrique)"""
+    regressions = []
+    print(f"\n{'SCÉNARIO':<24} | {'MÉTRIQUE':<15} | {'ACTUEL':>10} | {'RÉFÉRENCE':>10} | ÉCART")
+    print("-" * 80)
+    for scenario, measured in report["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(scenario, {}) if baseline else {}
+        for metric in METRICS:
+            value, ref = measured.get(metric), reference.get(metric)
+            if value is None or not ref:
+                print(f"{scenario:<24} | {metric:<15} | {str(value):>10} | {'-':>10} |")
+                continue
+            delta = (value - ref) / ref
+            worse = -delta if metric in HIGHER_IS_BETTER else delta
+            flag = "  [!] Régression" if worse > tolerance else ""
+            if flag:
+                regressions.append((scenario, metric))
+            print(f"{scenario:<24} | {metric:<15} | {value:>10} | {ref:>10} | {delta:+.1%}{flag}")
+    return regressions
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERREUR] Lecture JSON {path} : {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # python -m modules.benchmark [--save-baseline]
+    bench_config = load_json(CONFIG_FILE) or {}
+    audit_config = audit.load_config() or {}
+
+    report = run_suite(bench_config, audit_config)
+    baseline = load_json(BASELINE_FILE)
+    if baseline and baseline.get("cpu_count") != report["cpu_count"]:
+        print(f"[!] Référence mesurée sur {baseline.get('cpu_count')} cœurs, machine actuelle : {report['cpu_count']}.")
+    if baseline and baseline.get("shaped") != report["shaped"]:
+        print("[!] Conditions réseau différentes de la référence (simulation tc/netem).")
+    regressions = compare(report, baseline, bench_config.get("tolerance", DEFAULT_TOLERANCE))
+
+    if "--save-baseline" in sys.argv:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print(f"\n[FICHIER] Référence enregistrée : {BASELINE_FILE}")
+    elif baseline is None:
+        print("\n[*] Aucune référence : relancer avec --save-baseline pour l'enregistrer.")
+    elif regressions:
+        print(f"\n[!] {len(regressions)} régression(s) au-delà de {bench_config.get('tolerance', DEFAULT_TOLERANCE):.0%}.")
+        sys.exit(1)
+    else:
+        print("\n[OK] Aucune régression par rapport à la référence.")
@@ -0,0 +1,291 @@
+import os
+import sys
+import csv
+import json
+import struct
+import ipaddress
+from array import array
+from datetime import datetime
+from .snapshots import parse_ports
+
+try:
+    import numpy as np
+except ImportError:  # requirements.txt ; sans numpy : mêmes résultats en Python pur, en plus lent
+    np = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_DIR = os.path.join(os.path.dirname(BASE_DIR), "cache", "tables")
+
+MAGIC = b"ATBL"
+VERSION = 1
+# ip sur 32 bits, 64 ports par mot de bitmap, codes OS / EOL sur 16 bits
+IP_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+WORD_BITS = 64
+
+OBSOLETE = "Obsolète"
+SOON_OBSOLETE = "Bientôt obsolète!"
+
+
+class ResultTable:
+    """
+    audit results of one site as columns:
+    ip (uint32, sorted) | open ports bitmap over `ports` (uint64 words) | os code | eol status code
+    os / eol strings are stored once in os_names / eol_names (enum coding)
+    """
+
+    def __init__(self, site, ports, cidr="", scan_date=None):
+        self.site = site
+        self.cidr = cidr
+        self.scan_date = scan_date or datetime.now().isoformat(timespec='seconds')
+        self.ports = list(ports)
+        self.words = max(1, (len(self.ports) + WORD_BITS - 1) // WORD_BITS)
+        self.port_index = {port: i for i, port in enumerate(self.ports)}
+        self.ip = array(IP_TYPECODE)
+        self.bits = array('Q')
+        self.os = array('H')
+        self.eol = array('H')
+        self.os_names = []
+        self.eol_names = []
+        self._os_codes = {}
+        self._eol_codes = {}
+
+    def __len__(self):
+        return len(self.ip)
+
+    def _code(self, value, names, codes):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, ip, open_ports, os_name, eol_status):
+        words = [0] * self.words
+        for port in open_ports:
+            index = self.port_index.get(port)
+            if index is not None:
+                words[index // WORD_BITS] |= 1 << (index % WORD_BITS)
+        self.ip.append(int(ipaddress.IPv4Address(ip)))
+        self.bits.extend(words)
+        self.os.append(self._code(os_name, self.os_names, self._os_codes))
+        self.eol.append(self._code(eol_status, self.eol_names, self._eol_codes))
+
+    @classmethod
+    def from_rows(cls, site, ports, rows, cidr="", scan_date=None):
+        """lignes du rapport d'audit (dicts, liste ou itérateur) -> table triée par IP"""
+        table = cls(site, ports, cidr, scan_date)
+        for row in rows:
+            table.append(row['IP'], parse_ports(row['Ports Ouverts']), row['OS Détecté'], row['Statut Support (EOL)'])
+        table._sort()
+        return table
+
+    def _sort(self):
+        if all(self.ip[i] <= self.ip[i + 1] for i in range(len(self.ip) - 1)):
+            return
+        order = sorted(range(len(self.ip)), key=self.ip.__getitem__)
+        w = self.words
+        self.ip = array(IP_TYPECODE, (self.ip[i] for i in order))
+        self.bits = array('Q', (self.bits[i * w + k] for i in order for k in range(w)))
+        self.os = array('H', (self.os[i] for i in order))
+        self.eol = array('H', (self.eol[i] for i in order))
+
+    # --- stockage binaire ---
+
+    def save(self, path):
+        meta = json.dumps({
+            "site": self.site, "cidr": self.cidr, "scan_date": self.scan_date, "ports": self.ports,
+            "os_names": self.os_names, "eol_names": self.eol_names, "rows": len(self),
+            "byteorder": sys.byteorder
+        }, ensure_ascii=False).encode('utf-8')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack("<HI", VERSION, len(meta)) + meta)
+            for column in (self.ip, self.bits, self.os, self.eol):
+                column.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"{path} : format de table inconnu")
+            version, meta_len = struct.unpack("<HI", f.read(6))
+            if version != VERSION:
+                raise ValueError(f"{path} : version {version} non supportée")
+            meta = json.loads(f.read(meta_len).decode('utf-8'))
+
+            table = cls(meta["site"], meta["ports"], meta["cidr"], meta["scan_date"])
+            rows = meta["rows"]
+            for column, count in ((table.ip, rows), (table.bits, rows * table.words), (table.os, rows), (table.eol, rows)):
+                column.fromfile(f, count)
+                if meta["byteorder"] != sys.byteorder:
+                    column.byteswap()
+
+        table.os_names = meta["os_names"]
+        table.eol_names = meta["eol_names"]
+        table._os_codes = {name: i for i, name in enumerate(table.os_names)}
+        table._eol_codes = {name: i for i, name in enumerate(table.eol_names)}
+        return table
+
+    # --- colonnes ---
+
+    def port_column(self, port):
+        """0/1 par hôte : `port` ouvert (tableau numpy, ou liste sans numpy)"""
+        index = self.port_index[port]
+        word, bit = divmod(index, WORD_BITS)
+        if np is not None:
+            bits = np.frombuffer(self.bits, dtype=np.uint64).reshape(-1, self.words)
+            return (bits[:, word] >> np.uint64(bit)) & np.uint64(1)
+        return [(self.bits[i * self.words + word] >> bit) & 1 for i in range(len(self))]
+
+
+def table_path(site, table_dir=TABLE_DIR):
+    safe_name = "".join([c if c.isalnum() else "_" for c in site])
+    return os.path.join(table_dir, f"{safe_name}.tbl")
+
+
+def load_table(site, table_dir=TABLE_DIR):
+    """dernière table du site, None si absente ou illisible"""
+    path = table_path(site, table_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        return ResultTable.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[!] Table de résultats illisible ({path}) : {e}")
+        return None
+
+
+def save_table(table, table_dir=TABLE_DIR):
+    try:
+        table.save(table_path(table.site, table_dir))
+    except OSError as e:
+        print(f"[ERREUR] Sauvegarde de la table de résultats : {e}")
+
+
+# --- agrégations (vectorisées avec numpy) ---
+
+def _counts(codes, names):
+    if np is not None:
+        counts = np.bincount(np.frombuffer(codes, dtype=np.uint16), minlength=len(names))
+        return {name: int(counts[i]) for i, name in enumerate(names) if counts[i]}
+    counts = {}
+    for code in codes:
+        counts[names[code]] = counts.get(names[code], 0) + 1
+    return counts
+
+
+def port_exposure(table, ports=None):
+    """{port: nombre d'hôtes où il est ouvert}"""
+    result = {}
+    for port in ports or table.ports:
+        if port not in table.port_index:
+            result[port] = 0
+        elif np is not None:
+            result[port] = int(table.port_column(port).sum())
+        else:
+            result[port] = sum(table.port_column(port))
+    return result
+
+
+def status_counts(table):
+    """{statut EOL: nombre d'hôtes}"""
+    return _counts(table.eol, table.eol_names)
+
+
+def os_counts(table, eol_status=None):
+    """{OS: nombre d'hôtes}, éventuellement limité à un statut EOL (ex: Obsolète)"""
+    if eol_status is None:
+        return _counts(table.os, table.os_names)
+    code = table._eol_codes.get(eol_status)
+    if code is None:
+        return {}
+    if np is not None:
+        os_codes = np.frombuffer(table.os, dtype=np.uint16)[np.frombuffer(table.eol, dtype=np.uint16) == code]
+        counts = np.bincount(os_codes, minlength=len(table.os_names))
+        return {name: int(counts[i]) for i, name in enumerate(table.os_names) if counts[i]}
+    counts = {}
+    for os_code, eol_code in zip(table.os, table.eol):
+        if eol_code == code:
+            counts[table.os_names[os_code]] = counts.get(table.os_names[os_code], 0) + 1
+    return counts
+
+
+def diff_tables(previous, current):
+    """
+    scan-to-scan comparison on the bitmaps (hosts matched by ip)
+    return : {'new_hosts', 'gone_hosts', 'opened': {port: n}, 'closed': {port: n}}
+    """
+    ports = [port for port in current.ports if port in previous.port_index]
+    if np is not None:
+        prev_ip = np.frombuffer(previous.ip, dtype=np.uint32)
+        cur_ip = np.frombuffer(current.ip, dtype=np.uint32)
+        _, prev_idx, cur_idx = np.intersect1d(prev_ip, cur_ip, assume_unique=True, return_indices=True)
+        common = len(cur_idx)
+        opened, closed = {}, {}
+        for port in ports:
+            before = previous.port_column(port)[prev_idx]
+            after = current.port_column(port)[cur_idx]
+            opened[port] = int((after & ~before & np.uint64(1)).sum())
+            closed[port] = int((before & ~after & np.uint64(1)).sum())
+    else:
+        prev_pos = {ip: i for i, ip in enumerate(previous.ip)}
+        pairs = [(prev_pos[ip], i) for i, ip in enumerate(current.ip) if ip in prev_pos]
+        common = len(pairs)
+        opened, closed = {}, {}
+        for port in ports:
+            before, after = previous.port_column(port), current.port_column(port)
+            opened[port] = sum(1 for p, c in pairs if after[c] and not before[p])
+            closed[port] = sum(1 for p, c in pairs if before[p] and not after[c])
+
+    return {
+        "new_hosts": len(current) - common,
+        "gone_hosts": len(previous) - common,
+        "opened": {port: n for port, n in opened.items() if n},
+        "closed": {port: n for port, n in closed.items() if n}
+    }
+
+
+def cross_site_summary(tables, previous=None, ports=None):
+    """
+    one line per site: hosts, exposure of each port, obsolete / soon obsolete counts,
+    and changes since the previous table of the site (previous = {site: table})
+    """
+    previous = previous or {}
+    summary = []
+    for table in tables:
+        statuses = status_counts(table)
+        line = {
+            "site": table.site,
+            "hosts": len(table),
+            "exposure": port_exposure(table, ports),
+            "obsolete": statuses.get(OBSOLETE, 0),
+            "soon_obsolete": statuses.get(SOON_OBSOLETE, 0),
+            "obsolete_os": os_counts(table, OBSOLETE),
+            "changes": None
+        }
+        if table.site in previous:
+            line["changes"] = diff_tables(previous[table.site], table)
+        summary.append(line)
+    return summary
+
+
+def write_summary_csv(summary, ports, filepath):
+    """synthèse inter-sites au format CSV (séparateur ;)"""
+    fieldnames = ['Site', 'Hôtes'] + [f"Port {port}" for port in ports] + \
+                 ['Obsolètes', 'Bientôt obsolètes', 'Nouveaux hôtes', 'Hôtes disparus', 'Ports ouverts depuis',
+                  'Ports fermés depuis']
+    with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';')
+        writer.writeheader()
+        for line in summary:
+            changes = line["changes"] or {}
+            row = {'Site': line["site"], 'Hôtes': line["hosts"], 'Obsolètes': line["obsolete"],
+                   'Bientôt obsolètes': line["soon_obsolete"],
+                   'Nouveaux hôtes': changes.get("new_hosts", ""), 'Hôtes disparus': changes.get("gone_hosts", ""),
+                   'Ports ouverts depuis': str(changes["opened"]) if changes else "",
+                   'Ports fermés depuis': str(changes["closed"]) if changes else ""}
+            for port in ports:
+                row[f"Port {port}"] = line["exposure"].get(port, 0)
+            writer.writerow(row)
@@ -0,0 +1,115 @@
+import asyncio
+import concurrent.futures
+from .icmp import sweep
+from .rtt import get_estimator
+from .scanner import async_probe_port
+from .utils import ProbeStore, FINGERPRINT_PORTS, detect_os_type
+from .diagnostic import get_local_health, get_remote_linux_health, windows_ports_report, WINDOWS_PORTS
+
+# valeurs par défaut, surchargées par la clé "settings" de diagnostic.json
+# machines diagnostiquées en même temps
+DEFAULT_MAX_CONCURRENCY = 64
+# délai maximal par machine (s), ping + empreinte + collecte
+DEFAULT_HOST_TIMEOUT = 30
+# collectes bloquantes (paramiko, psutil) : threads bornés
+DEFAULT_BLOCKING_WORKERS = 16
+# connexions TCP en vol, toutes machines confondues
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_PING_TIMEOUT = 1.0
+
+
+async def async_diagnose(inventory, on_result=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                         host_timeout=DEFAULT_HOST_TIMEOUT, blocking_workers=DEFAULT_BLOCKING_WORKERS,
+                         max_in_flight=DEFAULT_MAX_IN_FLIGHT, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                         ping_timeout=DEFAULT_PING_TIMEOUT):
+    """
+    diagnostic of every machine of the inventory ({key: target} from diagnostic.json)
+    - one ICMP sweep for all remote machines, fingerprint and Windows ports probed with
+      non-blocking connects under one limiter, OS type then decided without new packets
+    - windows_remote : report built from those same probes
+    - linux_ssh / local : blocking collection (paramiko, psutil) in a bounded thread pool
+    at most max_concurrency machines at a time, each one within host_timeout seconds
+    on_result(name, data, error) is called as soon as one machine is done
+    return : [(name, data, error), ...] in completion order
+    """
+    loop = asyncio.get_running_loop()
+    targets = list(inventory.values())
+    slots = asyncio.Semaphore(max_concurrency)
+    limiter = asyncio.Semaphore(max_in_flight)
+    blocking = concurrent.futures.ThreadPoolExecutor(max_workers=blocking_workers)
+    probes = ProbeStore()
+    ports = sorted(set(FINGERPRINT_PORTS) | set(WINDOWS_PORTS))
+
+    remote_ips = sorted({target["ip"] for target in targets if target.get("type") != "local"})
+    sweep_timeout = max([get_estimator(ip).timeout(ping_timeout) for ip in remote_ips], default=ping_timeout)
+    sweep_task = asyncio.ensure_future(loop.run_in_executor(None, sweep, remote_ips, sweep_timeout))
+
+    async def probe(ip):
+        estimator = get_estimator(ip)
+        states = await asyncio.gather(*(
+            async_probe_port(ip, port, connect_timeout, limiter, estimator) for port in ports
+        ))
+        probes.record_ports(ip, ports, [port for port, is_open in zip(ports, states) if is_open])
+        replies = await sweep_task
+        if replies is not None:
+            probes.record_icmp(ip, replies[ip].ttl if ip in replies else None)
+        # sans socket ICMP, detect_os_type se rabat sur la commande ping
+        return replies
+
+    async def diagnose(target):
+        ip = target["ip"]
+        if target["type"] == "local":
+            return await loop.run_in_executor(blocking, get_local_health)
+
+        replies = await probe(ip)
+        detected_type = await loop.run_in_executor(blocking, detect_os_type, ip, probes)
+        current_type = detected_type if detected_type != "unknown" else target["type"]
+
+        if current_type == "linux_ssh":
+            return await loop.run_in_executor(blocking, get_remote_linux_health, ip,
+                                              target.get("user"), target.get("password"))
+        if current_type == "windows_remote":
+            reply = replies.get(ip) if replies is not None else None
+            return windows_ports_report(ip, reply, replies is not None,
+                                        {port: probes.port_state(ip, port) for port in WINDOWS_PORTS})
+        return {}
+
+    async def run(target):
+        async with slots:
+            try:
+                result = (target["name"], await asyncio.wait_for(diagnose(target), host_timeout), None)
+            except asyncio.TimeoutError:
+                result = (target["name"], None, f"délai de {host_timeout}s dépassé")
+            except Exception as e:
+                result = (target["name"], None, str(e))
+        if on_result:
+            on_result(*result)
+        return result
+
+    results = []
+    try:
+        for task in asyncio.as_completed([run(target) for target in targets]):
+            results.append(await task)
+    finally:
+        # une collecte SSH hors délai finit dans son thread (timeouts paramiko), sans bloquer le retour
+        blocking.shutdown(wait=False)
+    return results
+
+
+def get_engine_options(settings):
+    """extrait les réglages du moteur depuis la clé settings de diagnostic.json"""
+    settings = settings or {}
+    return {
+        "max_concurrency": settings.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        "host_timeout": settings.get("host_timeout", DEFAULT_HOST_TIMEOUT),
+        "blocking_workers": settings.get("blocking_workers", DEFAULT_BLOCKING_WORKERS),
+        "max_in_flight": settings.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT),
+        "connect_timeout": settings.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        "ping_timeout": settings.get("ping_timeout", DEFAULT_PING_TIMEOUT),
+    }
+
+
+def diagnose_all(inventory, on_result=None, **options):
+    """point d'entrée synchrone du moteur de diagnostic"""
+    return asyncio.run(async_diagnose(inventory, on_result, **options))
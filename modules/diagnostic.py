@@ -7,24 +7,44 @@ import paramiko
 import json
 from datetime import datetime
 from .utils import *
+from .icmp import sweep
+from .rtt import get_estimator, CONNECT_RTT_CODES
+from .history import record_diagnostic
+from .sshpool import get_ssh_pool
+from .metrics import METRICS_KEY, typed_samples, record_metrics
 
 BASE_DIR = os.path.dirname(__file__)
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "configs", "diagnostic.json")
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 
-def load_inventory():
-    """"load config depuis json"""
+# ports vérifiés sur les machines Windows (pas de SSH)
+WINDOWS_PORTS = [135, 445, 3389]
+
+# clé réservée de diagnostic.json : réglages du moteur de diagnostic (le reste est l'inventaire)
+SETTINGS_KEY = "settings"
+
+def _read_config(verbose=True):
     if not os.path.exists(CONFIG_FILE):
-        print(f"[ERREUR] Le fichier de configuration est introuvable : {CONFIG_FILE}")
+        if verbose:
+            print(f"[ERREUR] Le fichier de configuration est introuvable : {CONFIG_FILE}")
         return {}
     
     try:
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     except json.JSONDecodeError as e:
-        print(f"[ERREUR] Le fichier JSON est mal formaté : {e}")
+        if verbose:
+            print(f"[ERREUR] Le fichier JSON est mal formaté : {e}")
         return {}
 
+def load_inventory():
+    """"load config depuis json"""
+    return {key: target for key, target in _read_config().items() if key != SETTINGS_KEY}
+
+def load_settings():
+    """réglages du moteur (concurrence, délais) ; valeurs par défaut si absents"""
+    return _read_config(verbose=False).get(SETTINGS_KEY, {})
+
 def save_report_json(machine_name, data):
     """exporter le dic de données -> JSON"""
     if not os.path.exists(LOGS_DIR):
@@ -39,12 +59,19 @@ def save_report_json(machine_name, data):
     filename = f"diag_{safe_name}_{timestamp}.json"
     filepath = os.path.join(LOGS_DIR, filename)
 
+    scan_date = datetime.now().isoformat()
     full_report = {
         "machine": machine_name,
-        "scan_date": datetime.now().isoformat(),
+        "scan_date": scan_date,
         "scan_result": data
     }
 
+    # historique SQLite, le fichier JSON reste l'export habituel
+    try:
+        record_diagnostic(machine_name, data, scan_date)
+    except Exception as e:
+        print(f"[ERREUR] Enregistrement dans l'historique : {e}")
+
     try:
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(full_report, f, indent=4, ensure_ascii=False)
@@ -80,63 +107,93 @@ def get_local_health():
         # 5. disk usage (main drive)
         disk = psutil.disk_usage('/')
         info['Disque'] = f"{disk.percent}% utilisé ({disk.used // (1024**3)} GB / {disk.total // (1024**3)} GB)"
-        
+
+        # mesures typées (stockage et surveillance), les chaînes ci-dessus restent l'affichage
+        info[METRICS_KEY] = typed_samples(cpu_pct=cpu_percent, ram_pct=ram.percent, disk_pct=disk.percent,
+                                          uptime_s=uptime_seconds)
         return info
         
     except Exception as e:
         return {"ERREUR": f"Impossible de récupérer les informations locales: {e}"}
 
-def get_remote_linux_health(ip, user, password):
-    """connecte SSH + commandes Linux pour récup l'état"""
-    print(f"[*] Connexion SSH vers {ip}...")
+# une seule invocation distante, une ligne clé=valeur par mesure
+HEALTH_SCRIPT = r"""
+. /etc/os-release 2>/dev/null; echo "os=$PRETTY_NAME"
+echo "uptime=$(uptime -p 2>/dev/null)"
+echo "uptime_s=$(cut -d' ' -f1 /proc/uptime)"
+echo "loadavg=$(cat /proc/loadavg)"
+free -m | awk 'NR==2{print "ram_used_mb=" $3; print "ram_total_mb=" $2}'
+df -P / | awk 'NR==2{print "disk_pct=" $5}'
+"""
+HEALTH_COMMAND_TIMEOUT = 10
+
+def parse_health_output(output):
+    """sortie de HEALTH_SCRIPT -> {clé: valeur}"""
+    values = {}
+    for line in output.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key.strip()] = value.strip()
+    return values
+
+def collect_linux_health(client, timeout=HEALTH_COMMAND_TIMEOUT):
+    """exécute HEALTH_SCRIPT sur un client SSH connecté : un seul canal, un seul aller-retour"""
+    stdin, stdout, stderr = client.exec_command(HEALTH_SCRIPT, timeout=timeout)
+    values = parse_health_output(stdout.read().decode(errors="replace"))
+
     info = {}
-    
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    
+    info['OS'] = values.get("os") or "Linux inconnu"
+    info['Uptime'] = values.get("uptime", "")
+    load = values.get("loadavg", "").split()
+    info['CPU Load'] = f"{load[0]} (Load Avg)" if load else "N/A"
     try:
-        client.connect(ip, username=user, password=password, timeout=5)
-        
-        # 1. récup OS
-        stdin, stdout, stderr = client.exec_command("cat /etc/os-release | grep PRETTY_NAME")
-        os_name = stdout.read().decode().strip().replace('PRETTY_NAME=', '').replace('"', '')
-        info['OS'] = os_name if os_name else "Linux inconnu"
-
-        # 2. récup uptime
-        stdin, stdout, stderr = client.exec_command("uptime -p")
-        info['Uptime'] = stdout.read().decode().strip()
-
-        # 3. récup CPU load
-        stdin, stdout, stderr = client.exec_command("cat /proc/loadavg")
-        load = stdout.read().decode().split()[0]
-        info['CPU Load'] = f"{load} (Load Avg)"
-
-        # 4. récup RAM (libre/total)
-        cmd_ram = "free -m | awk 'NR==2{printf \"%.2f\", $3*100/$2 }'"
-        stdin, stdout, stderr = client.exec_command(cmd_ram)
-        info['RAM'] = f"{stdout.read().decode().strip()}% utilisée"
-
-        # 5. récup disque
-        cmd_disk = "df -h / | awk 'NR==2 {print $5}'"
-        stdin, stdout, stderr = client.exec_command(cmd_disk)
-        info['Disque'] = stdout.read().decode().strip()
-
-        client.close()
-        return info
+        ram = int(values["ram_used_mb"]) * 100 / int(values["ram_total_mb"])
+        info['RAM'] = f"{ram:.2f}% utilisée"
+    except (KeyError, ValueError, ZeroDivisionError):
+        ram = None
+        info['RAM'] = "N/A"
+    info['Disque'] = values.get("disk_pct", "N/A")
+
+    # valeurs non numériques (commande absente) : typed_samples les écarte
+    uptime_s = values.get("uptime_s", "").split(".")[0]
+    info[METRICS_KEY] = typed_samples(cpu_load=load[0] if load else None, ram_pct=ram,
+                                      disk_pct=values.get("disk_pct", "").rstrip("%") or None,
+                                      uptime_s=uptime_s or None)
+    return info
+
+def get_remote_linux_health(ip, user, password, pool=None):
+    """
+    état d'un Linux via SSH : toutes les mesures en une commande,
+    session réutilisée d'un diagnostic à l'autre (pool de connexions)
+    """
+    pool = pool if pool is not None else get_ssh_pool()
+    client = None
+    try:
+        client, reused = pool.get(ip, user, password)
+        print(f"[*] {'Session SSH réutilisée' if reused else 'Connexion SSH'} vers {ip}...")
+        try:
+            return collect_linux_health(client)
+        except (paramiko.SSHException, OSError):
+            # transport fermé entre-temps côté serveur : une nouvelle session, une fois
+            # (simple échec de commande, ex. timeout : la session reste partagée)
+            if not reused or pool.is_alive(client):
+                raise
+            pool.discard(ip, user, client)
+            client = None
+            client, _ = pool.get(ip, user, password)
+            return collect_linux_health(client)
 
     except Exception as e:
+        if client is not None and not pool.is_alive(client):
+            pool.discard(ip, user, client)
+            client = None
         return {"ERREUR": f"Connexion impossible ou échec commandes: {e}"}
+    finally:
+        if client is not None:
+            pool.release(ip, user, client)
 
-def check_simple_ports(ip, ports):
-    """pour machines Windows sans SSH, vérifier juste les ports"""
-    print(f"[*] Démarrage du scan détaillé vers {ip}...")
-    
-    info = {
-        "OS": "Windows", 
-        "Type": "Scan de Ports"
-    }
-    
-    print(f"    > Test du Ping...", end=' ', flush=True)
+def _ping_subprocess(ip, info):
+    """ping via la commande système (fallback sans socket ICMP), retourne le temps en ms ou None"""
     try:
         if platform.system().lower() == 'windows':
             # windows: -n count, -w timeout in milliseconds
@@ -178,6 +235,8 @@ def check_simple_ports(ip, ports):
             if ping_time:
                 print(f"OK ({ping_time}ms)")
                 info["Ping"] = f"OK ({ping_time}ms)"
+                # '<1' (windows) : borne haute
+                return 1.0 if ping_time == '<1' else float(ping_time)
             else:
                 print("OK")
                 info["Ping"] = "OK"
@@ -191,13 +250,45 @@ def check_simple_ports(ip, ports):
         print(f"ERREUR ({e})")
         info["Ping"] = "Erreur Commande"
 
+def check_simple_ports(ip, ports):
+    """pour machines Windows sans SSH, vérifier juste les ports"""
+    print(f"[*] Démarrage du scan détaillé vers {ip}...")
+    
+    info = {
+        "OS": "Windows", 
+        "Type": "Scan de Ports"
+    }
+    
+    print(f"    > Test du Ping...", end=' ', flush=True)
+
+    # socket ICMP natif (rtt mesuré directement), subprocess ping si indisponible
+    estimator = get_estimator(ip)
+    replies = sweep([ip], timeout=estimator.timeout(1.0))
+    rtt = None
+    if replies is not None:
+        if ip in replies:
+            rtt = replies[ip].rtt
+            estimator.add_sample(rtt / 1000)
+            print(f"OK ({rtt}ms)")
+            info["Ping"] = f"OK ({rtt}ms)"
+        else:
+            print("Timeout")
+            info["Ping"] = "Timeout"
+    else:
+        rtt = _ping_subprocess(ip, info)
+    samples = typed_samples(ping_rtt_ms=rtt)
+
     # loop ports
     for port in ports:
         print(f"    > Test du port TCP/{port}...", end=' ', flush=True)
         
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1.0) # 1 sec max / port
+        # timeout adapté au RTT mesuré sur ce sous-réseau (1 sec tant qu'aucune mesure)
+        sock.settimeout(estimator.timeout(1.0))
+        started = time.monotonic()
         result = sock.connect_ex((ip, port))
+        if result in CONNECT_RTT_CODES:
+            estimator.add_sample(time.monotonic() - started)
         
         if result == 0:
             status = "Ouvert"
@@ -207,8 +298,30 @@ def check_simple_ports(ip, ports):
             print("Fermé") 
             
         info[f"Port {port}"] = status
+        samples[f"port_{port}"] = int(result == 0)
         sock.close()
-    
+
+    info[METRICS_KEY] = samples
+    return info
+
+def windows_ports_report(ip, reply, icmp_available, port_states):
+    """
+    même rapport que check_simple_ports, à partir de sondes déjà faites (moteur de diagnostic)
+    reply : EchoReply ou None, port_states : {port: ouvert ?}
+    """
+    info = {
+        "OS": "Windows",
+        "Type": "Scan de Ports"
+    }
+    if reply is not None:
+        info["Ping"] = f"OK ({reply.rtt}ms)"
+    else:
+        info["Ping"] = "Timeout" if icmp_available else "N/A"
+    samples = typed_samples(ping_rtt_ms=reply.rtt if reply is not None else None)
+    for port, is_open in port_states.items():
+        info[f"Port {port}"] = "Ouvert" if is_open else "Fermé"
+        samples[f"port_{port}"] = int(bool(is_open))
+    info[METRICS_KEY] = samples
     return info
 
 def display_report(machine_name, data):
@@ -220,6 +333,8 @@ def display_report(machine_name, data):
     general_data = {}
     
     for key, value in data.items():
+        if key == METRICS_KEY:
+            continue
         if "Port" in key:
             ports_data.append((key, value))
         else:
@@ -239,40 +354,9 @@ def display_report(machine_name, data):
     
     print("="*50 + "\n")
 
-def scan_single_machine(key, target):
-    """Scan a single machine and return results"""
-    try:
-        print(f"\n[*] Scanning {target['name']} ({target['ip']})...")
-        
-        # detect OS type
-        detected_type = detect_os_type(target['ip'])
-        current_type = target['type']
-        
-        if target['type'] != 'local' and detected_type != 'unknown':
-            current_type = detected_type
-        
-        # perform scan based on type
-        data = {}
-        if current_type == "local":
-            # local analysis using psutil
-            data = get_local_health()
-            
-        elif current_type == "linux_ssh":
-            # Remote Linux analysis via SSH
-            data = get_remote_linux_health(target["ip"], target.get("user"), target.get("password"))
-            
-        elif current_type == "windows_remote":
-            # Windows remote - port scan
-            data = check_simple_ports(target["ip"], [135, 445, 3389])
-        
-        return target["name"], data, None
-        
-    except Exception as e:
-        return target["name"], None, str(e)
-
 def scan_all_machines():
-    """Scan all machines simultaneously using concurrent execution"""
-    import concurrent.futures
+    """Scan all machines simultaneously (asyncio engine, bounded concurrency)"""
+    from .diag_engine import diagnose_all, get_engine_options
     
     inventory = load_inventory()
     
@@ -287,26 +371,18 @@ def scan_all_machines():
     print("[*] Cette opération peut prendre quelques secondes.\n")
     
     results = []
-    
-    # scan all machines concurrently
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(inventory)) as executor:
-        # submit all scan tasks
-        futures = {executor.submit(scan_single_machine, key, target): (key, target) for key, target in inventory.items()}
-        
-        # collect results as they complete
-        for future in concurrent.futures.as_completed(futures):
-            key, target = futures[future]
-            try:
-                machine_name, data, error = future.result()
-                if error:
-                    print(f"[!] Erreur lors du scan de {machine_name}: {error}")
-                    results.append((machine_name, {"ERREUR": error}))
-                else:
-                    print(f"[✓] {machine_name} - Scan terminé")
-                    results.append((machine_name, data))
-            except Exception as e:
-                print(f"[!] Exception pour {target['name']}: {e}")
-                results.append((target['name'], {"ERREUR": str(e)}))
+
+    # results streamed as each machine completes
+    def on_result(machine_name, data, error):
+        if error:
+            print(f"[!] Erreur lors du scan de {machine_name}: {error}")
+            results.append((machine_name, {"ERREUR": error}))
+        else:
+            print(f"[✓] {machine_name} - Scan terminé")
+            record_metrics(machine_name, data)
+            results.append((machine_name, data))
+
+    diagnose_all(inventory, on_result, **get_engine_options(load_settings()))
     
     # display all results
     print("\n" + "="*60)
@@ -343,6 +419,7 @@ def run_diagnostic():
             print(f"{key}. {val['name']} ({val['ip']})")
         
         print("a. Scanner toutes les machines simultanément")
+        print("m. Surveillance continue (rafraîchissement en direct)")
         print("q. Quitter")
         
         choice = input("\nVotre choix : ")
@@ -353,6 +430,13 @@ def run_diagnostic():
             clear_screen()
             continue
         
+        if choice == 'm':
+            from .monitoring import run_monitoring
+            run_monitoring()
+            wait_for_user()
+            clear_screen()
+            continue
+
         if choice == 'q':
             break
             
@@ -380,8 +464,9 @@ def run_diagnostic():
                     
                 elif current_type == "windows_remote":
                     # win detected -> scan ports
-                    data = check_simple_ports(target["ip"], [135, 445, 3389])
+                    data = check_simple_ports(target["ip"], WINDOWS_PORTS)
                 
+                record_metrics(target["name"], data)
                 display_report(target["name"], data)
 
                 save = input("Voulez-vous exporter ce rapport en JSON? (y/N) : ")
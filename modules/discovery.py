@@ -0,0 +1,180 @@
+import re
+import socket
+import struct
+import ipaddress
+
+PROC_ARP_FILE = "/proc/net/arp"
+
+# /proc/net/arp : ATF_COM = entrée résolue
+ATF_COM = 0x02
+
+# netlink (rtnetlink) neighbor dump
+NETLINK_ROUTE = 0
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NDA_DST = 1
+NDA_LLADDR = 2
+# REACHABLE | STALE | DELAY | PROBE | PERMANENT
+NUD_VALID = 0x02 | 0x04 | 0x08 | 0x10 | 0x80
+
+EMPTY_MAC = "00:00:00:00:00:00"
+
+
+def read_proc_arp(path=PROC_ARP_FILE):
+    """
+    parse /proc/net/arp (ou un fichier au même format)
+    return : {ip: mac} des entrées résolues
+    """
+    neighbors = {}
+    try:
+        with open(path, 'r') as f:
+            next(f, None)  # en-tête
+            for line in f:
+                fields = line.split()
+                if len(fields) < 4:
+                    continue
+                ip, _, flags, mac = fields[:4]
+                try:
+                    if int(flags, 16) & ATF_COM and mac != EMPTY_MAC:
+                        neighbors[ip] = mac.lower()
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return neighbors
+
+
+def read_netlink_neighbors():
+    """
+    dump the kernel IPv4 neighbor table over rtnetlink (Linux only)
+    return : {ip: mac}, or None if netlink is not available
+    """
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    except OSError:
+        return None
+
+    neighbors = {}
+    try:
+        sock.settimeout(1.0)
+        ndmsg = struct.pack("=BxxxiHBB", socket.AF_INET, 0, 0, 0, 0)
+        header = struct.pack("=IHHII", 16 + len(ndmsg), RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(header + ndmsg)
+
+        done = False
+        while not done:
+            data = sock.recv(65536)
+            if not data:
+                break
+            offset = 0
+            while offset + 16 <= len(data):
+                msg_len, msg_type, _, _, _ = struct.unpack_from("=IHHII", data, offset)
+                if msg_len < 16:
+                    done = True
+                    break
+                if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+                    done = True
+                    break
+                if msg_type == RTM_NEWNEIGH:
+                    entry = _parse_neighbor(data[offset + 16:offset + msg_len])
+                    if entry:
+                        neighbors[entry[0]] = entry[1]
+                offset += (msg_len + 3) & ~3
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+    return neighbors
+
+
+def _parse_neighbor(payload):
+    """ndmsg + rtattr -> (ip, mac) ou None"""
+    if len(payload) < 12:
+        return None
+    family, _, state, _, _ = struct.unpack_from("=BxxxiHBB", payload, 0)
+    if family != socket.AF_INET or not state & NUD_VALID:
+        return None
+
+    ip = mac = None
+    offset = 12
+    while offset + 4 <= len(payload):
+        rta_len, rta_type = struct.unpack_from("=HH", payload, offset)
+        if rta_len < 4:
+            break
+        value = payload[offset + 4:offset + rta_len]
+        if rta_type == NDA_DST and len(value) == 4:
+            ip = socket.inet_ntoa(value)
+        elif rta_type == NDA_LLADDR and len(value) == 6:
+            mac = ":".join(f"{b:02x}" for b in value)
+        offset += (rta_len + 3) & ~3
+
+    if ip and mac and mac != EMPTY_MAC:
+        return ip, mac
+    return None
+
+
+def read_dhcp_leases(path):
+    """
+    parse a DHCP lease file: ISC dhcpd.leases or dnsmasq format
+    return : {ip: mac} des baux actifs
+    """
+    leases = {}
+    try:
+        with open(path, 'r', errors='ignore') as f:
+            content = f.read()
+    except OSError:
+        return leases
+
+    if "lease " in content and "{" in content:
+        # ISC : lease <ip> { ... hardware ethernet <mac>; binding state active; ... }
+        for ip, body in re.findall(r'lease\s+([\d.]+)\s*\{(.*?)\}', content, re.S):
+            state = re.search(r'^\s*binding state (\w+);', body, re.M)
+            mac = re.search(r'hardware ethernet ([0-9a-fA-F:]{17});', body)
+            if mac and (not state or state.group(1) == "active"):
+                leases[ip] = mac.group(1).lower()
+    else:
+        # dnsmasq : <expiry> <mac> <ip> <hostname> <client-id>
+        for line in content.splitlines():
+            fields = line.split()
+            if len(fields) >= 3 and re.match(r'^[0-9a-fA-F:]{17}$', fields[1]):
+                leases[fields[2]] = fields[1].lower()
+    return leases
+
+
+def discover_neighbors(network, arp_file=None, lease_files=None):
+    """
+    passive discovery: kernel neighbor table + optional DHCP leases
+    arp_file : fichier au format /proc/net/arp à lire à la place du noyau
+    only addresses inside `network` are kept
+    return : {ip: mac}
+    """
+    neighbors = {}
+
+    for lease_file in lease_files or []:
+        neighbors.update(read_dhcp_leases(lease_file))
+
+    # table du noyau en dernier : plus fiable que les baux
+    if arp_file:
+        table = read_proc_arp(arp_file)
+    else:
+        table = read_netlink_neighbors()
+        if table is None:
+            table = read_proc_arp()
+    neighbors.update(table)
+
+    found = {}
+    for ip, mac in neighbors.items():
+        try:
+            if ipaddress.IPv4Address(ip) in network:
+                found[ip] = mac
+        except ValueError:
+            continue
+    return found
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import threading
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.path.dirname(BASE_DIR), "cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "eol_cache.json")
+
+DEFAULT_API_BASE_URL = "https://endoflife.date/api/v1"
+DEFAULT_TTL = 24 * 3600
+# délai avant de retenter un produit dont l'appel API a échoué
+FAILURE_BACKOFF = 60
+
+
+def extract_releases(data):
+    """normalise les différents formats de réponse endoflife.date"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if "result" in data and "releases" in data["result"]:
+            return data["result"]["releases"]
+        if "releases" in data:
+            return data["releases"]
+    return []
+
+
+class EolCache:
+    """
+    cache per product slug: memory + JSON file on disk
+    - fresh entries (age < ttl) are served without network
+    - stale entries are revalidated with If-None-Match / If-Modified-Since
+    - if the API is unreachable, the last cached releases are returned
+    """
+
+    def __init__(self, base_url=DEFAULT_API_BASE_URL, ttl=DEFAULT_TTL, timeout=2, cache_file=CACHE_FILE):
+        self.base_url = base_url.rstrip('/')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache_file = cache_file
+        self.entries = self._load()
+        self.failures = {}
+        # dernier échec par produit (code HTTP ou erreur de connexion), pour l'affichage
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.product_locks = {}
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"[!] Cache EOL non sauvegardé : {e}")
+
+    def _product_lock(self, product):
+        with self.lock:
+            return self.product_locks.setdefault(product, threading.Lock())
+
+    def _fetch(self, product, entry):
+        """appel HTTP (conditionnel si on a déjà une version en cache)"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = requests.get(f"{self.base_url}/products/{product}", headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+            return entry
+        if response.status_code != 200:
+            self.errors[product] = f"Erreur {response.status_code}"
+            return None
+
+        return {
+            "releases": extract_releases(response.json()),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time()
+        }
+
+    def get_releases(self, product):
+        """liste des cycles du produit, ou None si jamais récupérée"""
+        # un seul appel réseau par produit, même si plusieurs hôtes arrivent en même temps
+        with self._product_lock(product):
+            entry = self.entries.get(product)
+            now = time.time()
+
+            if entry and now - entry.get("fetched_at", 0) < self.ttl:
+                return entry["releases"]
+
+            if now - self.failures.get(product, 0) < FAILURE_BACKOFF:
+                return entry["releases"] if entry else None
+
+            try:
+                fresh = self._fetch(product, entry)
+            except (requests.RequestException, ValueError) as e:
+                self.errors[product] = f"connexion ou parsing : {e}"
+                fresh = None
+
+            if fresh is None:
+                # API injoignable : on garde la dernière version connue
+                self.failures[product] = now
+                return entry["releases"] if entry else None
+
+            self.errors.pop(product, None)
+            with self.lock:
+                self.entries[product] = fresh
+                self._save()
+            return fresh["releases"]
+
+    def last_error(self, product):
+        """raison du dernier échec de récupération du produit, None si aucun"""
+        return self.errors.get(product)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_eol_cache(config=None):
+    """instance partagée, créée depuis audit.json au premier appel"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = config or {}
+            _cache = EolCache(
+                base_url=config.get("api_base_url", DEFAULT_API_BASE_URL),
+                ttl=config.get("eol_cache_ttl", DEFAULT_TTL),
+                timeout=config.get("api_timeout", 2)
+            )
+        return _cache
@@ -0,0 +1,246 @@
+import os
+import json
+import bisect
+import difflib
+import threading
+import concurrent.futures
+from datetime import date, timedelta
+import requests
+from .eol_cache import extract_releases, DEFAULT_API_BASE_URL
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.path.dirname(BASE_DIR), "cache")
+CATALOG_FILE = os.path.join(CACHE_DIR, "eol_catalog.json")
+
+# une release = [name, codename, label, date de fin (AAAA-MM-JJ ou None), déjà EOL]
+NAME, CODENAME, LABEL, EOL, IS_EOL = range(5)
+RELEASE_FIELDS = {"name": NAME, "codename": CODENAME, "label": LABEL}
+
+WARNING_DAYS = 180
+# téléchargements parallèles si l'API ne fournit pas /products/full
+SYNC_WORKERS = 8
+
+
+def compact_release(release):
+    """release endoflife.date -> entrée compacte de l'index"""
+    eol = release.get('eolFrom') or release.get('eol')
+    is_eol = release.get('isEol') is True or eol is True
+    eol_date = eol[:10] if isinstance(eol, str) and len(eol) >= 10 else None
+    return [str(release.get('name', 'N/A')), release.get('codename') or None,
+            release.get('label') or None, eol_date, is_eol]
+
+
+def release_status(release, today=None):
+    """
+    statut d'une release de l'index (comparaison de dates ISO, sans parsing)
+    return : (statut, date affichée)
+    """
+    today = today or date.today()
+    eol_date = release[EOL]
+    if eol_date is None:
+        return ("Obsolète", "N/A") if release[IS_EOL] else ("Supporté", "Toujours supporté")
+    if release[IS_EOL] or eol_date < today.isoformat():
+        return "Obsolète", eol_date
+    if eol_date < (today + timedelta(days=WARNING_DAYS)).isoformat():
+        return "Bientôt obsolète", eol_date
+    return "Supporté", eol_date
+
+
+class EolCatalog:
+    """
+    local copy of the endoflife.date catalog, loaded once from cache/eol_catalog.json
+    products by slug + a sorted list of names (slugs and aliases) for prefix
+    and fuzzy search, no network access after sync()
+    """
+
+    def __init__(self, catalog_file=CATALOG_FILE):
+        self.catalog_file = catalog_file
+        self.lock = threading.Lock()
+        self.synced_at = None
+        self.products = {}
+        self.names = []    # noms triés (slugs + alias)
+        self.aliases = {}  # nom -> slug
+        self._load()
+
+    def _load(self):
+        if not self.catalog_file or not os.path.exists(self.catalog_file):
+            return
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] Catalogue EOL illisible : {e}")
+            return
+        self._index(data.get("products", {}), data.get("synced_at"))
+
+    def _index(self, products, synced_at):
+        aliases = {}
+        for slug, product in products.items():
+            for alias in product.get("aliases", []):
+                aliases.setdefault(alias.lower(), slug)
+            if product.get("label"):
+                aliases.setdefault(product["label"].lower(), slug)
+            aliases[slug] = slug
+        with self.lock:
+            self.products = products
+            self.aliases = aliases
+            self.names = sorted(aliases)
+            self.synced_at = synced_at
+
+    def is_loaded(self):
+        return bool(self.products)
+
+    # --- synchronisation ---
+
+    def sync(self, base_url=DEFAULT_API_BASE_URL, timeout=10):
+        """
+        download the whole catalog (/products/full, or product by product
+        if unavailable) and replace the index
+        return : number of products
+        """
+        base_url = base_url.rstrip('/')
+        response = requests.get(f"{base_url}/products/full", timeout=timeout)
+        if response.status_code == 200:
+            entries = response.json()
+            entries = entries.get("result", []) if isinstance(entries, dict) else entries
+        else:
+            entries = self._fetch_one_by_one(base_url, timeout)
+
+        products = {}
+        for entry in entries:
+            slug = entry.get("name")
+            if not slug:
+                continue
+            products[slug] = {
+                "label": entry.get("label") or slug,
+                "aliases": [alias for alias in entry.get("aliases", []) if isinstance(alias, str)],
+                "releases": [compact_release(release) for release in extract_releases(entry)]
+            }
+        if not products:
+            raise ValueError("catalogue vide")
+
+        synced_at = date.today().isoformat()
+        self._save(products, synced_at)
+        self._index(products, synced_at)
+        return len(products)
+
+    def _fetch_one_by_one(self, base_url, timeout):
+        listing = requests.get(f"{base_url}/products", timeout=timeout)
+        listing.raise_for_status()
+        data = listing.json()
+        data = data.get("result", []) if isinstance(data, dict) else data
+
+        def fetch(entry):
+            slug = entry if isinstance(entry, str) else entry.get("name")
+            response = requests.get(f"{base_url}/products/{slug}", timeout=timeout)
+            if response.status_code != 200:
+                return None
+            product = entry if isinstance(entry, dict) else {"name": slug}
+            return dict(product, releases=extract_releases(response.json()))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+            return [entry for entry in executor.map(fetch, data) if entry]
+
+    def _save(self, products, synced_at):
+        os.makedirs(os.path.dirname(self.catalog_file), exist_ok=True)
+        tmp_path = self.catalog_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"synced_at": synced_at, "products": products}, f, ensure_ascii=False,
+                      separators=(',', ':'))
+        os.replace(tmp_path, self.catalog_file)
+
+    # --- recherche ---
+
+    def resolve(self, name):
+        """slug exact ou alias -> slug, None sinon"""
+        return self.aliases.get(name.strip().lower())
+
+    def search(self, query, limit=10):
+        """
+        slugs matching `query`: exact name/alias, then prefix matches,
+        then close matches (typos)
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        with self.lock:
+            names, aliases = self.names, self.aliases
+
+        found = []
+
+        def add(name):
+            slug = aliases[name]
+            if slug not in found:
+                found.append(slug)
+
+        if query in aliases:
+            add(query)
+        # préfixe : tranche contiguë de la liste triée
+        index = bisect.bisect_left(names, query)
+        while index < len(names) and names[index].startswith(query) and len(found) < limit:
+            add(names[index])
+            index += 1
+        if len(found) < limit:
+            for name in difflib.get_close_matches(query, names, n=limit, cutoff=0.6):
+                add(name)
+        return found[:limit]
+
+    def releases(self, slug):
+        product = self.products.get(slug)
+        return product["releases"] if product else None
+
+    def find_release(self, slug, version):
+        """release d'un produit ; version = nom du cycle ou 'champ:valeur' (ex: label:stable/14)"""
+        releases = self.releases(slug)
+        if not releases:
+            return None
+        field, value = NAME, str(version)
+        if ":" in value:
+            field_name, value = value.split(":", 1)
+            if field_name not in RELEASE_FIELDS:
+                return None
+            field = RELEASE_FIELDS[field_name]
+        for release in releases:
+            if release[field] == value:
+                return release
+        return None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_eol_catalog():
+    """instance partagée, chargée depuis le disque au premier appel"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = EolCatalog()
+        return _catalog
+
+
+def sync_catalog(config=None):
+    """commande de synchronisation (menu ou ligne de commande)"""
+    config = config or {}
+    catalog = get_eol_catalog()
+    print("[*] Téléchargement du catalogue endoflife.date...")
+    try:
+        count = catalog.sync(config.get("api_base_url", DEFAULT_API_BASE_URL),
+                             config.get("eol_catalog_timeout", 10))
+    except (requests.RequestException, ValueError) as e:
+        print(f"[ERREUR] Synchronisation du catalogue EOL : {e}")
+        return False
+    print(f"[OK] Catalogue EOL synchronisé : {count} produits ({catalog.catalog_file})")
+    return True
+
+
+if __name__ == "__main__":
+    # python -m modules.eol_catalog sync | <recherche>
+    import sys
+
+    if sys.argv[1:] == ["sync"]:
+        from .audit import load_config
+        sync_catalog(load_config())
+    elif len(sys.argv) == 2:
+        print(get_eol_catalog().search(sys.argv[1]))
+    else:
+        print("Usage : python -m modules.eol_catalog sync | <produit>")
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.path.dirname(BASE_DIR), "cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "os_fingerprints.json")
+
+DEFAULT_TTL = 7 * 24 * 3600
+# écritures disque espacées pendant un audit (le reste part à la sortie)
+SAVE_INTERVAL = 5
+
+# confiance selon les indices qui ont conduit au résultat
+CONFIDENCE_TTL_AND_PORTS = 1.0
+CONFIDENCE_PORTS = 0.8
+CONFIDENCE_TTL = 0.5
+
+
+class FingerprintCache:
+    """
+    OS detection results per IP: memory + JSON file on disk
+    entry = os type, confidence, open fingerprint ports (signature), detection time
+    an entry lives ttl * confidence seconds, and is dropped as soon as
+    the observed port signature no longer matches
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, cache_file=CACHE_FILE):
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.entries = self._load()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_save = 0
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"[!] Cache OS non sauvegardé : {e}")
+        self.dirty = False
+        self.last_save = time.monotonic()
+
+    def get(self, ip):
+        """entrée encore valide pour `ip`, ou None"""
+        with self.lock:
+            entry = self.entries.get(ip)
+            if entry and time.time() - entry["detected_at"] < self.ttl * entry["confidence"]:
+                return dict(entry)
+            return None
+
+    def store(self, ip, os_type, confidence, signature):
+        with self.lock:
+            self.entries[ip] = {
+                "os_type": os_type,
+                "confidence": confidence,
+                "signature": sorted(signature),
+                "detected_at": time.time()
+            }
+            self.dirty = True
+            if time.monotonic() - self.last_save >= SAVE_INTERVAL:
+                self._save()
+
+    def invalidate(self, ip):
+        with self.lock:
+            if self.entries.pop(ip, None) is not None:
+                self.dirty = True
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_fingerprint_cache(config=None):
+    """instance partagée ; os_cache_ttl lu dans la config au premier appel qui en fournit une"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FingerprintCache()
+            atexit.register(_cache.flush)
+        if config:
+            _cache.ttl = config.get("os_cache_ttl", DEFAULT_TTL)
+        return _cache
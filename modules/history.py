@@ -0,0 +1,375 @@
+import os
+import csv
+import json
+import sqlite3
+import ipaddress
+from datetime import datetime
+from .snapshots import parse_ports
+from .reports import AUDIT_FIELDNAMES
+from .metrics import METRICS_KEY
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_DB = os.path.join(os.path.dirname(BASE_DIR), "logs", "history.db")
+
+# lignes tampon par executemany (un seul commit par passage)
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_runs (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    cidr TEXT NOT NULL,
+    scan_date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_hosts (
+    run_id INTEGER NOT NULL REFERENCES audit_runs(id),
+    site TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    ip_int INTEGER NOT NULL,
+    hostname TEXT,
+    os TEXT,
+    eol_status TEXT,
+    eol_date TEXT,
+    mac TEXT,
+    scan_date TEXT NOT NULL,
+    PRIMARY KEY (run_id, ip_int)
+);
+CREATE TABLE IF NOT EXISTS audit_ports (
+    run_id INTEGER NOT NULL REFERENCES audit_runs(id),
+    site TEXT NOT NULL,
+    ip_int INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    scan_date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS diag_runs (
+    id INTEGER PRIMARY KEY,
+    machine TEXT NOT NULL,
+    scan_date TEXT NOT NULL,
+    scan_result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS diag_values (
+    run_id INTEGER NOT NULL REFERENCES diag_runs(id),
+    machine TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    scan_date TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_hosts_ip ON audit_hosts(ip_int, scan_date);
+CREATE INDEX IF NOT EXISTS idx_hosts_site ON audit_hosts(site, scan_date);
+CREATE INDEX IF NOT EXISTS idx_ports_ip ON audit_ports(ip_int, port, scan_date);
+CREATE INDEX IF NOT EXISTS idx_ports_port ON audit_ports(port, site, scan_date);
+CREATE INDEX IF NOT EXISTS idx_ports_run ON audit_ports(run_id, ip_int);
+CREATE INDEX IF NOT EXISTS idx_runs_site ON audit_runs(site, scan_date);
+CREATE INDEX IF NOT EXISTS idx_diag_machine ON diag_runs(machine, scan_date);
+CREATE INDEX IF NOT EXISTS idx_diag_values ON diag_values(machine, key, scan_date);
+
+-- même colonnes que les CSV d'audit
+CREATE VIEW IF NOT EXISTS audit_report AS
+SELECT h.run_id AS run_id,
+       h.ip AS "IP",
+       h.hostname AS "Nom (DNS)",
+       h.os AS "OS Détecté",
+       h.eol_status AS "Statut Support (EOL)",
+       h.eol_date AS "Date Fin Support",
+       '[' || COALESCE((SELECT group_concat(port, ', ') FROM
+                          (SELECT p.port FROM audit_ports p
+                           WHERE p.run_id = h.run_id AND p.ip_int = h.ip_int ORDER BY p.port)), '') || ']'
+           AS "Ports Ouverts",
+       h.mac AS "Adresse MAC",
+       h.ip_int AS ip_int
+FROM audit_hosts h;
+"""
+
+
+def connect(db_path=HISTORY_DB):
+    """connexion SQLite (une par thread), schéma créé au besoin"""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL : les scans simultanés de plusieurs sites écrivent sans se bloquer en lecture
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_audit(site, cidr, rows, scan_date=None, db_path=HISTORY_DB):
+    """
+    store one audit run; rows = audit report rows (list or iterator)
+    one transaction for the run and all its hosts (never a partial run),
+    rows buffered BATCH_SIZE at a time
+    return : run id
+    """
+    scan_date = scan_date or datetime.now().isoformat(timespec='seconds')
+    conn = connect(db_path)
+    try:
+        with conn:
+            run_id = conn.execute(
+                "INSERT INTO audit_runs (site, cidr, scan_date) VALUES (?, ?, ?)", (site, cidr, scan_date)
+            ).lastrowid
+
+            hosts, ports = [], []
+            for row in rows:
+                ip_int = int(ipaddress.IPv4Address(row['IP']))
+                hosts.append((run_id, site, row['IP'], ip_int, row['Nom (DNS)'], row['OS Détecté'],
+                              row['Statut Support (EOL)'], row['Date Fin Support'], row.get('Adresse MAC'), scan_date))
+                ports.extend((run_id, site, ip_int, port, scan_date) for port in parse_ports(row['Ports Ouverts']))
+
+                if len(hosts) >= BATCH_SIZE:
+                    _flush_audit(conn, hosts, ports)
+                    hosts, ports = [], []
+            _flush_audit(conn, hosts, ports)
+        return run_id
+    finally:
+        conn.close()
+
+
+def _flush_audit(conn, hosts, ports):
+    conn.executemany("INSERT OR REPLACE INTO audit_hosts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", hosts)
+    conn.executemany("INSERT INTO audit_ports VALUES (?, ?, ?, ?, ?)", ports)
+
+
+def record_diagnostic(machine, data, scan_date=None, db_path=HISTORY_DB):
+    """store one diagnostic report (raw JSON + one row per key)"""
+    scan_date = scan_date or datetime.now().isoformat(timespec='seconds')
+    conn = connect(db_path)
+    try:
+        with conn:
+            run_id = conn.execute(
+                "INSERT INTO diag_runs (machine, scan_date, scan_result) VALUES (?, ?, ?)",
+                (machine, scan_date, json.dumps(data, ensure_ascii=False))
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO diag_values VALUES (?, ?, ?, ?, ?)",
+                # mesures typées : dans scan_result et dans metrics.db, pas en texte ici
+                [(run_id, machine, key, str(value), scan_date) for key, value in data.items()
+                 if key != METRICS_KEY]
+            )
+        return run_id
+    finally:
+        conn.close()
+
+
+# --- requêtes ---
+
+def first_exposure(ip, port, db_path=HISTORY_DB):
+    """premier et dernier scan où `port` était ouvert sur `ip` (None si jamais)"""
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT MIN(scan_date) AS first_seen, MAX(scan_date) AS last_seen, COUNT(*) AS scans "
+            "FROM audit_ports WHERE ip_int = ? AND port = ?",
+            (int(ipaddress.IPv4Address(ip)), int(port))
+        ).fetchone()
+        return dict(row) if row["scans"] else None
+    finally:
+        conn.close()
+
+
+def host_history(ip, db_path=HISTORY_DB):
+    """tous les passages d'un hôte, du plus ancien au plus récent"""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            'SELECT r.scan_date, r.site, v."Nom (DNS)" AS name, v."OS Détecté" AS os, '
+            'v."Statut Support (EOL)" AS eol_status, v."Ports Ouverts" AS ports '
+            "FROM audit_report v JOIN audit_runs r ON r.id = v.run_id "
+            "WHERE v.ip_int = ? ORDER BY r.scan_date",
+            (int(ipaddress.IPv4Address(ip)),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def port_exposure(port, site=None, db_path=HISTORY_DB):
+    """hôtes ayant exposé `port` : ip, site, première et dernière détection"""
+    conn = connect(db_path)
+    try:
+        query = ("SELECT h.ip, p.site, MIN(p.scan_date) AS first_seen, MAX(p.scan_date) AS last_seen "
+                 "FROM audit_ports p JOIN audit_hosts h ON h.run_id = p.run_id AND h.ip_int = p.ip_int "
+                 "WHERE p.port = ?")
+        params = [int(port)]
+        if site:
+            query += " AND p.site = ?"
+            params.append(site)
+        query += " GROUP BY p.ip_int, p.site ORDER BY p.ip_int"
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def recent_activity(site, runs=10, db_path=HISTORY_DB):
+    """
+    sur les `runs` derniers audits du site :
+    return : ({ip: fraction des audits où l'hôte était vivant}, {ip: {port: nb d'audits où il était ouvert}})
+    """
+    if not os.path.exists(db_path):
+        return {}, {}
+    conn = connect(db_path)
+    try:
+        run_ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM audit_runs WHERE site = ? ORDER BY scan_date DESC LIMIT ?", (site, runs)
+        )]
+        if not run_ids:
+            return {}, {}
+        marks = ",".join("?" * len(run_ids))
+        alive = {
+            row["ip"]: row["seen"] / len(run_ids)
+            for row in conn.execute(
+                f"SELECT ip, COUNT(*) AS seen FROM audit_hosts WHERE run_id IN ({marks}) GROUP BY ip_int", run_ids
+            )
+        }
+        ports = {}
+        for row in conn.execute(
+            f"SELECT h.ip, p.port, COUNT(*) AS seen FROM audit_ports p "
+            f"JOIN audit_hosts h ON h.run_id = p.run_id AND h.ip_int = p.ip_int "
+            f"WHERE p.run_id IN ({marks}) GROUP BY p.ip_int, p.port", run_ids
+        ):
+            ports.setdefault(row["ip"], {})[row["port"]] = row["seen"]
+        return alive, ports
+    finally:
+        conn.close()
+
+
+# --- exports (vues sur la base) ---
+
+def export_audit_csv(run_id, filepath, db_path=HISTORY_DB):
+    """régénère le CSV d'un audit depuis la vue audit_report"""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("SELECT * FROM audit_report WHERE run_id = ? ORDER BY ip_int", (run_id,))
+        with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile, delimiter=';')
+            writer.writerow(AUDIT_FIELDNAMES)
+            for row in rows:
+                writer.writerow([row[field] for field in AUDIT_FIELDNAMES])
+    finally:
+        conn.close()
+
+
+def export_diagnostic_json(run_id, filepath, db_path=HISTORY_DB):
+    """régénère le rapport JSON d'un diagnostic"""
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM diag_runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return False
+        full_report = {
+            "machine": row["machine"],
+            "scan_date": row["scan_date"],
+            "scan_result": json.loads(row["scan_result"])
+        }
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(full_report, f, indent=4, ensure_ascii=False)
+        return True
+    finally:
+        conn.close()
+
+
+def recent_runs(kind="audit", limit=20, db_path=HISTORY_DB):
+    """derniers passages enregistrés : [(id, site ou machine, date)], du plus récent au plus ancien"""
+    if not os.path.exists(db_path):
+        return []
+    query = ("SELECT id, site AS name, scan_date FROM audit_runs" if kind == "audit"
+             else "SELECT id, machine AS name, scan_date FROM diag_runs")
+    conn = connect(db_path)
+    try:
+        return [tuple(row) for row in conn.execute(query + " ORDER BY scan_date DESC, id DESC LIMIT ?", (limit,))]
+    finally:
+        conn.close()
+
+
+def export_menu(kind):
+    """choix d'un passage enregistré et réexport (CSV d'audit ou JSON de diagnostic) dans logs/"""
+    runs = recent_runs(kind)
+    if not runs:
+        print(f"[*] Aucun {'audit' if kind == 'audit' else 'diagnostic'} enregistré dans l'historique.")
+        return
+
+    print(f"\n{'ID':>5} | {'DATE':<20} | {'SITE' if kind == 'audit' else 'MACHINE'}")
+    print("-" * 60)
+    for run_id, name, scan_date in runs:
+        print(f"{run_id:>5} | {scan_date:<20} | {name}")
+
+    choice = input("\nID à exporter : ").strip()
+    names = {str(run_id): name for run_id, name, _ in runs}
+    if choice not in names:
+        print("Choix invalide.")
+        return
+
+    safe_name = "".join([c if c.isalnum() else "_" for c in names[choice]])
+    logs_dir = os.path.dirname(HISTORY_DB)
+    try:
+        if kind == "audit":
+            filepath = os.path.join(logs_dir, f"AUDIT_{safe_name}_run{choice}.csv")
+            export_audit_csv(int(choice), filepath)
+        else:
+            filepath = os.path.join(logs_dir, f"diag_{safe_name}_run{choice}.json")
+            export_diagnostic_json(int(choice), filepath)
+        print(f"[FICHIER] Rapport exporté : {filepath}")
+    except (OSError, sqlite3.Error) as e:
+        print(f"[ERREUR] Export depuis l'historique : {e}")
+
+
+def query_menu():
+    """question rapide sur l'historique depuis le menu audit"""
+    print("\n1. Recherche par IP / port")
+    print("2. Réexporter un audit (CSV)")
+    print("3. Réexporter un diagnostic (JSON)")
+    choice = input("Votre choix : ").strip()
+    if choice == "2":
+        return export_menu("audit")
+    if choice == "3":
+        return export_menu("diagnostic")
+    if choice != "1":
+        print("Choix invalide.")
+        return
+
+    ip = input("Adresse IP (vide = recherche par port) : ").strip()
+    port = input("Port (optionnel) : ").strip()
+
+    try:
+        if ip and port:
+            result = first_exposure(ip, port)
+            if result:
+                print(f"\n[*] {ip} expose le port {port} depuis le {result['first_seen']} "
+                      f"(dernier scan : {result['last_seen']}, {result['scans']} scans)")
+            else:
+                print(f"\n[*] Port {port} jamais vu ouvert sur {ip}.")
+        elif ip:
+            rows = host_history(ip)
+            print(f"\n{'DATE':<20} | {'SITE':<28} | {'OS':<30} | PORTS")
+            print("-" * 100)
+            for row in rows:
+                print(f"{row['scan_date']:<20} | {row['site']:<28} | {row['os']:<30} | {row['ports']}")
+            if not rows:
+                print(f"[*] Aucun historique pour {ip}.")
+        elif port:
+            rows = port_exposure(port)
+            print(f"\n{'IP':<15} | {'SITE':<28} | {'PREMIÈRE':<20} | DERNIÈRE")
+            print("-" * 90)
+            for row in rows:
+                print(f"{row['ip']:<15} | {row['site']:<28} | {row['first_seen']:<20} | {row['last_seen']}")
+            if not rows:
+                print(f"[*] Port {port} jamais vu ouvert.")
+    except (ValueError, sqlite3.Error) as e:
+        print(f"[ERREUR] Requête historique : {e}")
+
+
+if __name__ == "__main__":
+    # python -m modules.history <ip> [port]  |  python -m modules.history --port <port>
+    import sys
+
+    args = sys.argv[1:]
+    if len(args) == 2 and args[0] == "--port":
+        for entry in port_exposure(args[1]):
+            print(f"{entry['ip']};{entry['site']};{entry['first_seen']};{entry['last_seen']}")
+    elif len(args) == 2:
+        print(first_exposure(args[0], args[1]))
+    elif len(args) == 1:
+        for entry in host_history(args[0]):
+            print(entry)
+    else:
+        print("Usage : python -m modules.history <ip> [port] | --port <port>")
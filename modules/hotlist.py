@@ -0,0 +1,85 @@
+import ipaddress
+from collections import Counter
+
+# poids d'un hôte déclaré (KNOWN_HOSTS) : passe devant ceux seulement vus vivants
+KNOWN_HOST_SCORE = 1.0
+
+
+class HotList:
+    """
+    prior likelihood of each address being alive, from KNOWN_HOSTS and past audits
+    - scores : {ip: score}, higher = probed earlier (absent = cold, probed last)
+    - host_ports : {ip: {port: times seen open}}, probed first on that host
+    - port_counts : how often each port was open across the site, order for the other hosts
+    plain data only, so it can be handed to shard processes
+    """
+
+    def __init__(self, scores=None, host_ports=None, port_counts=None):
+        self.scores = scores or {}
+        self.host_ports = host_ports or {}
+        self.port_counts = port_counts or {}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def hot_hosts(self):
+        """adresses connues, de la plus probable à la moins probable"""
+        return sorted(self.scores, key=lambda ip: (-self.scores[ip], ipaddress.IPv4Address(ip)))
+
+    def order_hosts(self, hosts):
+        """hôtes chauds d'abord, puis le reste de l'itérateur (paresseux, sans doublon)"""
+        hot = self.hot_hosts()
+        for ip in hot:
+            yield ipaddress.IPv4Address(ip)
+        hot = set(hot)
+        for ip in hosts:
+            if str(ip) not in hot:
+                yield ip
+
+    def restrict(self, first, last):
+        """partie de la liste dans la plage [first, last] (entiers), pour un shard"""
+        scores = {ip: score for ip, score in self.scores.items()
+                  if first <= int(ipaddress.IPv4Address(ip)) <= last}
+        host_ports = {ip: ports for ip, ports in self.host_ports.items() if ip in scores}
+        return HotList(scores, host_ports, self.port_counts)
+
+    def port_order(self, ip, ports):
+        """ports déjà vus ouverts sur l'hôte, puis les plus fréquents du site, puis le reste"""
+        seen = self.host_ports.get(ip, {})
+        return sorted(ports, key=lambda port: (-seen.get(port, 0), -self.port_counts.get(port, 0)))
+
+
+def build_hotlist(network, known_hosts=(), snapshot=None, alive_history=None, port_history=None):
+    """
+    known_hosts : declared addresses (KNOWN_HOSTS)
+    alive_history / port_history : history.recent_activity() of the site, if any
+    snapshot : last snapshot, used when there is no history
+    only addresses inside `network` are kept
+    """
+    def in_network(ip):
+        try:
+            return ipaddress.IPv4Address(ip) in network
+        except ValueError:
+            return False
+
+    if not alive_history and snapshot:
+        # pas d'historique SQLite : le dernier passage vaut une observation
+        hosts = snapshot.get("hosts", {})
+        alive_history = {ip: 1.0 for ip in hosts}
+        port_history = {ip: {port: 1 for port in entry.get("ports", [])} for ip, entry in hosts.items()}
+    alive_history = alive_history or {}
+    port_history = port_history or {}
+
+    scores = {}
+    for ip, ratio in alive_history.items():
+        if in_network(ip):
+            scores[ip] = ratio
+    for ip in known_hosts:
+        if in_network(ip):
+            scores[ip] = scores.get(ip, 0) + KNOWN_HOST_SCORE
+
+    host_ports = {ip: dict(ports) for ip, ports in port_history.items() if ip in scores}
+    port_counts = Counter()
+    for ports in host_ports.values():
+        port_counts.update(ports)
+    return HotList(scores, host_ports, dict(port_counts))
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import select
+import socket
+import struct
+from collections import namedtuple
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# constantes Linux absentes du module socket selon la version de Python
+IP_RECVTTL = getattr(socket, "IP_RECVTTL", 12)
+IP_TTL = getattr(socket, "IP_TTL", 2)
+
+# rtt en ms, ttl (None si le noyau ne le remonte pas)
+EchoReply = namedtuple("EchoReply", ["rtt", "ttl"])
+
+# nb de requêtes envoyées avant de vider la file de réception
+SEND_BATCH = 64
+
+
+def inet_checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo(ident, seq):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    payload = b"NTL-SysToolBox"
+    checksum = inet_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def open_icmp_socket():
+    """
+    datagram ICMP socket when the kernel allows it (net.ipv4.ping_group_range),
+    raw socket otherwise (root / CAP_NET_RAW)
+    return : (sock, is_raw) or (None, None)
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        if sys.platform.startswith("linux"):
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVTTL, 1)
+        return sock, False
+    except OSError:
+        pass
+
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+    except OSError:
+        return None, None
+
+
+def _parse_reply(packet, ancdata, is_raw, ident):
+    """return (icmp_type, ttl) ou None si le paquet ne nous concerne pas"""
+    ttl = None
+    if is_raw:
+        if len(packet) < 20:
+            return None
+        header_len = (packet[0] & 0x0F) * 4
+        ttl = packet[8]
+        packet = packet[header_len:]
+    else:
+        for level, ctype, data in ancdata:
+            if level == socket.IPPROTO_IP and ctype == IP_TTL and len(data) >= 4:
+                ttl = struct.unpack("i", data[:4])[0]
+
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, reply_ident, _ = struct.unpack("!BBHHH", packet[:8])
+
+    # en mode datagramme le noyau réécrit l'identifiant, on filtre seulement en raw
+    if is_raw and reply_ident != ident:
+        return None
+    return icmp_type, ttl
+
+
+def _drain(sock, is_raw, ident, sent, replies, on_reply=None):
+    """lit toutes les réponses déjà arrivées (socket non bloquant)"""
+    while True:
+        try:
+            if hasattr(sock, "recvmsg"):
+                packet, ancdata, _, address = sock.recvmsg(2048, socket.CMSG_SPACE(4))
+            else:
+                # Windows : pas de recvmsg, socket raw uniquement (TTL lu dans l'en-tête IP)
+                packet, address = sock.recvfrom(2048)
+                ancdata = []
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return
+
+        received_at = time.monotonic()
+        src = address[0]
+        if src not in sent or src in replies:
+            continue
+
+        parsed = _parse_reply(packet, ancdata, is_raw, ident)
+        if parsed and parsed[0] == ICMP_ECHO_REPLY:
+            replies[src] = EchoReply(round((received_at - sent[src]) * 1000, 2), parsed[1])
+            if on_reply:
+                on_reply(src, replies[src])
+
+
+def sweep(hosts, timeout=1.0, retries=0, on_reply=None, throttle=None):
+    """
+    ICMP echo sweep over a single socket
+    all requests are sent first, replies are matched by source address
+    timeout : seconds after the last request, or a callable re-evaluated while waiting
+              (RTT-adaptive wait)
+    on_reply(ip, EchoReply) is called as replies arrive
+    throttle() returns the delay to wait before each request (shared rate limit)
+    return : {ip: EchoReply} for hosts that answered,
+             None if no ICMP socket can be opened (caller falls back to ping)
+    """
+    sock, is_raw = open_icmp_socket()
+    if sock is None:
+        return None
+
+    targets = [str(ip) for ip in hosts]
+    ident = os.getpid() & 0xFFFF
+    replies = {}
+
+    try:
+        sock.setblocking(False)
+
+        for _ in range(retries + 1):
+            pending = [ip for ip in targets if ip not in replies]
+            if not pending:
+                break
+
+            sent = {}
+            for seq, ip in enumerate(pending):
+                if throttle:
+                    delay = throttle()
+                    if delay:
+                        time.sleep(delay)
+                sent[ip] = time.monotonic()
+                try:
+                    sock.sendto(_build_echo(ident, seq & 0xFFFF), (ip, 0))
+                except BlockingIOError:
+                    # file d'émission pleine : on attend un peu et on retente une fois
+                    select.select([], [sock], [], 0.05)
+                    try:
+                        sock.sendto(_build_echo(ident, seq & 0xFFFF), (ip, 0))
+                    except OSError:
+                        pass
+                except OSError:
+                    # réseau injoignable, adresse de broadcast...
+                    pass
+
+                if seq % SEND_BATCH == SEND_BATCH - 1:
+                    _drain(sock, is_raw, ident, sent, replies, on_reply)
+
+            last_send = time.monotonic()
+            while len(replies) < len(targets):
+                wait = timeout() if callable(timeout) else timeout
+                remaining = last_send + wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if readable:
+                    _drain(sock, is_raw, ident, sent, replies, on_reply)
+    finally:
+        sock.close()
+
+    return replies
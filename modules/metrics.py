@@ -0,0 +1,253 @@
+import os
+import time
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DB = os.path.join(os.path.dirname(BASE_DIR), "logs", "metrics.db")
+
+# clé des rapports de diagnostic qui porte les mesures typées
+METRICS_KEY = "Métriques"
+
+# nom -> (type, unité, libellé) ; port_<n> : état d'un port (1 ouvert, 0 fermé)
+METRIC_SCHEMA = {
+    "cpu_load": (float, "", "CPU Load (1 min)"),
+    "cpu_pct": (float, "%", "CPU"),
+    "ram_pct": (float, "%", "RAM utilisée"),
+    "disk_pct": (float, "%", "Disque utilisé"),
+    "uptime_s": (int, "s", "Uptime"),
+    "ping_rtt_ms": (float, "ms", "Ping"),
+}
+PORT_METRIC = (int, "", "Port {port} ouvert")
+
+# durées de conservation (s) : brut, agrégats 1 minute, agrégats 1 heure
+RAW_RETENTION = 2 * 86400
+MINUTE_RETENTION = 30 * 86400
+HOUR_RETENTION = 2 * 365 * 86400
+
+MINUTE = 60
+HOUR = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    machine TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    UNIQUE (machine, metric)
+);
+CREATE TABLE IF NOT EXISTS samples_raw (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1m (
+    series_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    vmin REAL NOT NULL,
+    vmax REAL NOT NULL,
+    vsum REAL NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (series_id, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1h (
+    series_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    vmin REAL NOT NULL,
+    vmax REAL NOT NULL,
+    vsum REAL NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (series_id, bucket)
+) WITHOUT ROWID;
+"""
+
+# agrégat mis à jour à chaque échantillon (pas de passe de consolidation différée)
+ROLLUP_UPSERT = """
+INSERT INTO {table} (series_id, bucket, vmin, vmax, vsum, n) VALUES (?, ?, ?, ?, ?, 1)
+ON CONFLICT (series_id, bucket) DO UPDATE SET
+    vmin = min(vmin, excluded.vmin),
+    vmax = max(vmax, excluded.vmax),
+    vsum = vsum + excluded.vsum,
+    n = n + 1
+"""
+
+
+def metric_spec(name):
+    """(type, unité, libellé) d'une métrique, None si hors schéma"""
+    if name in METRIC_SCHEMA:
+        return METRIC_SCHEMA[name]
+    if name.startswith("port_") and name[5:].isdigit():
+        kind, unit, label = PORT_METRIC
+        return kind, unit, label.format(port=name[5:])
+    return None
+
+
+def metric_label(name):
+    spec = metric_spec(name)
+    if spec is None:
+        return name
+    return f"{spec[2]} ({spec[1]})" if spec[1] else spec[2]
+
+
+def typed_samples(**values):
+    """mesures d'un diagnostic -> {métrique: valeur typée} ; inconnues et absentes (None) ignorées"""
+    samples = {}
+    for name, value in values.items():
+        spec = metric_spec(name)
+        if spec is None or value is None:
+            continue
+        try:
+            samples[name] = spec[0](value)
+        except (TypeError, ValueError):
+            continue
+    return samples
+
+
+class MetricStore:
+    """
+    numeric samples on disk (SQLite): raw values, 1-minute and 1-hour aggregates
+    (min / max / sum / count) updated on every insert, each level pruned after its retention
+    queries read the finest level still covering the requested range
+    """
+
+    def __init__(self, db_path=METRICS_DB, raw_retention=RAW_RETENTION, minute_retention=MINUTE_RETENTION,
+                 hour_retention=HOUR_RETENTION):
+        self.db_path = db_path
+        self.retention = {"samples_raw": raw_retention, "samples_1m": minute_retention,
+                          "samples_1h": hour_retention}
+        self.series_ids = {}
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _series_id(self, machine, metric):
+        key = (machine, metric)
+        if key not in self.series_ids:
+            self.conn.execute("INSERT OR IGNORE INTO series (machine, metric) VALUES (?, ?)", key)
+            self.series_ids[key] = self.conn.execute(
+                "SELECT id FROM series WHERE machine = ? AND metric = ?", key).fetchone()[0]
+        return self.series_ids[key]
+
+    def record(self, machine, samples, timestamp=None):
+        """
+        échantillons typés d'une machine à un instant donné (secondes epoch)
+        un seul échantillon par série et par seconde : un doublon est ignoré partout,
+        les agrégats comptent exactement les lignes brutes
+        """
+        ts = int(timestamp or time.time())
+        with self.lock, self.conn:
+            for metric, value in samples.items():
+                series_id = self._series_id(machine, metric)
+                value = float(value)
+                inserted = self.conn.execute("INSERT OR IGNORE INTO samples_raw VALUES (?, ?, ?)",
+                                             (series_id, ts, value)).rowcount
+                if not inserted:
+                    continue
+                for table, width in (("samples_1m", MINUTE), ("samples_1h", HOUR)):
+                    self.conn.execute(ROLLUP_UPSERT.format(table=table),
+                                      (series_id, ts - ts % width, value, value, value))
+                self._prune(series_id, ts)
+
+    def _prune(self, series_id, now):
+        # par série : suppression par la clé primaire (series_id, ts / bucket)
+        self.conn.execute("DELETE FROM samples_raw WHERE series_id = ? AND ts < ?",
+                          (series_id, now - self.retention["samples_raw"]))
+        for table in ("samples_1m", "samples_1h"):
+            self.conn.execute(f"DELETE FROM {table} WHERE series_id = ? AND bucket < ?",
+                              (series_id, now - self.retention[table]))
+
+    def query(self, machine, metric, start, end=None, resolution=None):
+        """
+        points of one series between start and end (epoch seconds)
+        resolution : 'raw', '1m', '1h' or None (finest level still holding `start`)
+        return : [(ts, min, max, avg, count), ...] in time order
+        """
+        end = end or time.time()
+        if resolution is None:
+            age = time.time() - start
+            if age <= self.retention["samples_raw"]:
+                resolution = "raw"
+            elif age <= self.retention["samples_1m"]:
+                resolution = "1m"
+            else:
+                resolution = "1h"
+
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM series WHERE machine = ? AND metric = ?",
+                                    (machine, metric)).fetchone()
+            if row is None:
+                return []
+            if resolution == "raw":
+                rows = self.conn.execute(
+                    "SELECT ts, value, value, value, 1 FROM samples_raw "
+                    "WHERE series_id = ? AND ts BETWEEN ? AND ? ORDER BY ts", (row[0], start, end)).fetchall()
+            else:
+                table = "samples_1m" if resolution == "1m" else "samples_1h"
+                rows = self.conn.execute(
+                    f"SELECT bucket, vmin, vmax, vsum / n, n FROM {table} "
+                    "WHERE series_id = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                    (row[0], start - start % (MINUTE if resolution == "1m" else HOUR), end)).fetchall()
+        return [tuple(r) for r in rows]
+
+    def series(self, machine=None):
+        """[(machine, métrique), ...] enregistrées"""
+        with self.lock:
+            if machine:
+                rows = self.conn.execute("SELECT machine, metric FROM series WHERE machine = ? ORDER BY metric",
+                                         (machine,))
+            else:
+                rows = self.conn.execute("SELECT machine, metric FROM series ORDER BY machine, metric")
+            return [tuple(r) for r in rows.fetchall()]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_metric_store():
+    """instance partagée (une connexion, écritures sérialisées)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricStore()
+        return _store
+
+
+def record_metrics(machine, data, timestamp=None):
+    """enregistre les mesures typées d'un rapport de diagnostic (rien si le rapport n'en a pas)"""
+    samples = (data or {}).get(METRICS_KEY)
+    if not samples:
+        return
+    try:
+        get_metric_store().record(machine, samples, timestamp)
+    except sqlite3.Error as e:
+        print(f"[ERREUR] Enregistrement des métriques : {e}")
+
+
+if __name__ == "__main__":
+    # python -m modules.metrics                          -> séries enregistrées
+    # python -m modules.metrics <machine> <métrique> [jours]  -> tendance (résolution automatique)
+    import sys
+    from datetime import datetime
+
+    store = get_metric_store()
+    args = sys.argv[1:]
+    if len(args) >= 2:
+        days = float(args[2]) if len(args) > 2 else 1
+        print(f"{'DATE':<19} | {'MIN':>10} | {'MAX':>10} | {'MOY':>10} | N")
+        for ts, low, high, avg, count in store.query(args[0], args[1], time.time() - days * 86400):
+            print(f"{datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')} | {low:>10.2f} | {high:>10.2f} | "
+                  f"{avg:>10.2f} | {count}")
+    else:
+        for machine, metric in store.series():
+            print(f"{machine};{metric};{metric_label(metric)}")
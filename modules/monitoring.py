@@ -0,0 +1,188 @@
+import io
+import os
+import json
+import math
+import time
+import contextlib
+from array import array
+from datetime import datetime
+from .utils import clear_screen
+from .diagnostic import load_inventory, load_settings
+from .diag_engine import diagnose_all, get_engine_options
+from .metrics import METRICS_KEY, metric_label, record_metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, "configs", "monitoring.json")
+
+DEFAULT_INTERVAL = 10
+# historique gardé en mémoire par métrique (s) : fixe la taille des tampons
+DEFAULT_RETENTION = 3600
+# fenêtres affichées (s) : 5 min et 1 h
+DEFAULT_WINDOWS = [300, 3600]
+
+
+class RingBuffer:
+    """
+    last `capacity` samples of one metric, in two preallocated arrays (time, value)
+    memory is fixed at creation, the oldest sample is overwritten
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        self.times[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        """(timestamp, valeur) du dernier échantillon, None si vide"""
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def window(self, since):
+        """valeurs des échantillons pris depuis `since`, du plus récent au plus ancien"""
+        for offset in range(1, self.count + 1):
+            index = (self.head - offset) % self.capacity
+            if self.times[index] < since:
+                break
+            yield self.values[index]
+
+    def stats(self, since):
+        """{'min', 'max', 'avg', 'count'} sur la fenêtre, None si aucun échantillon"""
+        count, total, low, high = 0, 0.0, math.inf, -math.inf
+        for value in self.window(since):
+            count += 1
+            total += value
+            low = min(low, value)
+            high = max(high, value)
+        if not count:
+            return None
+        return {"min": low, "max": high, "avg": total / count, "count": count}
+
+
+def extract_metrics(data):
+    """mesures typées d'un rapport de diagnostic -> {métrique: float} ; ports : 1 ouvert, 0 fermé"""
+    return {metric: float(value) for metric, value in (data or {}).get(METRICS_KEY, {}).items()}
+
+
+class Monitor:
+    """
+    metric time series of each monitored machine, one RingBuffer per (machine, metric)
+    capacity = retention / interval samples, so memory per machine does not grow over time
+    """
+
+    def __init__(self, inventory, interval=DEFAULT_INTERVAL, retention=DEFAULT_RETENTION, persist=True,
+                 engine_options=None):
+        self.inventory = inventory
+        # concurrence et délais du moteur (clé settings de diagnostic.json)
+        self.engine_options = engine_options or {}
+        # relevés aussi écrits dans metrics.db (tendances au-delà de la rétention en mémoire)
+        self.persist = persist
+        self.interval = interval
+        self.capacity = max(1, math.ceil(retention / interval))
+        self.series = {}  # machine -> {metric: RingBuffer}
+        self.status = {}  # machine -> (horodatage, erreur ou None)
+
+    def record(self, machine, data, error, timestamp=None):
+        timestamp = timestamp or time.time()
+        self.status[machine] = (timestamp, error or (data or {}).get("ERREUR"))
+        if self.persist:
+            record_metrics(machine, data, timestamp)
+        series = self.series.setdefault(machine, {})
+        for metric, value in extract_metrics(data).items():
+            if metric not in series:
+                series[metric] = RingBuffer(self.capacity)
+            series[metric].append(timestamp, value)
+
+    def stats(self, machine, metric, seconds, now=None):
+        """min / max / moyenne de la métrique sur les `seconds` dernières secondes"""
+        buffer = self.series.get(machine, {}).get(metric)
+        if buffer is None:
+            return None
+        return buffer.stats((now or time.time()) - seconds)
+
+    def poll(self):
+        """une passe de diagnostic sur tout l'inventaire (sorties console des collectes masquées)"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            diagnose_all(self.inventory, self.record, **self.engine_options)
+
+    def render(self, windows=DEFAULT_WINDOWS):
+        now = time.time()
+        labels = [f"{seconds // 3600} h" if seconds >= 3600 else f"{seconds // 60} min" for seconds in windows]
+        lines = [f" {'MÉTRIQUE':<22} | {'DERNIÈRE':>9} | " +
+                 " | ".join(f"{label + ' (min / max / moy)':^26}" for label in labels)]
+
+        report = []
+        for machine in sorted(self.status):
+            timestamp, error = self.status[machine]
+            state = f"[!] {error}" if error else "[OK]"
+            report.append(f"\n[{machine}] {state} (relevé {datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')})")
+            series = self.series.get(machine, {})
+            if not series:
+                continue
+            report.extend(lines)
+            report.append(" " + "-" * (len(lines[0]) - 1))
+            for metric in sorted(series):
+                last = series[metric].latest()[1]
+                cells = []
+                for seconds in windows:
+                    stats = series[metric].stats(now - seconds)
+                    cells.append(f"{stats['min']:>7.2f} / {stats['max']:>7.2f} / {stats['avg']:>7.2f}"
+                                 if stats else f"{'-':^26}")
+                report.append(f" {metric_label(metric):<22} | {last:>9.2f} | " + " | ".join(cells))
+        return "\n".join(report)
+
+
+def load_monitoring_config():
+    """réglages de la surveillance (valeurs par défaut si le fichier est absent)"""
+    if not os.path.exists(CONFIG_FILE):
+        return {}
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERREUR] Lecture de {CONFIG_FILE} : {e}")
+        return {}
+
+
+def run_monitoring():
+    """surveillance continue de l'inventaire, rafraîchie à chaque relevé (Ctrl+C pour arrêter)"""
+    config = load_monitoring_config()
+    inventory = load_inventory()
+    machines = config.get("machines") or list(inventory)
+    inventory = {key: inventory[key] for key in machines if key in inventory}
+    if not inventory:
+        print("[!] Aucune machine à surveiller. Vérifiez configs/diagnostic.json et configs/monitoring.json")
+        return
+
+    interval = config.get("interval", DEFAULT_INTERVAL)
+    windows = config.get("windows", DEFAULT_WINDOWS)
+    monitor = Monitor(inventory, interval, config.get("retention", DEFAULT_RETENTION), config.get("persist", True),
+                      get_engine_options(load_settings()))
+    print(f"[*] Surveillance de {len(inventory)} machine(s), relevé toutes les {interval}s...")
+
+    try:
+        while True:
+            started = time.monotonic()
+            monitor.poll()
+            clear_screen()
+            print("=" * 60)
+            print(f"--- SURVEILLANCE CONTINUE ({datetime.now().strftime('%H:%M:%S')}, "
+                  f"toutes les {interval}s, Ctrl+C pour arrêter) ---")
+            print("=" * 60)
+            print(monitor.render(windows))
+            # relevé plus long que l'intervalle : le suivant part aussitôt
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\n[*] Surveillance arrêtée.")
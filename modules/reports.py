@@ -0,0 +1,71 @@
+import os
+import csv
+import heapq
+import tempfile
+import ipaddress
+
+AUDIT_FIELDNAMES = ['IP', 'Nom (DNS)', 'OS Détecté', 'Statut Support (EOL)', 'Date Fin Support', 'Ports Ouverts', 'Adresse MAC']
+
+# lignes triées en mémoire avant d'écrire un fichier intermédiaire
+SORT_CHUNK_ROWS = 50000
+
+
+def _ip_key(row):
+    return int(ipaddress.IPv4Address(row['IP']))
+
+
+def _write_run(rows, directory, fieldnames):
+    rows.sort(key=_ip_key)
+    fd, path = tempfile.mkstemp(prefix="audit_run_", suffix=".csv", dir=directory)
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
+        writer.writerows(rows)
+    return path
+
+
+def _read_run(path, fieldnames):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f, fieldnames=fieldnames, delimiter=';'):
+            yield row
+
+
+def external_sort_csv(source, destination, fieldnames=AUDIT_FIELDNAMES, chunk_rows=SORT_CHUNK_ROWS):
+    """
+    sort an audit CSV by IP without loading it: sorted runs of chunk_rows rows
+    are written to temporary files, then merged with heapq.merge
+    return : number of rows written
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    runs = []
+    rows = []
+    count = 0
+
+    try:
+        with open(source, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f, delimiter=';'):
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    runs.append(_write_run(rows, directory, fieldnames))
+                    rows = []
+        if rows:
+            runs.append(_write_run(rows, directory, fieldnames))
+
+        with open(destination, 'w', newline='', encoding='utf-8-sig') as out:
+            writer = csv.DictWriter(out, fieldnames=fieldnames, delimiter=';')
+            writer.writeheader()
+            for row in heapq.merge(*[_read_run(path, fieldnames) for path in runs], key=_ip_key):
+                writer.writerow(row)
+                count += 1
+    finally:
+        for path in runs:
+            if os.path.exists(path):
+                os.remove(path)
+
+    return count
+
+
+def iter_report_rows(path):
+    """relit un rapport CSV ligne par ligne"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            yield row
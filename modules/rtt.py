@@ -0,0 +1,92 @@
+import errno
+import threading
+import ipaddress
+
+DEFAULT_MIN_TIMEOUT = 0.05
+DEFAULT_MAX_TIMEOUT = 2.0
+DEFAULT_INITIAL_TIMEOUT = 0.5
+# préfixe utilisé pour regrouper les hôtes d'un même lien
+DEFAULT_PREFIX = 24
+
+# codes connect_ex qui correspondent à un aller-retour complet (SYN-ACK ou RST)
+CONNECT_RTT_CODES = {0, errno.ECONNREFUSED, getattr(errno, "WSAECONNREFUSED", errno.ECONNREFUSED)}
+
+# RFC 6298
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+
+class RttEstimator:
+    """
+    SRTT / RTTVAR estimator (TCP style) for one subnet
+    fed with ICMP replies and TCP connect/refused times, in seconds
+    """
+
+    def __init__(self, min_timeout=DEFAULT_MIN_TIMEOUT, max_timeout=DEFAULT_MAX_TIMEOUT,
+                 initial_timeout=DEFAULT_INITIAL_TIMEOUT):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.initial_timeout = initial_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def add_sample(self, rtt):
+        with self.lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+            self.samples += 1
+
+    def timeout(self, default=None):
+        """
+        RTO = SRTT + K*RTTVAR, borné
+        tant qu'aucune mesure : `default` si fourni, sinon le timeout initial
+        """
+        with self.lock:
+            if self.srtt is None:
+                rto = default if default is not None else self.initial_timeout
+            else:
+                rto = self.srtt + K * self.rttvar
+        return min(self.max_timeout, max(self.min_timeout, rto))
+
+
+_estimators = {}
+_settings = {
+    "min_timeout": DEFAULT_MIN_TIMEOUT,
+    "max_timeout": DEFAULT_MAX_TIMEOUT,
+    "initial_timeout": DEFAULT_INITIAL_TIMEOUT,
+    "prefix": DEFAULT_PREFIX
+}
+_lock = threading.Lock()
+
+
+def configure(config):
+    """bornes lues depuis audit.json (rtt_min_timeout, rtt_max_timeout, connect_timeout)"""
+    config = config or {}
+    with _lock:
+        _settings["min_timeout"] = config.get("rtt_min_timeout", DEFAULT_MIN_TIMEOUT)
+        _settings["max_timeout"] = config.get("rtt_max_timeout", DEFAULT_MAX_TIMEOUT)
+        _settings["initial_timeout"] = config.get("connect_timeout", DEFAULT_INITIAL_TIMEOUT)
+        _settings["prefix"] = config.get("rtt_prefix", DEFAULT_PREFIX)
+        for estimator in _estimators.values():
+            estimator.min_timeout = _settings["min_timeout"]
+            estimator.max_timeout = _settings["max_timeout"]
+            estimator.initial_timeout = _settings["initial_timeout"]
+
+
+def get_estimator(ip):
+    """estimateur partagé du sous-réseau de `ip` (/24 par défaut)"""
+    with _lock:
+        network = ipaddress.IPv4Network(f"{ip}/{_settings['prefix']}", strict=False)
+        estimator = _estimators.get(network)
+        if estimator is None:
+            estimator = RttEstimator(_settings["min_timeout"], _settings["max_timeout"],
+                                     _settings["initial_timeout"])
+            _estimators[network] = estimator
+        return estimator
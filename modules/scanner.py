@@ -0,0 +1,274 @@
+import time
+import asyncio
+import itertools
+import platform
+from .icmp import sweep
+from .synscan import syn_scan
+from .rtt import get_estimator
+from .banners import read_banner, DEFAULT_BANNER_TIMEOUT
+
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_CONNECT_TIMEOUT = 0.5
+DEFAULT_PING_TIMEOUT = 1
+# mode streaming : adresses tirées par paquets depuis l'itérateur
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_MAX_CHUNKS = 4
+
+
+def build_ping_command(ip_str, timeout=1):
+    """commande ping adaptée à l'OS (1 paquet)"""
+    # Windows uses -n for count, -w for timeout in ms
+    # Linux uses -c for count, -W for timeout in seconds
+    if platform.system().lower() == "windows":
+        return ["ping", "-n", "1", "-w", str(int(timeout * 1000)), ip_str]
+    return ["ping", "-c", "1", "-W", str(max(1, int(round(timeout)))), ip_str]
+
+
+async def async_ping(ip_str, timeout, limiter):
+    """ping ICMP non bloquant (subprocess asyncio)"""
+    async with limiter:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *build_ping_command(ip_str, timeout),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError:
+            return False
+
+        try:
+            return await asyncio.wait_for(proc.wait(), timeout + 1) == 0
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return False
+
+
+async def async_probe_port(ip_str, port, timeout, limiter, estimator=None, on_banner=None,
+                           banner_timeout=DEFAULT_BANNER_TIMEOUT):
+    """
+    connexion TCP non bloquante, True si le port est ouvert
+    avec un estimator, le timeout est son RTO au moment de l'envoi et la mesure l'alimente
+    on_banner(ip, port, banner) : bannière lue sur cette même connexion avant sa fermeture
+    """
+    async with limiter:
+        if estimator is not None:
+            timeout = estimator.timeout(timeout)
+        started = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip_str, port), timeout)
+        except ConnectionRefusedError:
+            # un RST est aussi un aller-retour complet
+            if estimator is not None:
+                estimator.add_sample(time.monotonic() - started)
+            return False
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+        if estimator is not None:
+            estimator.add_sample(time.monotonic() - started)
+        if on_banner is not None:
+            banner = await read_banner(ip_str, port, reader, writer, banner_timeout)
+            if banner:
+                on_banner(ip_str, port, banner)
+        writer.close()
+        try:
+            # borné : après une négociation TLS interrompue, wait_closed peut ne jamais aboutir
+            await asyncio.wait_for(writer.wait_closed(), banner_timeout)
+        except asyncio.TimeoutError:
+            writer.transport.abort()
+        except OSError:
+            pass
+        return True
+
+
+async def async_scan_hosts(hosts, ports, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                           connect_timeout=DEFAULT_CONNECT_TIMEOUT, ping_timeout=DEFAULT_PING_TIMEOUT,
+                           known_alive=None, priority=None, on_result=None, adaptive=True, limiter=None,
+                           throttle=None, scan_method="connect", port_order=None, on_banner=None,
+                           banner_timeout=DEFAULT_BANNER_TIMEOUT):
+    """
+    probe every (host, port) pair concurrently
+    hosts in known_alive (passive discovery) are probed first and never wait on a ping,
+    then hosts in priority (e.g. seen in the previous run), then the rest
+    priority : iterable of addresses, or {ip: score} (higher score probed first)
+    port_order(ip, ports) : order in which the ports of one host are probed (likely ports first)
+    a host is reported as soon as its ports and its own ICMP reply are in, not at the end of the sweep
+    liveness comes from one batched ICMP sweep (single socket) running alongside the connects,
+    with one ping subprocess per host only if no ICMP socket is available
+    one semaphore bounds the number of probes in flight (`limiter` to share it,
+    e.g. a SiteLimiter of the global scheduler) ; throttle paces the ICMP sweep and SYN probes
+    scan_method : "connect" (full handshake per port) or "syn" (half-open scan from one raw
+                  socket, falls back to connect without CAP_NET_RAW)
+    on_result(result) is called for each host as soon as it is complete
+    on_banner(ip, port, banner) : service banners read on the connect() probes themselves
+                                  (SSH greeting, HTTP / TLS Server header), before on_result of the host
+    adaptive : timeouts derived from a per-subnet RTT estimate (connect_timeout /
+               ping_timeout only used until the first measurement)
+    return : [(ip_str, is_alive, open_ports, ttl), ...]
+    """
+    limiter = limiter or asyncio.Semaphore(max_in_flight)
+    known_alive = set(known_alive or ())
+    if not isinstance(priority, dict):
+        priority = dict.fromkeys(priority or (), 1)
+    hosts = [str(ip) for ip in hosts]
+    # le sémaphore sert les tâches dans l'ordre de création : hôtes connus en tête
+    hosts.sort(key=lambda ip: (ip not in known_alive, -priority.get(ip, 0)))
+    loop = asyncio.get_running_loop()
+
+    estimators = {ip: get_estimator(ip) for ip in hosts} if adaptive else {}
+    if adaptive:
+        subnets = set(estimators.values())
+
+        def icmp_timeout():
+            return max(estimator.timeout(ping_timeout) for estimator in subnets)
+
+    else:
+        icmp_timeout = ping_timeout
+
+    # réponse ICMP de chaque hôte, connue dès son arrivée (sans attendre la fin du balayage)
+    early_replies = {ip: loop.create_future() for ip in hosts}
+
+    def set_reply(ip, reply):
+        if not early_replies[ip].done():
+            early_replies[ip].set_result(reply)
+
+    def on_reply(ip, reply):
+        if adaptive:
+            estimators[ip].add_sample(reply.rtt / 1000)
+        loop.call_soon_threadsafe(set_reply, ip, reply)
+
+    async def liveness():
+        replies = await loop.run_in_executor(None, sweep, hosts, icmp_timeout, 0, on_reply, throttle)
+        if replies is not None:
+            return replies
+        # pas de socket ICMP (droits insuffisants) : retour au ping système
+        ping_tasks = {
+            ip: asyncio.ensure_future(async_ping(ip, ping_timeout, limiter))
+            for ip in hosts if ip not in known_alive
+        }
+        await asyncio.gather(*ping_tasks.values())
+        return {ip: None for ip, task in ping_tasks.items() if task.result()}
+
+    liveness_task = asyncio.ensure_future(liveness())
+    port_tasks = {}
+
+    def probe_order(ip):
+        return port_order(ip, ports) if port_order else ports
+
+    def start_connects():
+        for ip in hosts:
+            for port in probe_order(ip):
+                port_tasks[(ip, port)] = asyncio.ensure_future(
+                    async_probe_port(ip, port, connect_timeout, limiter, estimators.get(ip), on_banner,
+                                     banner_timeout)
+                )
+
+    if scan_method == "syn":
+        # SYN envoyés hors limiter (pas de socket par sonde), seul le débit est borné
+        def syn_timeout():
+            if not adaptive:
+                return connect_timeout
+            return max(estimator.timeout(connect_timeout) for estimator in subnets)
+
+        def on_syn_reply(ip, rtt):
+            if ip in estimators:
+                estimators[ip].add_sample(rtt)
+
+        targets = [(ip, port) for ip in hosts for port in probe_order(ip)]
+        syn_task = loop.run_in_executor(None, syn_scan, targets, syn_timeout, 1, throttle, on_syn_reply)
+    else:
+        start_connects()
+
+    async def open_ports_of(ip):
+        if scan_method == "syn":
+            states = await syn_task
+            if states is not None:
+                return [port for port in ports if states.get((ip, port))]
+            # pas de socket raw : repli sur connect() (une seule fois pour tous les hôtes)
+            if not port_tasks:
+                start_connects()
+        return [port for port in ports if await port_tasks[(ip, port)]]
+
+    async def host_result(ip):
+        open_ports = await open_ports_of(ip)
+        early = early_replies[ip]
+        if not early.done():
+            await asyncio.wait([early, liveness_task], return_when=asyncio.FIRST_COMPLETED)
+        if early.done():
+            reply, is_alive = early.result(), True
+        else:
+            # fin du balayage sans réponse (ou ping système) : résultat global
+            replies = liveness_task.result()
+            reply = replies.get(ip)
+            is_alive = ip in replies or ip in known_alive or bool(open_ports)
+        result = (ip, is_alive, open_ports, reply.ttl if reply else None)
+        if on_result:
+            on_result(result)
+        return result
+
+    return await asyncio.gather(*(host_result(ip) for ip in hosts))
+
+
+async def async_stream_hosts(hosts, ports, on_result, chunk_size=DEFAULT_CHUNK_SIZE,
+                             max_chunks=DEFAULT_MAX_CHUNKS, max_in_flight=DEFAULT_MAX_IN_FLIGHT, limiter=None,
+                             **options):
+    """
+    lazy variant for large ranges: addresses are pulled from the iterator chunk by chunk,
+    at most max_chunks chunks in flight, all sharing one probe limiter
+    results are only handed to on_result, nothing is kept, so memory does not grow with the CIDR
+    """
+    limiter = limiter or asyncio.Semaphore(max_in_flight)
+    slots = asyncio.Semaphore(max_chunks)
+    iterator = iter(hosts)
+    # seuls les paquets en cours sont référencés, retirés dès leur fin
+    in_flight = set()
+    errors = []
+
+    async def run_chunk(chunk):
+        try:
+            await async_scan_hosts(chunk, ports, on_result=on_result, limiter=limiter, **options)
+        finally:
+            slots.release()
+
+    def chunk_done(task):
+        in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    while not errors:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            break
+        # soumission bornée : on attend qu'un paquet se termine avant de lire la suite
+        await slots.acquire()
+        task = asyncio.ensure_future(run_chunk(chunk))
+        in_flight.add(task)
+        task.add_done_callback(chunk_done)
+
+    await asyncio.gather(*in_flight, return_exceptions=True)
+    if errors:
+        raise errors[0]
+
+
+def scan_hosts(hosts, ports, **options):
+    """point d'entrée synchrone du moteur asyncio"""
+    return asyncio.run(async_scan_hosts(hosts, ports, **options))
+
+
+def stream_hosts(hosts, ports, on_result, **options):
+    """point d'entrée synchrone du mode streaming"""
+    asyncio.run(async_stream_hosts(hosts, ports, on_result, **options))
+
+
+def get_scan_options(config):
+    """extrait les réglages du moteur depuis audit.json"""
+    config = config or {}
+    return {
+        "max_in_flight": config.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT),
+        "connect_timeout": config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        "ping_timeout": config.get("ping_timeout", DEFAULT_PING_TIMEOUT),
+        "adaptive": config.get("adaptive_timeouts", True),
+        "scan_method": config.get("scan_method", "connect"),
+        "banner_timeout": config.get("banner_timeout", DEFAULT_BANNER_TIMEOUT),
+    }
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+DEFAULT_GLOBAL_MAX_IN_FLIGHT = 512
+# 0 = pas de limite de débit
+DEFAULT_PROBES_PER_SECOND = 0
+
+
+class ProbeScheduler:
+    """
+    global probe budget shared by every site scan
+    - at most max_in_flight probes in flight across all sites
+    - freed slots are handed to waiting sites in round-robin (per-site fairness)
+    - optional token bucket: probes_per_second with a burst of one second
+    thread-safe: each site scan runs its own event loop in its own thread
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_GLOBAL_MAX_IN_FLIGHT, probes_per_second=DEFAULT_PROBES_PER_SECOND):
+        self.max_in_flight = max_in_flight
+        self.rate = probes_per_second
+        self.in_flight = 0
+        self.waiting = OrderedDict()  # site -> deque[(loop, future)]
+        self.tokens = float(probes_per_second)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        réserve un jeton du seau ; retourne le délai (s) à attendre avant d'envoyer
+        (réservation FIFO : le solde peut devenir négatif)
+        """
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, site):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self.in_flight += 1
+                future = None
+            else:
+                future = loop.create_future()
+                self.waiting.setdefault(site, deque()).append((loop, future))
+
+        try:
+            if future is not None:
+                await future
+            delay = self.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # encore en file : en sortir (sinon un release() viserait une boucle peut-être fermée)
+            if future is not None and self._dequeue(site, loop, future):
+                raise
+            # créneau déjà obtenu : le rendre, sinon _grant s'en charge
+            if future is None or (future.done() and not future.cancelled()):
+                self.release()
+            raise
+
+    def _dequeue(self, site, loop, future):
+        with self.lock:
+            queue = self.waiting.get(site)
+            if not queue or (loop, future) not in queue:
+                return False
+            queue.remove((loop, future))
+            if not queue:
+                del self.waiting[site]
+            return True
+
+    def release(self):
+        with self.lock:
+            while self.waiting:
+                # site suivant dans le tourniquet, puis il repasse en fin de file
+                site, queue = next(iter(self.waiting.items()))
+                loop, future = queue.popleft()
+                if queue:
+                    self.waiting.move_to_end(site)
+                else:
+                    del self.waiting[site]
+                # attente abandonnée (scan du site terminé sur erreur) : créneau au suivant
+                if loop.is_closed() or future.done():
+                    continue
+                try:
+                    # le créneau passe directement au suivant (in_flight inchangé)
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    continue
+            self.in_flight -= 1
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class SiteLimiter:
+    """vue d'un site sur le scheduler, utilisable comme `async with limiter`"""
+
+    def __init__(self, scheduler, site):
+        self.scheduler = scheduler
+        self.site = site
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.site)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release()
+
+
+def create_scheduler(config):
+    """scheduler global depuis audit.json"""
+    config = config or {}
+    return ProbeScheduler(
+        config.get("global_max_in_flight", DEFAULT_GLOBAL_MAX_IN_FLIGHT),
+        config.get("probes_per_second", DEFAULT_PROBES_PER_SECOND)
+    )
@@ -0,0 +1,178 @@
+import os
+import queue
+import ipaddress
+import multiprocessing
+from . import rtt
+from .scanner import stream_hosts, get_scan_options, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNKS
+from .hotlist import HotList
+from .scheduler import ProbeScheduler, SiteLimiter, DEFAULT_PROBES_PER_SECOND
+
+DEFAULT_SHARD_THRESHOLD = 65536
+# résultats regroupés par message vers le processus principal
+RESULT_BATCH = 256
+# sans nouvelle d'un shard pendant ce délai, on vérifie qu'il est encore en vie
+POLL_INTERVAL = 5
+
+
+class ShardError(Exception):
+    """un ou plusieurs shards n'ont pas terminé leur plage : résultats incomplets"""
+
+
+def get_shard_count(config):
+    """
+    scan_processes : 0 = un processus par cœur, 1 = pas de sharding
+    jamais plus de processus que de cœurs : au-delà ils se disputent le CPU
+    et les connexions dépassent les timeouts adaptatifs
+    """
+    cores = os.cpu_count() or 1
+    processes = (config or {}).get("scan_processes", 1)
+    if processes == 0:
+        processes = cores
+    return max(1, min(processes, cores))
+
+
+def split_network(network, shards):
+    """
+    découpe les adresses hôtes en `shards` plages contiguës
+    return : [(first_int, last_int), ...] (bornes incluses)
+    """
+    if network.prefixlen >= 31:
+        first, last = int(network.network_address), int(network.broadcast_address)
+    else:
+        first, last = int(network.network_address) + 1, int(network.broadcast_address) - 1
+
+    total = last - first + 1
+    shards = max(1, min(shards, total))
+    size, extra = divmod(total, shards)
+    ranges = []
+    start = first
+    for index in range(shards):
+        end = start + size - 1 + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _iter_range(first, last):
+    for value in range(first, last + 1):
+        yield ipaddress.IPv4Address(value)
+
+
+def _encode(result, ports):
+    """(ip, vivant, ports, ttl) -> (ip_int, ttl, masque des ports ouverts)"""
+    ip_str, _, open_ports, ttl = result
+    mask = 0
+    for index, port in enumerate(ports):
+        if port in open_ports:
+            mask |= 1 << index
+    return int(ipaddress.IPv4Address(ip_str)), ttl, mask
+
+
+def _decode(item, ports):
+    ip_int, ttl, mask = item
+    open_ports = [port for index, port in enumerate(ports) if mask & (1 << index)]
+    return str(ipaddress.IPv4Address(ip_int)), True, open_ports, ttl
+
+
+def _scan_shard(shard_id, first, last, ports, config, options, known_alive, hotlist, results):
+    """
+    worker process: own event loop and own share of the probe budget
+    only alive hosts are sent back, RESULT_BATCH encoded results per message
+    messages : (shard_id, batch, None), then (shard_id, None, error or None) at the end
+    """
+    rtt.configure(config)
+    scheduler = ProbeScheduler(options.pop("max_in_flight"), options.pop("probes_per_second"))
+    batch = []
+
+    def on_result(result):
+        if not result[1]:
+            return
+        batch.append(_encode(result, ports))
+        if len(batch) >= RESULT_BATCH:
+            results.put((shard_id, list(batch), None))
+            batch.clear()
+
+    error = None
+    try:
+        stream_hosts(hotlist.order_hosts(_iter_range(first, last)), ports, on_result,
+                     known_alive={str(ipaddress.IPv4Address(ip)) for ip in known_alive},
+                     priority=hotlist.scores, port_order=hotlist.port_order,
+                     limiter=SiteLimiter(scheduler, shard_id), throttle=scheduler.reserve, **options)
+        if batch:
+            results.put((shard_id, batch, None))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        # fin du shard, avec l'erreur éventuelle
+        results.put((shard_id, None, error))
+
+
+def sharded_scan(network, ports, on_result, shards, config=None, scan_method="connect",
+                 known_alive=None, hotlist=None):
+    """
+    scan `network` with `shards` worker processes, each on a contiguous slice
+    max_in_flight and probes_per_second are divided between shards
+    hotlist : HotList of the site, each shard gets the part of it inside its slice
+    on_result((ip_str, True, open_ports, ttl)) is called in the calling process for each alive host
+    raises ShardError once every shard is over if one of them failed or died
+    """
+    config = config or {}
+    ranges = split_network(network, shards)
+    ports = list(ports)
+
+    options = get_scan_options(config)
+    options["scan_method"] = scan_method
+    options["max_in_flight"] = max(1, options["max_in_flight"] // len(ranges))
+    options["probes_per_second"] = config.get("probes_per_second", DEFAULT_PROBES_PER_SECOND) / len(ranges)
+    options["chunk_size"] = config.get("stream_chunk_size", DEFAULT_CHUNK_SIZE)
+    options["max_chunks"] = config.get("stream_max_chunks", DEFAULT_MAX_CHUNKS)
+
+    known_ints = [int(ipaddress.IPv4Address(ip)) for ip in (known_alive or [])]
+    hotlist = hotlist or HotList()
+
+    # spawn : les sites sont scannés depuis des threads, fork y est dangereux
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = []
+    for shard_id, (first, last) in enumerate(ranges):
+        worker = context.Process(
+            target=_scan_shard,
+            args=(shard_id, first, last, ports, config, dict(options),
+                  [ip for ip in known_ints if first <= ip <= last],
+                  hotlist.restrict(first, last), results),
+            daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+
+    running = set(range(len(workers)))
+    failures = {}
+    try:
+        while running:
+            try:
+                shard_id, batch, error = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # shard tué sans avoir pu envoyer sa fin
+                for shard_id in list(running):
+                    if not workers[shard_id].is_alive():
+                        failures[shard_id] = f"processus arrêté (code {workers[shard_id].exitcode})"
+                        print(f"[ERREUR] Le shard {shard_id} s'est arrêté (code {workers[shard_id].exitcode}).")
+                        running.discard(shard_id)
+                continue
+            if batch is None:
+                if error:
+                    failures[shard_id] = error
+                    print(f"[ERREUR] Shard {shard_id} : {error}")
+                running.discard(shard_id)
+                continue
+            for item in batch:
+                on_result(_decode(item, ports))
+    finally:
+        for worker in workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+
+    if failures:
+        detail = ", ".join(f"shard {shard_id} ({error})" for shard_id, error in sorted(failures.items()))
+        raise ShardError(f"{len(failures)}/{len(ranges)} shard(s) en échec : {detail}")
@@ -0,0 +1,303 @@
+import os
+import socket
+import struct
+import fnmatch
+import threading
+import concurrent.futures
+from .rtt import get_estimator
+
+SMB_PORT = 445
+NETBIOS_NS_PORT = 137
+DEFAULT_TIMEOUT = 1.0
+
+# noms NetBIOS des serveurs quand le build est commun poste / serveur (ex: 17763)
+DEFAULT_SERVER_PATTERNS = ["SRV-*", "DC*"]
+
+# build Windows -> version (NTLM renvoie major.minor.build sans l'édition)
+SERVER_BUILDS = {
+    6002: "Windows Server 2008",
+    7601: "Windows Server 2008 R2",
+    9200: "Windows Server 2012",
+    9600: "Windows Server 2012 R2",
+    14393: "Windows Server 2016",
+    17763: "Windows Server 2019",
+    20348: "Windows Server 2022",
+    26100: "Windows Server 2025",
+}
+CLIENT_BUILDS = {
+    7601: "Windows 7 SP1",
+    9200: "Windows 8",
+    9600: "Windows 8.1",
+    10240: "Windows 10 1507",
+    10586: "Windows 10 1511",
+    14393: "Windows 10 1607",
+    15063: "Windows 10 1703",
+    16299: "Windows 10 1709",
+    17134: "Windows 10 1803",
+    17763: "Windows 10 1809",
+    18362: "Windows 10 1903",
+    18363: "Windows 10 1909",
+    19041: "Windows 10 2004",
+    19042: "Windows 10 20H2",
+    19043: "Windows 10 21H1",
+    19044: "Windows 10 21H2",
+    19045: "Windows 10 22H2",
+    22000: "Windows 11 21H2",
+    22621: "Windows 11 22H2",
+    22631: "Windows 11 23H2",
+    26100: "Windows 11 24H2",
+    26200: "Windows 11 25H2",
+}
+
+# version -> cycle endoflife.date (éditions Home/Pro "-w" quand le cycle est scindé : fin la plus proche)
+WINDOWS_API_MAPPING = {
+    "Windows Server 2008": ("windows-server", "2008-sp2"),
+    "Windows Server 2008 R2": ("windows-server", "2008-r2-sp1"),
+    "Windows Server 2012": ("windows-server", "2012"),
+    "Windows Server 2012 R2": ("windows-server", "2012-r2"),
+    "Windows Server 2016": ("windows-server", "2016"),
+    "Windows Server 2019": ("windows-server", "2019"),
+    "Windows Server 2022": ("windows-server", "2022"),
+    "Windows Server 2025": ("windows-server", "2025"),
+    "Windows 7 SP1": ("windows", "7-sp1"),
+    "Windows 8": ("windows", "8"),
+    "Windows 8.1": ("windows", "8.1"),
+    "Windows 10 1507": ("windows", "10-1507"),
+    "Windows 10 1511": ("windows", "10-1511"),
+    "Windows 10 1607": ("windows", "10-1607-w"),
+    "Windows 10 1703": ("windows", "10-1703-w"),
+    "Windows 10 1709": ("windows", "10-1709-w"),
+    "Windows 10 1803": ("windows", "10-1803-w"),
+    "Windows 10 1809": ("windows", "10-1809-w"),
+    "Windows 10 1903": ("windows", "10-1903"),
+    "Windows 10 1909": ("windows", "10-1909-w"),
+    "Windows 10 2004": ("windows", "10-2004"),
+    "Windows 10 20H2": ("windows", "10-20h2-w"),
+    "Windows 10 21H1": ("windows", "10-21h1"),
+    "Windows 10 21H2": ("windows", "10-21h2-w"),
+    "Windows 10 22H2": ("windows", "10-22h2"),
+    "Windows 11 21H2": ("windows", "11-21h2-w"),
+    "Windows 11 22H2": ("windows", "11-22h2-w"),
+    "Windows 11 23H2": ("windows", "11-23h2-w"),
+    "Windows 11 24H2": ("windows", "11-24h2-w"),
+    "Windows 11 25H2": ("windows", "11-25h2-w"),
+}
+
+# SMB2
+SMB2_NEGOTIATE = 0
+SMB2_SESSION_SETUP = 1
+SMB2_DIALECTS = [0x0202, 0x0210, 0x0300, 0x0302]
+STATUS_MORE_PROCESSING_REQUIRED = 0xC0000016
+SMB2_HEADER = struct.Struct("<4sHHIHHIIQIIQ16s")
+
+# NTLMSSP NEGOTIATE : unicode, target info, version demandés, aucune authentification
+NTLMSSP_FLAGS = 0xE2088297
+# AV pairs du CHALLENGE
+AV_NB_COMPUTER, AV_NB_DOMAIN, AV_DNS_COMPUTER, AV_DNS_DOMAIN = 1, 2, 3, 4
+
+SPNEGO_OID = bytes.fromhex("2b0601050502")
+NTLMSSP_OID = bytes.fromhex("2b06010401823702020a")
+
+# suffixe NetBIOS du groupe "contrôleurs de domaine"
+NB_DOMAIN_CONTROLLERS = 0x1C
+
+_settings = {
+    "enabled": True,
+    "timeout": DEFAULT_TIMEOUT,
+    "server_patterns": DEFAULT_SERVER_PATTERNS
+}
+_lock = threading.Lock()
+
+
+def configure(config):
+    """réglages lus depuis audit.json (smb_probe, smb_timeout, smb_server_patterns)"""
+    config = config or {}
+    with _lock:
+        _settings["enabled"] = config.get("smb_probe", True)
+        _settings["timeout"] = config.get("smb_timeout", DEFAULT_TIMEOUT)
+        _settings["server_patterns"] = config.get("smb_server_patterns", DEFAULT_SERVER_PATTERNS)
+
+
+def _der(tag, payload):
+    length = len(payload)
+    if length < 0x80:
+        return bytes([tag, length]) + payload
+    size = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | size]) + length.to_bytes(size, "big") + payload
+
+
+def _smb2_packet(command, message_id, body):
+    header = SMB2_HEADER.pack(b"\xfeSMB", 64, 0, 0, command, 1, 0, 0, message_id, 0, 0, 0, b"\x00" * 16)
+    packet = header + body
+    # en-tête de session NetBIOS (SMB direct sur TCP 445)
+    return struct.pack(">I", len(packet)) + packet
+
+
+def _negotiate_request():
+    body = struct.pack("<HHHHI16sQ", 36, len(SMB2_DIALECTS), 1, 0, 0, os.urandom(16), 0)
+    body += b"".join(struct.pack("<H", dialect) for dialect in SMB2_DIALECTS)
+    return _smb2_packet(SMB2_NEGOTIATE, 0, body)
+
+
+def _session_setup_request():
+    ntlm = b"NTLMSSP\x00" + struct.pack("<II", 1, NTLMSSP_FLAGS) + b"\x00" * 16 + struct.pack("<BBHxxxB", 6, 1, 7601, 15)
+    token = _der(0x60, _der(0x06, SPNEGO_OID) + _der(0xA0, _der(0x30,
+        _der(0xA0, _der(0x30, _der(0x06, NTLMSSP_OID))) + _der(0xA2, _der(0x04, ntlm)))))
+    body = struct.pack("<HBBIIHHQ", 25, 0, 1, 0, 0, SMB2_HEADER.size + 24, len(token), 0) + token
+    return _smb2_packet(SMB2_SESSION_SETUP, 1, body)
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connexion fermée par l'hôte")
+        data += chunk
+    return data
+
+
+def _recv_smb2(sock):
+    length = struct.unpack(">I", _recv_exact(sock, 4))[0] & 0xFFFFFF
+    packet = _recv_exact(sock, length)
+    if packet[:4] != b"\xfeSMB":
+        raise ValueError("réponse non SMB2")
+    return SMB2_HEADER.unpack_from(packet)[3], packet
+
+
+def _parse_challenge(blob):
+    """NTLMSSP CHALLENGE -> {'version', 'build', nb/dns names}"""
+    start = blob.find(b"NTLMSSP\x00")
+    if start < 0 or struct.unpack_from("<I", blob, start + 8)[0] != 2:
+        return None
+    msg = blob[start:]
+    info_len, _, info_offset = struct.unpack_from("<HHI", msg, 40)
+    major, minor, build = struct.unpack_from("<BBH", msg, 48)
+    result = {"version": f"{major}.{minor}.{build}", "build": build}
+
+    names = {AV_NB_COMPUTER: "nb_name", AV_NB_DOMAIN: "nb_domain",
+             AV_DNS_COMPUTER: "dns_name", AV_DNS_DOMAIN: "dns_domain"}
+    pos, end = info_offset, info_offset + info_len
+    while pos + 4 <= end:
+        av_id, av_len = struct.unpack_from("<HH", msg, pos)
+        if av_id == 0:
+            break
+        if av_id in names:
+            result[names[av_id]] = msg[pos + 4:pos + 4 + av_len].decode("utf-16-le", "replace")
+        pos += 4 + av_len
+    return result
+
+
+def smb_probe(ip, timeout=DEFAULT_TIMEOUT):
+    """
+    SMB2 negotiate + anonymous NTLMSSP negotiate on one connection (nothing authenticated)
+    the NTLM challenge carries the exact Windows build and the NetBIOS / DNS names
+    return : dict or None (port closed, no SMB2, no NTLM)
+    """
+    try:
+        with socket.create_connection((ip, SMB_PORT), timeout=timeout) as sock:
+            sock.sendall(_negotiate_request())
+            status, _ = _recv_smb2(sock)
+            if status != 0:
+                return None
+            sock.sendall(_session_setup_request())
+            status, packet = _recv_smb2(sock)
+            if status != STATUS_MORE_PROCESSING_REQUIRED:
+                return None
+            offset, length = struct.unpack_from("<HH", packet, SMB2_HEADER.size + 4)
+            return _parse_challenge(packet[offset:offset + length])
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _encode_netbios_name(name):
+    padded = name.ljust(16, b"\x00") if name == b"*" else name.ljust(15, b" ") + b"\x00"
+    encoded = bytes(c for byte in padded for c in (0x41 + (byte >> 4), 0x41 + (byte & 0x0F)))
+    return bytes([32]) + encoded + b"\x00"
+
+
+def netbios_status(ip, timeout=DEFAULT_TIMEOUT):
+    """
+    NetBIOS node status query (UDP 137), one datagram
+    return : {'nb_name', 'nb_domain', 'domain_controller'} or None
+    """
+    transaction_id = int.from_bytes(os.urandom(2), "big")
+    query = struct.pack(">HHHHHH", transaction_id, 0, 1, 0, 0, 0) + _encode_netbios_name(b"*") + struct.pack(">HH", 0x21, 1)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            sock.sendto(query, (ip, NETBIOS_NS_PORT))
+            data, _ = sock.recvfrom(2048)
+    except OSError:
+        return None
+
+    try:
+        if struct.unpack_from(">H", data)[0] != transaction_id:
+            return None
+        pos = 12
+        while data[pos]:  # nom de la question répété
+            pos += data[pos] + 1
+        pos += 1 + 10  # fin du nom + type, classe, ttl, longueur
+        count = data[pos]
+        pos += 1
+        result = {"domain_controller": False}
+        for _ in range(count):
+            name = data[pos:pos + 15].rstrip(b" \x00").decode("ascii", "replace")
+            suffix = data[pos + 15]
+            is_group = bool(struct.unpack_from(">H", data, pos + 16)[0] & 0x8000)
+            if suffix == 0x00 and not is_group:
+                result.setdefault("nb_name", name)
+            elif suffix == 0x00 and is_group:
+                result.setdefault("nb_domain", name)
+            elif suffix == NB_DOMAIN_CONTROLLERS and is_group:
+                result["domain_controller"] = True
+            pos += 18
+        return result
+    except (IndexError, struct.error):
+        return None
+
+
+def windows_version(build, nb_name=None, domain_controller=False, server_patterns=DEFAULT_SERVER_PATTERNS):
+    """build -> nom de version (clé de WINDOWS_API_MAPPING), None si build inconnu"""
+    server, client = SERVER_BUILDS.get(build), CLIENT_BUILDS.get(build)
+    if server and client:
+        # même noyau poste / serveur : contrôleur de domaine ou nom de serveur
+        looks_like_server = domain_controller or any(
+            fnmatch.fnmatch((nb_name or "").upper(), pattern.upper()) for pattern in server_patterns)
+        return server if looks_like_server else client
+    return server or client
+
+
+def identify_windows(ip, probes=None):
+    """
+    SMB and NetBIOS queries sent together: one exchange time for the whole identification
+    probes : ProbeStore of the scan, no packet at all when 445 is already known closed
+    return : {'os', 'version', 'hostname', 'domain', 'domain_controller'} or None (no SMB2 / NTLM answer)
+    'os' is None when the build is not a known Windows one (ex: Samba)
+    """
+    with _lock:
+        enabled, timeout, server_patterns = (_settings["enabled"], _settings["timeout"],
+                                             _settings["server_patterns"])
+    if not enabled or (probes is not None and probes.port_state(ip, SMB_PORT) is False):
+        return None
+
+    # smb_timeout reste un plancher : le RTO d'un sous-réseau rapide (rtt_min_timeout) ne couvre
+    # ni la requête NetBIOS ni les deux allers-retours SMB / NTLMSSP d'un hôte chargé
+    timeout = max(timeout, get_estimator(ip).timeout(timeout))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        netbios = pool.submit(netbios_status, ip, timeout)
+        smb = smb_probe(ip, timeout)
+        nb = netbios.result() or {}
+    if not smb:
+        return None
+    if probes is not None:
+        probes.record_ports(ip, [SMB_PORT], [SMB_PORT])
+
+    nb_name = smb.get("nb_name") or nb.get("nb_name")
+    return {
+        "os": windows_version(smb["build"], nb_name, nb.get("domain_controller", False), server_patterns),
+        "version": smb["version"],
+        "hostname": smb.get("dns_name") or nb_name,
+        "domain": smb.get("dns_domain") or smb.get("nb_domain") or nb.get("nb_domain"),
+        "domain_controller": nb.get("domain_controller", False)
+    }
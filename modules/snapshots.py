@@ -0,0 +1,110 @@
+import os
+import csv
+import json
+import ipaddress
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(os.path.dirname(BASE_DIR), "cache", "snapshots")
+
+
+def _snapshot_path(net_name, snapshot_dir=SNAPSHOT_DIR):
+    safe_name = "".join([c if c.isalnum() else "_" for c in net_name])
+    return os.path.join(snapshot_dir, f"{safe_name}.json")
+
+
+def parse_ports(value):
+    """'[22, 80]' (colonne CSV) ou liste -> liste d'entiers"""
+    if isinstance(value, list):
+        return value
+    try:
+        return [int(port) for port in json.loads(value)]
+    except (TypeError, ValueError):
+        return []
+
+
+def load_snapshot(net_name, snapshot_dir=SNAPSHOT_DIR):
+    """dernier état connu du site, None si jamais scanné"""
+    path = _snapshot_path(net_name, snapshot_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[!] Snapshot illisible ({path}) : {e}")
+        return None
+
+
+def save_snapshot(net_name, cidr, rows, snapshot_dir=SNAPSHOT_DIR):
+    """enregistre les lignes du rapport comme nouvel état de référence"""
+    snapshot = {
+        "network_name": net_name,
+        "cidr": cidr,
+        "scan_date": datetime.now().isoformat(),
+        "hosts": {}
+    }
+    for row in rows:
+        snapshot["hosts"][row['IP']] = {
+            "name": row['Nom (DNS)'],
+            "os": row['OS Détecté'],
+            "eol_status": row['Statut Support (EOL)'],
+            "eol_date": row['Date Fin Support'],
+            "ports": parse_ports(row['Ports Ouverts']),
+            "mac": row.get('Adresse MAC', "N/A")
+        }
+
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        path = _snapshot_path(net_name, snapshot_dir)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[ERREUR] Sauvegarde du snapshot impossible : {e}")
+
+
+def diff_snapshot(snapshot, rows):
+    """
+    compare the previous snapshot with the new report rows
+    return : [{'Type', 'IP', 'Avant', 'Après'}, ...] sorted by IP
+    """
+    previous = snapshot.get("hosts", {}) if snapshot else {}
+    current = {row['IP']: row for row in rows}
+    changes = []
+
+    for ip, row in current.items():
+        old = previous.get(ip)
+        if old is None:
+            changes.append({'Type': "Nouvel hôte", 'IP': ip, 'Avant': "", 'Après': row['OS Détecté']})
+            continue
+
+        old_ports = set(old.get("ports", []))
+        new_ports = set(parse_ports(row['Ports Ouverts']))
+        if old_ports != new_ports:
+            changes.append({
+                'Type': "Ports modifiés", 'IP': ip,
+                'Avant': str(sorted(old_ports)), 'Après': str(sorted(new_ports))
+            })
+
+        if old.get("eol_status") != row['Statut Support (EOL)']:
+            changes.append({
+                'Type': "Statut EOL modifié", 'IP': ip,
+                'Avant': old.get("eol_status", ""), 'Après': row['Statut Support (EOL)']
+            })
+
+    for ip, old in previous.items():
+        if ip not in current:
+            changes.append({'Type': "Hôte disparu", 'IP': ip, 'Avant': old.get("os", ""), 'Après': ""})
+
+    changes.sort(key=lambda change: ipaddress.IPv4Address(change['IP']))
+    return changes
+
+
+def write_change_report(changes, filepath):
+    """rapport de différences au même format que les CSV d'audit"""
+    with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['Type', 'IP', 'Avant', 'Après'], delimiter=';')
+        writer.writeheader()
+        writer.writerows(changes)
@@ -0,0 +1,142 @@
+import time
+import atexit
+import hashlib
+import threading
+import paramiko
+
+DEFAULT_CONNECT_TIMEOUT = 5
+# paquet keepalive SSH (s) : le transport survit aux pare-feux entre deux diagnostics
+DEFAULT_KEEPALIVE = 30
+# session fermée après ce délai sans utilisation (s)
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class SSHPool:
+    """
+    authenticated SSH transports kept open between diagnostics, keyed by (host, port, user)
+    a transport is reused while it is alive, closed after idle_timeout without use
+    several threads may run commands on the same transport (one channel each)
+    a session is only handed out for the password it was opened with
+    get() leases the session until release() : a leased session is never closed,
+    a broken or replaced one is only detached from the pool and closed by its last release()
+    """
+
+    def __init__(self, keepalive=DEFAULT_KEEPALIVE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.entries = {}  # key -> [client, last_used, credential digest, leases]
+        self.detached = {}  # client -> entry : retirée du pool, encore prêtée
+        self.key_locks = {}
+        self.lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def is_alive(client):
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _detach(self, key, entry):
+        """retire l'entrée du pool (appelé sous self.lock) ; return : client à fermer, None si encore prêté"""
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+        if entry[3]:
+            self.detached[entry[0]] = entry
+            return None
+        self.detached.pop(entry[0], None)
+        return entry[0]
+
+    def evict_idle(self):
+        """ferme les sessions inutilisées depuis plus de idle_timeout (hors sessions en cours d'utilisation)"""
+        now = time.monotonic()
+        with self.lock:
+            idle = [key for key, entry in self.entries.items()
+                    if not entry[3] and now - entry[1] > self.idle_timeout]
+            clients = [self.entries.pop(key)[0] for key in idle]
+        for client in clients:
+            client.close()
+
+    def get(self, host, user, password, port=22, timeout=DEFAULT_CONNECT_TIMEOUT):
+        """
+        client connected to host (reused if its transport is still active), leased until release()
+        return : (client, reused)
+        """
+        self.evict_idle()
+        key = (host, port, user)
+        digest = hashlib.sha256(f"{user}\0{password}".encode()).digest()
+        with self._key_lock(key):
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry:
+                if self.is_alive(entry[0]) and entry[2] == digest:
+                    with self.lock:
+                        entry[1] = time.monotonic()
+                        entry[3] += 1
+                    return entry[0], True
+                # transport mort ou autre mot de passe : les autres threads gardent leur session
+                with self.lock:
+                    stale = self._detach(key, entry)
+                if stale is not None:
+                    stale.close()
+
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(host, port=port, username=user, password=password, timeout=timeout)
+            client.get_transport().set_keepalive(self.keepalive)
+            with self.lock:
+                self.entries[key] = [client, time.monotonic(), digest, 1]
+            return client, False
+
+    def _return(self, key, client, drop):
+        stale = None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] is not client:
+                # session déjà retirée du pool (cassée ou remplacée) : fermée au dernier retour
+                entry = self.detached.get(client)
+                if entry is None:
+                    return
+                drop = True
+            entry[1] = time.monotonic()
+            entry[3] = max(0, entry[3] - 1)
+            if drop:
+                stale = self._detach(key, entry)
+        if stale is not None:
+            stale.close()
+
+    def release(self, host, user, client, port=22):
+        """fin d'utilisation d'un client obtenu par get() : l'inactivité se compte à partir d'ici"""
+        self._return((host, port, user), client, drop=False)
+
+    def discard(self, host, user, client, port=22):
+        """
+        fin d'utilisation d'un client cassé (transport fermé côté serveur) : retiré du pool
+        s'il y est encore, fermé quand plus aucun thread ne l'utilise
+        """
+        self._return((host, port, user), client, drop=True)
+
+    def close_all(self):
+        with self.lock:
+            clients = [entry[0] for entry in self.entries.values()] + list(self.detached)
+            self.entries.clear()
+            self.detached.clear()
+        for client in clients:
+            client.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_ssh_pool():
+    """instance partagée par les diagnostics, sessions fermées à la sortie du programme"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SSHPool()
+            atexit.register(_pool.close_all)
+        return _pool
@@ -0,0 +1,151 @@
+import os
+import time
+import random
+import select
+import socket
+import struct
+from .icmp import inet_checksum
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# nb de SYN envoyés avant de vider la file de réception
+SEND_BATCH = 64
+
+
+def open_raw_tcp_socket():
+    """raw TCP socket (root / CAP_NET_RAW), None otherwise or on Windows"""
+    if os.name == "nt":
+        # Windows refuse l'envoi de TCP sur socket raw
+        return None
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+    except OSError:
+        return None
+
+
+def is_available():
+    sock = open_raw_tcp_socket()
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def _source_ip(dst_ip, cache):
+    """adresse locale choisie par la table de routage (aucun paquet envoyé)"""
+    if dst_ip not in cache:
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            probe.connect((dst_ip, 9))
+            cache[dst_ip] = probe.getsockname()[0]
+        finally:
+            probe.close()
+    return cache[dst_ip]
+
+
+def _build_syn(src_ip, dst_ip, sport, dport, seq):
+    offset_flags = (5 << 12) | TCP_SYN
+    header = struct.pack("!HHIIHHHH", sport, dport, seq, 0, offset_flags, 64240, 0, 0)
+    pseudo = struct.pack("!4s4sBBH", socket.inet_aton(src_ip), socket.inet_aton(dst_ip), 0,
+                         socket.IPPROTO_TCP, len(header))
+    checksum = inet_checksum(pseudo + header)
+    return header[:16] + struct.pack("!H", checksum) + header[18:]
+
+
+def _drain(sock, sport, isn, sent, states, on_reply):
+    while True:
+        try:
+            packet = sock.recv(2048)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return
+
+        received_at = time.monotonic()
+        if len(packet) < 20:
+            continue
+        header_len = (packet[0] & 0x0F) * 4
+        tcp = packet[header_len:header_len + 20]
+        if len(tcp) < 14:
+            continue
+
+        reply_sport, reply_dport, _, ack = struct.unpack("!HHII", tcp[:12])
+        flags = tcp[13]
+        key = (socket.inet_ntoa(packet[12:16]), reply_sport)
+
+        # réponse à l'un de nos SYN : bon port local, bon numéro d'acquittement
+        if reply_dport != sport or key not in sent or key in states or ack != (isn + 1) & 0xFFFFFFFF:
+            continue
+
+        if flags & (TCP_SYN | TCP_ACK) == (TCP_SYN | TCP_ACK):
+            states[key] = True
+        elif flags & TCP_RST:
+            states[key] = False
+        else:
+            continue
+        if on_reply:
+            on_reply(key[0], received_at - sent[key])
+
+
+def syn_scan(targets, timeout=1.0, retries=1, throttle=None, on_reply=None):
+    """
+    half-open scan: SYNs sent in bulk from one raw socket, SYN-ACK / RST matched
+    as they arrive (the kernel answers the SYN-ACK with a RST, no connection is opened)
+    targets : [(ip, port), ...]
+    timeout : seconds after the last SYN, or a callable (RTT-adaptive wait)
+    on_reply(ip, rtt_seconds) is called for every answer
+    return : {(ip, port): True (open) / False (closed)} ; unanswered pairs are filtered,
+             None if raw sockets are not allowed (caller falls back to connect scan)
+    """
+    sock = open_raw_tcp_socket()
+    if sock is None:
+        return None
+
+    targets = [(str(ip), int(port)) for ip, port in targets]
+    sport = random.randint(40000, 60000)
+    isn = random.randint(0, 0xFFFFFFFF)
+    source_cache = {}
+    states = {}
+
+    try:
+        sock.setblocking(False)
+
+        for _ in range(retries + 1):
+            pending = [key for key in targets if key not in states]
+            if not pending:
+                break
+
+            sent = {}
+            for count, (ip, port) in enumerate(pending):
+                if throttle:
+                    delay = throttle()
+                    if delay:
+                        time.sleep(delay)
+                try:
+                    packet = _build_syn(_source_ip(ip, source_cache), ip, sport, port, isn)
+                    sent[(ip, port)] = time.monotonic()
+                    sock.sendto(packet, (ip, 0))
+                except PermissionError:
+                    # pas le droit d'émettre (pare-feu local, LSM) : repli côté appelant
+                    return None
+                except OSError:
+                    pass
+
+                if count % SEND_BATCH == SEND_BATCH - 1:
+                    _drain(sock, sport, isn, sent, states, on_reply)
+
+            last_send = time.monotonic()
+            while len(states) < len(targets):
+                wait = timeout() if callable(timeout) else timeout
+                remaining = last_send + wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if readable:
+                    _drain(sock, sport, isn, sent, states, on_reply)
+    finally:
+        sock.close()
+
+    return states
@@ -1,5 +1,13 @@
 import os
+import time
 import socket
+import threading
+
+DNS_CACHE_TTL = 3600
+
+# reverse dns cache shared by all scans: ip -> (hostname or None, timestamp)
+_dns_cache = {}
+_dns_lock = threading.Lock()
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -7,30 +15,167 @@ def clear_screen():
 def wait_for_user():
     input("\nAppuyez sur Entrée pour continuer...")
 
-def detect_os_type(ip):
+def reverse_dns(ip, ttl=DNS_CACHE_TTL):
+    """gethostbyaddr avec cache (les échecs sont aussi mis en cache)"""
+    now = time.time()
+    with _dns_lock:
+        entry = _dns_cache.get(ip)
+        if entry and now - entry[1] < ttl:
+            return entry[0]
+
+    try:
+        hostname = socket.gethostbyaddr(ip)[0]
+    except OSError:
+        hostname = None
+
+    with _dns_lock:
+        _dns_cache[ip] = (hostname, now)
+    return hostname
+
+class ProbeStore:
+    """
+    probe results gathered during one scan (ICMP ttl + TCP port states + service banners)
+    so OS detection does not probe the same host/port twice
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.icmp = {}   # ip -> ttl (None = probed, no ttl / no reply)
+        self.ports = {}  # ip -> {port: is_open}
+        self.banners = {}  # ip -> {port: banner}
+
+    def record_icmp(self, ip, ttl):
+        with self.lock:
+            self.icmp[ip] = ttl
+
+    def record_ports(self, ip, ports, open_ports):
+        with self.lock:
+            states = self.ports.setdefault(ip, {})
+            for port in ports:
+                states[port] = port in open_ports
+
+    def record_banner(self, ip, port, banner):
+        with self.lock:
+            self.banners.setdefault(ip, {})[port] = banner
+
+    def get_banners(self, ip):
+        with self.lock:
+            return dict(self.banners.get(ip, {}))
+
+    def has_icmp(self, ip):
+        with self.lock:
+            return ip in self.icmp
+
+    def get_ttl(self, ip):
+        with self.lock:
+            return self.icmp.get(ip)
+
+    def port_state(self, ip, port):
+        """True/False si déjà testé, None sinon"""
+        with self.lock:
+            return self.ports.get(ip, {}).get(port)
+
+# ports used for fingerprinting
+FINGERPRINT_PORTS = {
+    22: 'ssh',
+    135: 'win_rpc',      # Windows RPC
+    139: 'win_netbios',  # NetBIOS
+    445: 'smb',          # SMB (both)
+    3389: 'rdp',         # RDP
+}
+
+def detect_os_type(ip, probes=None, use_cache=True):
     """
     OS detection using hybrid approach:
+    0. persistent fingerprint cache (TTL, confidence, port signature)
     1. TTL-based detection
     2. Multi-port fingerprinting
+    probes : ProbeStore of the current scan, consulted before any new packet
     return : 'linux_ssh', 'windows_remote', 'unknown'
     """
-    import subprocess
-    import platform
-    import re
-    
+    from .fingerprints import (get_fingerprint_cache, CONFIDENCE_TTL_AND_PORTS,
+                               CONFIDENCE_PORTS, CONFIDENCE_TTL)
+
+    cache = get_fingerprint_cache() if use_cache else None
+    if cache is not None:
+        entry = cache.get(ip)
+        if entry and _signature_still_matches(ip, entry["signature"], probes):
+            return entry["os_type"]
+        if entry:
+            cache.invalidate(ip)
+
     # 1: try TTL-based detection
-    ttl_result = _detect_by_ttl(ip)
-    if ttl_result != 'unknown':
-        # verify with port check to avoid false positives
-        port_result = _detect_by_ports(ip)
-        if port_result != 'unknown':
-            return port_result
-        return ttl_result
-    
-    # 2: fallback to multi-port fingerprinting
-    return _detect_by_ports(ip)
+    ttl_result = _detect_by_ttl(ip, probes)
+    signature = _port_signature(ip, probes)
+    port_result = _classify_ports(signature)
+
+    if port_result != 'unknown':
+        # port check confirms (or corrects) the ttl guess
+        os_type = port_result
+        confidence = CONFIDENCE_TTL_AND_PORTS if ttl_result == port_result else CONFIDENCE_PORTS
+    else:
+        os_type = ttl_result
+        confidence = CONFIDENCE_TTL
+
+    if cache is not None and os_type != 'unknown':
+        cache.store(ip, os_type, confidence, signature)
+    return os_type
 
-def _detect_by_ttl(ip):
+def detect_exact_os(ip, probes=None):
+    """
+    exact version without fingerprinting: banners captured by the scan (free),
+    else one SMB + NetBIOS query (Windows build)
+    return : (version name or None, NetBIOS / NTLM host name or None)
+    """
+    from .banners import os_from_banners
+    from .smbprobe import identify_windows
+
+    if probes is not None:
+        exact_os = os_from_banners(probes.get_banners(ip))
+        if exact_os:
+            return exact_os, None
+    windows = identify_windows(ip, probes)
+    if windows:
+        return windows["os"], windows["hostname"]
+    return None, None
+
+def _signature_still_matches(ip, signature, probes=None):
+    """
+    compare a cached signature with what is observed now
+    ports already probed by the current scan are compared for free,
+    otherwise a single connect to one port of the signature (its witness)
+    """
+    known = {}
+    if probes is not None:
+        for port in FINGERPRINT_PORTS:
+            state = probes.port_state(ip, port)
+            if state is not None:
+                known[port] = state
+    if known:
+        return all(state == (port in signature) for port, state in known.items())
+
+    if not signature:
+        # détection par TTL seul : rien à vérifier, la durée de vie courte suffit
+        return True
+    return _probe_port(ip, signature[0], probes)
+
+def _probe_port(ip, port, probes=None):
+    from .rtt import get_estimator, CONNECT_RTT_CODES
+    estimator = get_estimator(ip)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(estimator.timeout(0.5))
+    started = time.monotonic()
+    result = sock.connect_ex((ip, port))
+    sock.close()
+    is_open = result == 0
+    if result in CONNECT_RTT_CODES:
+        estimator.add_sample(time.monotonic() - started)
+    if probes is not None:
+        probes.record_ports(ip, [port], [port] if is_open else [])
+    return is_open
+
+def _detect_by_ttl(ip, probes=None):
     """
     detect OS by TTL value in ping response
     windows uses TTL=128, Linux uses TTL=64
@@ -38,19 +183,37 @@ def _detect_by_ttl(ip):
     import subprocess
     import platform
     import re
+    from .icmp import sweep
+    from .rtt import get_estimator
     
     try:
-        if platform.system().lower() == 'windows':
-            result = subprocess.run(['ping', '-n', '1', '-w', '1000', ip], 
-                                   capture_output=True, text=True, timeout=2)
-            match = re.search(r'TTL=(\d+)', result.stdout, re.IGNORECASE)
+        if probes is not None and probes.has_icmp(ip):
+            # already swept during this scan, no new ping
+            ttl = probes.get_ttl(ip)
         else:
-            result = subprocess.run(['ping', '-c', '1', '-W', '1', ip],
-                                   capture_output=True, text=True, timeout=2)
-            match = re.search(r'ttl=(\d+)', result.stdout, re.IGNORECASE)
+            ttl = None
+            # native ICMP socket first, ping subprocess only as fallback
+            estimator = get_estimator(ip)
+            replies = sweep([ip], timeout=estimator.timeout(1))
+            if replies is not None:
+                if ip in replies:
+                    estimator.add_sample(replies[ip].rtt / 1000)
+                    ttl = replies[ip].ttl
+            else:
+                if platform.system().lower() == 'windows':
+                    result = subprocess.run(['ping', '-n', '1', '-w', '1000', ip], 
+                                           capture_output=True, text=True, timeout=2)
+                    match = re.search(r'TTL=(\d+)', result.stdout, re.IGNORECASE)
+                else:
+                    result = subprocess.run(['ping', '-c', '1', '-W', '1', ip],
+                                           capture_output=True, text=True, timeout=2)
+                    match = re.search(r'ttl=(\d+)', result.stdout, re.IGNORECASE)
+                if match:
+                    ttl = int(match.group(1))
+            if probes is not None:
+                probes.record_icmp(ip, ttl)
         
-        if match:
-            ttl = int(match.group(1))
+        if ttl is not None:
             if ttl <= 64:
                 return "linux_ssh"
             elif ttl >= 100:  # margin for network hops
@@ -60,27 +223,29 @@ def _detect_by_ttl(ip):
     
     return "unknown"
 
-def _detect_by_ports(ip):
+def _detect_by_ports(ip, probes=None):
     """
     multi-port fingerprinting for more accurate OS detection
     checks multiple ports to create a signature
     """
-    ports_to_check = {
-        22: 'ssh',
-        135: 'win_rpc',      # Windows RPC
-        139: 'win_netbios',  # NetBIOS
-        445: 'smb',          # SMB (both)
-        3389: 'rdp',         # RDP
-    }
-    
-    open_ports = {}
-    for port, service in ports_to_check.items():
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.5)
-        result = sock.connect_ex((ip, port))
-        sock.close()
-        if result == 0:
-            open_ports[service] = True
+    return _classify_ports(_port_signature(ip, probes))
+
+def _port_signature(ip, probes=None):
+    """
+    open fingerprint ports of `ip`
+    only ports not already seen in `probes` are connected to
+    """
+    open_ports = []
+    for port in FINGERPRINT_PORTS:
+        is_open = probes.port_state(ip, port) if probes is not None else None
+        if is_open is None:
+            is_open = _probe_port(ip, port, probes)
+        if is_open:
+            open_ports.append(port)
+    return open_ports
+
+def _classify_ports(open_ports):
+    open_ports = {FINGERPRINT_PORTS[port]: True for port in open_ports}
     
     if open_ports.get('win_rpc'):
         return "windows_remote"
@@ -0,0 +1,109 @@
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from modules import agent
+from modules.agent import AgentHandler, AgentError, AgentConfigError, remote_scan, _encode_host, _decode_host
+
+TOKEN = "secret-de-test"
+PORTS = [22, 80, 443, 445]
+
+
+def start_agent(profiles, hosts, fail_after=None):
+    """agent local sur un port éphémère ; le scan émet `hosts` puis échoue si fail_after est donné"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AgentHandler)
+    server.daemon_threads = True
+    server.token = TOKEN
+    server.config = {}
+    server.profiles = {p["network_name"]: p for p in profiles}
+    server.hosts = hosts
+    server.fail_after = fail_after
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_scan(job, config, emit):
+    server = fake_scan.servers[job["network_name"]]
+    for index, host in enumerate(server.hosts):
+        if server.fail_after is not None and index == server.fail_after:
+            raise RuntimeError("sonde en échec")
+        emit(_encode_host(*host[:2], job["ports"], *host[2:]))
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    fake_scan.servers = {}
+    started = []
+    monkeypatch.setattr(agent, "run_local_scan", fake_scan)
+
+    def start(profile, hosts, fail_after=None):
+        server = start_agent([profile], hosts, fail_after)
+        fake_scan.servers[profile["network_name"]] = server
+        started.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+LENS = {"network_name": "Lens", "cidr": "192.168.20.0/24"}
+ARRAS = {"network_name": "Arras", "cidr": "192.168.40.0/24"}
+HOST = ("192.168.20.10", [22, 445], 128, "srv-lens", "windows_remote", "Windows Server 2019", "aa:bb:cc:dd:ee:01")
+
+
+def test_host_encoding_roundtrip():
+    item = _encode_host(*HOST[:2], PORTS, *HOST[2:])
+    assert _decode_host(item, PORTS) == HOST
+
+
+def test_several_agents_in_parallel(agents):
+    urls = {"Lens": agents(LENS, [HOST]),
+            "Arras": agents(ARRAS, [("192.168.40.%d" % i, [80], 64, None, "linux_ssh", None, "N/A") for i in range(1, 6)])}
+    results = {}
+
+    def coordinator(profile):
+        received = []
+        count = remote_scan(urls[profile["network_name"]], profile, PORTS, lambda *h: received.append(h), TOKEN)
+        results[profile["network_name"]] = (count, received)
+
+    threads = [threading.Thread(target=coordinator, args=(p,)) for p in (LENS, ARRAS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results["Lens"] == (1, [HOST])
+    assert results["Arras"][0] == 5
+    assert [h[0] for h in results["Arras"][1]] == ["192.168.40.%d" % i for i in range(1, 6)]
+
+
+def test_bad_token_is_a_config_error(agents):
+    url = agents(LENS, [HOST])
+    with pytest.raises(AgentConfigError):
+        remote_scan(url, LENS, PORTS, lambda *h: None, "mauvais-jeton")
+
+
+def test_unmanaged_profile_is_a_config_error(agents):
+    url = agents(LENS, [HOST])
+    with pytest.raises(AgentConfigError):
+        remote_scan(url, ARRAS, PORTS, lambda *h: None, TOKEN)
+    # CIDR différent de celui déclaré sur l'agent
+    with pytest.raises(AgentConfigError):
+        remote_scan(url, dict(LENS, cidr="192.168.21.0/24"), PORTS, lambda *h: None, TOKEN)
+
+
+def test_agent_failure_keeps_received_count(agents):
+    url = agents(LENS, [HOST, ("192.168.20.11", [22], 64, None, "linux_ssh", None, "N/A")], fail_after=1)
+    received = []
+    with pytest.raises(AgentError) as error:
+        remote_scan(url, LENS, PORTS, lambda *h: received.append(h), TOKEN)
+    assert not isinstance(error.value, AgentConfigError)
+    assert error.value.received == 1
+    assert received == [HOST]
+
+
+def test_unreachable_agent():
+    with pytest.raises(AgentError) as error:
+        remote_scan("http://127.0.0.1:9", LENS, PORTS, lambda *h: None, TOKEN)
+    assert error.value.received == 0
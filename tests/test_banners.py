@@ -0,0 +1,66 @@
+import asyncio
+from modules.banners import os_from_banners, read_banner, BANNER_API_MAPPING
+
+
+def test_ssh_banners():
+    assert os_from_banners({22: "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.11"}) == "Ubuntu 20.04 LTS"
+    assert os_from_banners({22: "SSH-2.0-OpenSSH_9.2p1 Debian-2+deb12u3"}) == "Debian 12"
+    assert os_from_banners({22: "SSH-2.0-OpenSSH_7.4"}) == "CentOS 7"
+    # OpenSSH compilé à la main : aucune distribution
+    assert os_from_banners({22: "SSH-2.0-OpenSSH_9.8"}) is None
+
+
+def test_ssh_before_http():
+    banners = {80: "Apache/2.4.29 (Ubuntu)", 22: "SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.10"}
+    assert os_from_banners(banners) == "Ubuntu 22.04 LTS"
+
+
+def test_http_server_headers():
+    assert os_from_banners({443: "Microsoft-IIS/8.5"}) == "Windows Server 2012 R2"
+    assert os_from_banners({80: "nginx/1.14.0 (Ubuntu)"}) == "Ubuntu 18.04 LTS"
+    assert os_from_banners({80: "nginx"}) is None
+    assert os_from_banners({}) is None
+
+
+def test_linux_results_have_eol_mapping():
+    for banner in ("SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13.5", "SSH-2.0-OpenSSH_8.4p1 Debian-5+deb11u3"):
+        assert os_from_banners({22: banner}) in BANNER_API_MAPPING
+
+
+def run_server(handler, scenario):
+    async def main():
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                return await scenario(reader, writer)
+            finally:
+                writer.close()
+    return asyncio.run(main())
+
+
+def test_read_banner_greeting_and_http():
+    async def ssh(reader, writer):
+        writer.write(b"SSH-2.0-OpenSSH_9.2p1 Debian-2+deb12u3\r\n")
+        await writer.drain()
+
+    async def http(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.0 200 OK\r\nServer: Apache/2.4.41 (Ubuntu)\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    greeting = run_server(ssh, lambda r, w: read_banner("127.0.0.1", 22, r, w, timeout=2))
+    server = run_server(http, lambda r, w: read_banner("127.0.0.1", 80, r, w, timeout=2))
+    assert greeting == "SSH-2.0-OpenSSH_9.2p1 Debian-2+deb12u3"
+    assert server == "Apache/2.4.41 (Ubuntu)"
+
+
+def test_read_banner_silent_service():
+    async def silent(reader, writer):
+        await asyncio.sleep(1)
+
+    assert run_server(silent, lambda r, w: read_banner("127.0.0.1", 21, r, w, timeout=0.1)) is None
+    # port sans bannière attendue : aucune lecture
+    assert run_server(silent, lambda r, w: read_banner("127.0.0.1", 3306, r, w, timeout=0.1)) is None
@@ -0,0 +1,50 @@
+import os
+import socket
+import struct
+import ipaddress
+from modules.discovery import read_dhcp_leases, read_proc_arp, discover_neighbors, _parse_neighbor, NDA_DST, NDA_LLADDR
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+ISC_LEASES = os.path.join(FIXTURES, "dhcpd.leases")
+DNSMASQ_LEASES = os.path.join(FIXTURES, "dnsmasq.leases")
+PROC_ARP = os.path.join(FIXTURES, "proc_arp")
+
+
+def test_isc_leases_active_only():
+    # bail libéré et bail sans adresse matérielle ignorés, MAC en minuscules
+    assert read_dhcp_leases(ISC_LEASES) == {"192.168.10.50": "00:1a:2b:3c:4d:5e"}
+
+
+def test_dnsmasq_leases():
+    assert read_dhcp_leases(DNSMASQ_LEASES) == {"192.168.20.10": "aa:bb:cc:dd:ee:01",
+                                                "192.168.20.11": "aa:bb:cc:dd:ee:02"}
+
+
+def test_missing_lease_file():
+    assert read_dhcp_leases(os.path.join(FIXTURES, "absent.leases")) == {}
+
+
+def test_proc_arp_resolved_entries():
+    assert read_proc_arp(PROC_ARP) == {"192.168.10.1": "52:54:00:aa:bb:01",
+                                       "192.168.10.50": "52:54:00:aa:bb:50",
+                                       "10.0.0.1": "52:54:00:aa:bb:02"}
+
+
+def test_discover_neighbors_filters_network():
+    found = discover_neighbors(ipaddress.IPv4Network("192.168.10.0/24"), PROC_ARP, [ISC_LEASES, DNSMASQ_LEASES])
+    # table du noyau prioritaire sur les baux pour une même adresse
+    assert found == {"192.168.10.1": "52:54:00:aa:bb:01", "192.168.10.50": "52:54:00:aa:bb:50"}
+
+
+def _rtattr(kind, value):
+    length = 4 + len(value)
+    return struct.pack("=HH", length, kind) + value + b"\x00" * ((4 - length % 4) % 4)
+
+
+def test_netlink_neighbor_entry():
+    ndmsg = struct.pack("=BxxxiHBB", socket.AF_INET, 2, 0x02, 0, 1)
+    payload = ndmsg + _rtattr(NDA_DST, socket.inet_aton("192.168.10.7")) + _rtattr(NDA_LLADDR, bytes.fromhex("525400aabb07"))
+    assert _parse_neighbor(payload) == ("192.168.10.7", "52:54:00:aa:bb:07")
+    # entrée incomplète (NUD_INCOMPLETE) : ignorée
+    failed = struct.pack("=BxxxiHBB", socket.AF_INET, 2, 0x01, 0, 1) + payload[12:]
+    assert _parse_neighbor(failed) is None
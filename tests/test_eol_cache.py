@@ -0,0 +1,93 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from modules.eol_cache import EolCache, extract_releases
+
+RELEASES = [{"name": "20.04", "eolFrom": "2025-05-31"}, {"name": "24.04", "eolFrom": "2029-05-31"}]
+ETAG = '"v1"'
+
+
+class FakeApi(BaseHTTPRequestHandler):
+    """endoflife.date local : ETag, 304 si If-None-Match correspond, 404 pour un produit inconnu"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path != "/products/ubuntu":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({"result": {"releases": RELEASES}}).encode()
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApi)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_cache(api, tmp_path, ttl=3600):
+    return EolCache(base_url=f"http://127.0.0.1:{api.server_port}", ttl=ttl,
+                    cache_file=str(tmp_path / "eol_cache.json"))
+
+
+def test_extract_releases_formats():
+    assert extract_releases(RELEASES) == RELEASES
+    assert extract_releases({"releases": RELEASES}) == RELEASES
+    assert extract_releases({"result": {"releases": RELEASES}}) == RELEASES
+    assert extract_releases("inattendu") == []
+
+
+def test_fresh_entry_served_without_network(api, tmp_path):
+    cache = make_cache(api, tmp_path)
+    assert cache.get_releases("ubuntu") == RELEASES
+    assert cache.get_releases("ubuntu") == RELEASES
+    assert len(api.requests) == 1
+
+
+def test_stale_entry_revalidated_with_etag(api, tmp_path):
+    cache = make_cache(api, tmp_path, ttl=0)
+    assert cache.get_releases("ubuntu") == RELEASES
+    assert cache.get_releases("ubuntu") == RELEASES
+    assert api.requests == [("/products/ubuntu", None), ("/products/ubuntu", ETAG)]
+
+
+def test_disk_cache_reused_by_new_instance(api, tmp_path):
+    make_cache(api, tmp_path).get_releases("ubuntu")
+    api.requests.clear()
+    assert make_cache(api, tmp_path).get_releases("ubuntu") == RELEASES
+    assert api.requests == []
+
+
+def test_last_known_releases_when_api_unreachable(api, tmp_path):
+    cache = make_cache(api, tmp_path, ttl=0)
+    cache.get_releases("ubuntu")
+    cache.base_url = "http://127.0.0.1:9"
+    assert cache.get_releases("ubuntu") == RELEASES
+    assert cache.last_error("ubuntu").startswith("connexion ou parsing")
+
+
+def test_unknown_product_error_kept(api, tmp_path):
+    cache = make_cache(api, tmp_path)
+    assert cache.get_releases("inconnu") is None
+    assert cache.last_error("inconnu") == "Erreur 404"
+    # échec récent : pas de nouvel appel avant FAILURE_BACKOFF
+    assert cache.get_releases("inconnu") is None
+    assert len(api.requests) == 1
@@ -0,0 +1,61 @@
+import pytest
+from modules.metrics import MetricStore, typed_samples, metric_label, record_metrics, METRICS_KEY
+from modules import metrics
+
+T0 = 1_800_000_000 - 1_800_000_000 % 3600  # début d'heure
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricStore(str(tmp_path / "metrics.db"), raw_retention=4000, minute_retention=7200, hour_retention=86400)
+    yield store
+    store.close()
+
+
+def test_typed_samples():
+    assert typed_samples(cpu_load="0.42", uptime_s="3600", ram_pct=None, disk_pct="n/a", inconnue=1, port_22=True) == \
+        {"cpu_load": 0.42, "uptime_s": 3600, "port_22": 1}
+    assert metric_label("ram_pct") == "RAM utilisée (%)"
+    assert metric_label("port_443") == "Port 443 ouvert"
+
+
+def test_rollups_match_raw_samples(store):
+    for offset, value in ((0, 10), (20, 30), (70, 50), (3600, 5)):
+        store.record("srv", {"cpu_pct": value}, T0 + offset)
+    assert store.query("srv", "cpu_pct", T0, T0 + 3600, "raw") == [
+        (T0, 10, 10, 10, 1), (T0 + 20, 30, 30, 30, 1), (T0 + 70, 50, 50, 50, 1), (T0 + 3600, 5, 5, 5, 1)]
+    assert store.query("srv", "cpu_pct", T0, T0 + 3600, "1m") == [
+        (T0, 10, 30, 20, 2), (T0 + 60, 50, 50, 50, 1), (T0 + 3600, 5, 5, 5, 1)]
+    assert store.query("srv", "cpu_pct", T0, T0 + 3600, "1h") == [(T0, 10, 50, 30, 3), (T0 + 3600, 5, 5, 5, 1)]
+
+
+def test_duplicate_second_counted_once(store):
+    store.record("srv", {"cpu_pct": 10}, T0 + 0.2)
+    store.record("srv", {"cpu_pct": 90}, T0 + 0.7)
+    assert store.query("srv", "cpu_pct", T0, T0 + 59, "raw") == [(T0, 10, 10, 10, 1)]
+    assert store.query("srv", "cpu_pct", T0, T0 + 59, "1m") == [(T0, 10, 10, 10, 1)]
+    assert store.query("srv", "cpu_pct", T0, T0 + 59, "1h") == [(T0, 10, 10, 10, 1)]
+
+
+def test_retention_per_level(store):
+    store.record("srv", {"cpu_pct": 1}, T0)
+    store.record("srv", {"cpu_pct": 2}, T0 + 7300)
+    # brut (4000 s) et minute (7200 s) élagués, l'heure garde les deux passages
+    assert [row[0] for row in store.query("srv", "cpu_pct", T0, T0 + 7300, "raw")] == [T0 + 7300]
+    assert [row[0] for row in store.query("srv", "cpu_pct", T0, T0 + 7300, "1m")] == [T0 + 7260]
+    assert [row[0] for row in store.query("srv", "cpu_pct", T0, T0 + 7300, "1h")] == [T0, T0 + 7200]
+
+
+def test_series_and_unknown(store):
+    store.record("srv-b", {"ram_pct": 40}, T0)
+    store.record("srv-a", {"cpu_pct": 1, "disk_pct": 2}, T0)
+    assert store.series() == [("srv-a", "cpu_pct"), ("srv-a", "disk_pct"), ("srv-b", "ram_pct")]
+    assert store.series("srv-b") == [("srv-b", "ram_pct")]
+    assert store.query("srv-c", "cpu_pct", T0) == []
+
+
+def test_record_metrics_uses_report_samples(store, monkeypatch):
+    monkeypatch.setattr(metrics, "_store", store)
+    record_metrics("srv", {"OS": "Linux", METRICS_KEY: {"ram_pct": 25.0}}, T0)
+    record_metrics("srv", {"ERREUR": "injoignable"}, T0 + 1)
+    assert store.query("srv", "ram_pct", T0, T0 + 1, "raw") == [(T0, 25.0, 25.0, 25.0, 1)]
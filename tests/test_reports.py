@@ -0,0 +1,37 @@
+import csv
+import random
+from modules.reports import external_sort_csv, iter_report_rows, AUDIT_FIELDNAMES
+
+
+def write_report(path, ips):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=AUDIT_FIELDNAMES, delimiter=';')
+        writer.writeheader()
+        for ip in ips:
+            writer.writerow({'IP': ip, 'Nom (DNS)': f"hôte-{ip}", 'OS Détecté': "Linux", 'Statut Support (EOL)': "Supporté",
+                             'Date Fin Support': "N/A", 'Ports Ouverts': "[22, 80]", 'Adresse MAC': "N/A"})
+
+
+def test_external_sort_orders_by_numeric_ip(tmp_path):
+    ips = [f"10.0.{third}.{fourth}" for third in range(3) for fourth in range(1, 120)]
+    random.Random(4).shuffle(ips)
+    source, destination = tmp_path / "brut.csv", tmp_path / "trie.csv"
+    write_report(source, ips)
+
+    # plusieurs fichiers intermédiaires : 357 lignes par paquets de 50
+    assert external_sort_csv(str(source), str(destination), chunk_rows=50) == len(ips)
+
+    rows = list(iter_report_rows(str(destination)))
+    # ordre numérique (10.0.0.9 avant 10.0.0.10), colonnes intactes
+    assert [row['IP'] for row in rows] == sorted(ips, key=lambda ip: tuple(map(int, ip.split("."))))
+    assert rows[0]['Nom (DNS)'] == f"hôte-{rows[0]['IP']}"
+    assert rows[0]['Ports Ouverts'] == "[22, 80]"
+    # fichiers intermédiaires supprimés
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["brut.csv", "trie.csv"]
+
+
+def test_external_sort_empty_report(tmp_path):
+    source, destination = tmp_path / "brut.csv", tmp_path / "trie.csv"
+    write_report(source, [])
+    assert external_sort_csv(str(source), str(destination)) == 0
+    assert list(iter_report_rows(str(destination))) == []
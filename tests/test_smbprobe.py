@@ -0,0 +1,124 @@
+import socket
+import struct
+import threading
+import pytest
+from modules import smbprobe
+from modules.smbprobe import (_parse_challenge, windows_version, smb_probe, netbios_status, SMB2_HEADER,
+                              STATUS_MORE_PROCESSING_REQUIRED, AV_NB_COMPUTER, AV_NB_DOMAIN, AV_DNS_COMPUTER,
+                              AV_DNS_DOMAIN)
+
+
+def ntlm_challenge(build, names):
+    """message NTLMSSP CHALLENGE (type 2) : version 10.0.build, AV pairs des noms"""
+    info = b"".join(struct.pack("<HH", av_id, len(value.encode("utf-16-le"))) + value.encode("utf-16-le")
+                    for av_id, value in names.items()) + struct.pack("<HH", 0, 0)
+    header = (b"NTLMSSP\x00" + struct.pack("<I", 2) + struct.pack("<HHI", 0, 0, 56) + struct.pack("<I", 0xE2898215)
+              + b"\x11" * 8 + b"\x00" * 8 + struct.pack("<HHI", len(info), len(info), 56)
+              + struct.pack("<BBH3xB", 10, 0, build, 15))
+    return header + info
+
+
+NAMES = {AV_NB_DOMAIN: "NTL", AV_NB_COMPUTER: "SRV-AD", AV_DNS_DOMAIN: "ntl.local", AV_DNS_COMPUTER: "srv-ad.ntl.local"}
+
+
+def test_parse_challenge():
+    # blob SPNEGO : le message NTLMSSP n'est pas au début
+    blob = b"\xa1\x81\xc0\x30\x81\xbd" + ntlm_challenge(17763, NAMES)
+    assert _parse_challenge(blob) == {"version": "10.0.17763", "build": 17763, "nb_name": "SRV-AD", "nb_domain": "NTL",
+                                      "dns_name": "srv-ad.ntl.local", "dns_domain": "ntl.local"}
+
+
+def test_parse_challenge_rejects_other_messages():
+    assert _parse_challenge(b"pas de ntlm ici") is None
+    negotiate = b"NTLMSSP\x00" + struct.pack("<I", 1) + b"\x00" * 48
+    assert _parse_challenge(negotiate) is None
+
+
+def test_windows_version_shared_builds():
+    assert windows_version(17763, "SRV-WMS") == "Windows Server 2019"
+    assert windows_version(17763, "DESKTOP-00FLKIE") == "Windows 10 1809"
+    assert windows_version(17763, "PC-ACCUEIL", domain_controller=True) == "Windows Server 2019"
+    assert windows_version(19045) == "Windows 10 22H2"
+    assert windows_version(20348) == "Windows Server 2022"
+    # Samba et builds inconnus
+    assert windows_version(12345) is None
+
+
+def smb2_reply(status, body):
+    packet = SMB2_HEADER.pack(b"\xfeSMB", 64, 0, status, 0, 1, 1, 0, 0, 0, 0, 0, b"\x00" * 16) + body
+    return struct.pack(">I", len(packet)) + packet
+
+
+def read_smb2(conn):
+    length = struct.unpack(">I", conn.recv(4, socket.MSG_WAITALL))[0]
+    return conn.recv(length, socket.MSG_WAITALL)
+
+
+@pytest.fixture
+def smb_server(monkeypatch):
+    """serveur SMB2 local : negotiate accepté, CHALLENGE NTLMSSP en réponse au session setup"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    monkeypatch.setattr(smbprobe, "SMB_PORT", listener.getsockname()[1])
+
+    def serve():
+        conn, _ = listener.accept()
+        with conn:
+            read_smb2(conn)
+            conn.sendall(smb2_reply(0, struct.pack("<HH", 65, 0) + b"\x00" * 61))
+            read_smb2(conn)
+            token = ntlm_challenge(17763, NAMES)
+            body = struct.pack("<HHHH", 9, 0, SMB2_HEADER.size + 8, len(token)) + token
+            conn.sendall(smb2_reply(STATUS_MORE_PROCESSING_REQUIRED, body))
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield
+    thread.join(2)
+    listener.close()
+
+
+def test_smb_probe_local_server(smb_server):
+    result = smb_probe("127.0.0.1", timeout=2)
+    assert result["build"] == 17763
+    assert result["nb_name"] == "SRV-AD"
+    assert result["dns_domain"] == "ntl.local"
+
+
+def test_smb_probe_port_closed(monkeypatch):
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    monkeypatch.setattr(smbprobe, "SMB_PORT", closed.getsockname()[1])
+    closed.close()
+    assert smb_probe("127.0.0.1", timeout=1) is None
+
+
+def netbios_answer(transaction_id, names):
+    """réponse NBSTAT : nom '*' répété, puis (nom, suffixe, drapeaux) de chaque entrée"""
+    question = bytes([32]) + b"CK" + b"AA" * 15 + b"\x00"
+    entries = b"".join(name.ljust(15, b" ") + bytes([suffix]) + struct.pack(">H", 0x8000 if group else 0)
+                       for name, suffix, group in names)
+    rdata = bytes([len(names)]) + entries
+    return (struct.pack(">HHHHHH", transaction_id, 0x8400, 0, 1, 0, 0) + question
+            + struct.pack(">HHIH", 0x21, 1, 0, len(rdata)) + rdata)
+
+
+def test_netbios_status_local_responder(monkeypatch):
+    responder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    responder.bind(("127.0.0.1", 0))
+    monkeypatch.setattr(smbprobe, "NETBIOS_NS_PORT", responder.getsockname()[1])
+
+    def answer():
+        query, address = responder.recvfrom(2048)
+        names = [(b"SRV-AD", 0x00, False), (b"NTL", 0x00, True), (b"NTL", 0x1C, True)]
+        responder.sendto(netbios_answer(struct.unpack_from(">H", query)[0], names), address)
+
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+    try:
+        assert netbios_status("127.0.0.1", timeout=2) == {"domain_controller": True, "nb_name": "SRV-AD",
+                                                          "nb_domain": "NTL"}
+    finally:
+        thread.join(2)
+        responder.close()
@@ -0,0 +1,160 @@
+import socket
+import functools
+import threading
+import paramiko
+import pytest
+from modules import diagnostic
+from modules.sshpool import SSHPool
+from modules.diagnostic import get_remote_linux_health
+
+USER, PASSWORD = "audit", "mot-de-passe"
+HEALTH_OUTPUT = (b"os=Debian GNU/Linux 12 (bookworm)\nuptime=up 3 days\nuptime_s=273600.12\n"
+                 b"loadavg=0.42 0.30 0.25 1/180 999\nram_used_mb=512\nram_total_mb=2048\ndisk_pct=37%\n")
+HOST_KEY = paramiko.RSAKey.generate(1024)
+
+
+class FakeSshServer(paramiko.ServerInterface):
+    """serveur SSH local : mot de passe unique, toute commande renvoie HEALTH_OUTPUT (ou ne répond pas)"""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        self.owner.commands += 1
+        if self.owner.hang:
+            return True
+
+        def reply():
+            channel.sendall(HEALTH_OUTPUT)
+            channel.send_exit_status(0)
+            channel.close()
+        # après l'acquittement de la requête exec, sinon le client voit le canal déjà fermé
+        threading.Timer(0.05, reply).start()
+        return True
+
+
+class SshHost:
+    def __init__(self):
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.transports = []
+        self.commands = 0
+        self.hang = False
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(HOST_KEY)
+            transport.start_server(server=FakeSshServer(self))
+            self.transports.append(transport)
+
+    def drop_all(self):
+        for transport in self.transports:
+            transport.close()
+
+    def close(self):
+        self.listener.close()
+        self.drop_all()
+
+
+@pytest.fixture
+def ssh_host():
+    host = SshHost()
+    yield host
+    host.close()
+
+
+@pytest.fixture
+def pool(ssh_host, monkeypatch):
+    pool = SSHPool()
+    # le diagnostic ouvre ses sessions sur le port 22 : redirigé vers le serveur local
+    monkeypatch.setattr(pool, "get", functools.partial(pool.get, port=ssh_host.port))
+    monkeypatch.setattr(pool, "release", lambda host, user, client: SSHPool.release(pool, host, user, client, ssh_host.port))
+    monkeypatch.setattr(pool, "discard", lambda host, user, client: SSHPool.discard(pool, host, user, client, ssh_host.port))
+    yield pool
+    pool.close_all()
+
+
+def entry(pool, ssh_host):
+    return pool.entries.get(("127.0.0.1", ssh_host.port, USER))
+
+
+def test_session_reused_between_diagnostics(ssh_host, pool):
+    first = get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)
+    second = get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)
+    assert first == second
+    assert first["OS"] == "Debian GNU/Linux 12 (bookworm)"
+    assert first["RAM"] == "25.00% utilisée"
+    assert first["Métriques"] == {"cpu_load": 0.42, "ram_pct": 25.0, "disk_pct": 37.0, "uptime_s": 273600}
+    assert len(ssh_host.transports) == 1 and ssh_host.commands == 2
+    assert entry(pool, ssh_host)[3] == 0
+
+
+def test_wrong_password_not_reused(ssh_host, pool):
+    get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)
+    result = get_remote_linux_health("127.0.0.1", USER, "autre", pool)
+    assert "ERREUR" in result
+    assert ssh_host.commands == 1
+
+
+def test_command_timeout_keeps_shared_session(ssh_host, pool, monkeypatch):
+    monkeypatch.setattr(diagnostic, "collect_linux_health",
+                        functools.partial(diagnostic.collect_linux_health, timeout=0.3))
+    get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)
+    # un autre thread utilise la même session pendant l'échec
+    other, reused = pool.get("127.0.0.1", USER, PASSWORD)
+    assert reused
+
+    ssh_host.hang = True
+    assert "ERREUR" in get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)
+    assert SSHPool.is_alive(other)
+    assert entry(pool, ssh_host)[0] is other and entry(pool, ssh_host)[3] == 1
+
+    ssh_host.hang = False
+    pool.release("127.0.0.1", USER, other)
+    assert get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)["OS"].startswith("Debian")
+    assert len(ssh_host.transports) == 1
+
+
+def test_dead_session_replaced_but_lease_honoured(ssh_host, pool):
+    leased, _ = pool.get("127.0.0.1", USER, PASSWORD)
+    closed = []
+    leased.close = lambda: closed.append(True)
+    ssh_host.drop_all()
+    leased.get_transport().join(2)
+
+    # transport mort : nouvelle session pour le diagnostic, l'ancienne attend son dernier release()
+    assert get_remote_linux_health("127.0.0.1", USER, PASSWORD, pool)["OS"].startswith("Debian")
+    assert len(ssh_host.transports) == 2
+    assert entry(pool, ssh_host)[0] is not leased and not closed
+
+    pool.release("127.0.0.1", USER, leased)
+    assert closed and not pool.detached
+
+
+def test_leased_session_never_evicted_as_idle(ssh_host, pool):
+    pool.idle_timeout = 0
+    client, _ = pool.get("127.0.0.1", USER, PASSWORD)
+    pool.evict_idle()
+    assert len(pool) == 1 and SSHPool.is_alive(client)
+    pool.release("127.0.0.1", USER, client)
+    pool.evict_idle()
+    assert len(pool) == 0
@@ -0,0 +1,70 @@
+import socket
+import struct
+import pytest
+from modules import synscan
+from modules.icmp import inet_checksum
+from modules.synscan import _build_syn, _drain, TCP_SYN, TCP_RST, TCP_ACK
+
+SPORT = 45000
+ISN = 0xFFFFFFFF
+
+
+def reply(src_ip, src_port, dst_port, ack, flags):
+    """paquet IPv4 + TCP tel que le renvoie une socket raw"""
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 40, 0, 0, 64, socket.IPPROTO_TCP, 0,
+                     socket.inet_aton(src_ip), socket.inet_aton("10.0.0.1"))
+    tcp = struct.pack("!HHIIBBHHH", src_port, dst_port, 1234, ack, 5 << 4, flags, 0, 0, 0)
+    return ip + tcp
+
+
+class FakeRawSocket:
+    def __init__(self, packets):
+        self.packets = list(packets)
+
+    def recv(self, size):
+        if not self.packets:
+            raise BlockingIOError
+        return self.packets.pop(0)
+
+
+def test_syn_checksum_and_flags():
+    packet = _build_syn("10.0.0.1", "10.0.0.2", SPORT, 443, 42)
+    pseudo = struct.pack("!4s4sBBH", socket.inet_aton("10.0.0.1"), socket.inet_aton("10.0.0.2"), 0,
+                         socket.IPPROTO_TCP, len(packet))
+    assert inet_checksum(pseudo + packet) == 0
+    sport, dport, seq, _, offset_flags = struct.unpack("!HHIIH", packet[:14])
+    assert (sport, dport, seq, offset_flags & 0x3F) == (SPORT, 443, 42, TCP_SYN)
+
+
+def test_drain_matches_replies():
+    sent = {("10.0.0.2", 22): 0.0, ("10.0.0.2", 23): 0.0, ("10.0.0.3", 80): 0.0}
+    ack = (ISN + 1) & 0xFFFFFFFF  # repli à 0 : numéro de séquence en fin d'espace
+    packets = [
+        reply("10.0.0.2", 22, SPORT, ack, TCP_SYN | TCP_ACK),
+        reply("10.0.0.2", 23, SPORT, ack, TCP_RST | TCP_ACK),
+        # autre port local, mauvais acquittement, hôte non sondé : ignorés
+        reply("10.0.0.3", 80, SPORT + 1, ack, TCP_SYN | TCP_ACK),
+        reply("10.0.0.3", 80, SPORT, ack + 5, TCP_SYN | TCP_ACK),
+        reply("10.0.0.9", 80, SPORT, ack, TCP_SYN | TCP_ACK),
+        b"\x45\x00",
+    ]
+    states, replies = {}, []
+    _drain(FakeRawSocket(packets), SPORT, ISN, sent, states, lambda ip, rtt: replies.append(ip))
+    assert states == {("10.0.0.2", 22): True, ("10.0.0.2", 23): False}
+    assert replies == ["10.0.0.2", "10.0.0.2"]
+
+
+@pytest.mark.skipif(not synscan.is_available(), reason="socket raw : root / CAP_NET_RAW requis")
+def test_loopback_syn_scan():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    open_port, closed_port = listener.getsockname()[1], closed.getsockname()[1]
+    closed.close()
+    try:
+        states = synscan.syn_scan([("127.0.0.1", open_port), ("127.0.0.1", closed_port)], timeout=0.5)
+    finally:
+        listener.close()
+    assert states == {("127.0.0.1", open_port): True, ("127.0.0.1", closed_port): False}